@@ -1,13 +1,17 @@
-import psycopg2
+import os
+import sys
 
 # ===============================
 # CONFIGURACIÓN CONEXIÓN
 # ===============================
-DB_NAME = "WebCycling"
-DB_USER = "postgres"
-DB_PASS = "postgres"
-DB_HOST = "localhost"
-DB_PORT = "5432"
+# Pool compartido con el modelo (variables DB_HOST, DB_PORT, DB_NAME,
+# DB_USER, DB_PASSWORD y DB_POOL_*)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Modelo"))
+from DBPool import get_pool
+from Migrations import migrate
+from Palmares import palmares_ready, refresh_palmares
+
+pool = get_pool()
 
 # ===============================
 # DATOS DEL CICLISTA
@@ -45,143 +49,118 @@ etapas = [
 # FUNCIONES
 # ===============================
 def insert_data():
-    conn = psycopg2.connect(
-        dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-    )
-    cur = conn.cursor()
-    
-    def get_or_create_ciclista(cur, nombre):
-        # Buscar si ya existe
-        cur.execute("SELECT id FROM ciclistas WHERE nombre_ciclista = %s;", (nombre,))
-        row = cur.fetchone()
-        if row:
-            return row[0], False
-        
-        # Si no existe, insertarlo
-        cur.execute(
-            "INSERT INTO ciclistas (nombre_ciclista) VALUES (%s) RETURNING id;",
-            (nombre,)
-        )
-        new_id = cur.fetchone()[0]
-        return new_id, True 
-
-    ciclista_id, creado = get_or_create_ciclista(cur, ciclista)
-
-    if creado:
-        print(f"🚴 Nuevo ciclista agregado: {ciclista} (id {ciclista_id})")
-    else:
-        print(f"↩️ Usando ciclista existente: {ciclista} (id {ciclista_id})")
-
-
-    def get_or_create_carrera(nombre, tipo, año):
-        print(f"🔎 Buscando carrera: {nombre} ({año}, {tipo})")
-        cur.execute(
-            'SELECT id FROM carreras WHERE nombre_carrera=%s AND "año"=%s;',
-            (nombre, año),
-        )
-        row = cur.fetchone()
-        if row:
-            print(f"➡️ Carrera ya existe con id {row[0]}")
-            return row[0]
-        print("➡️ No existe, creando nueva...")
-        cur.execute(
-            'INSERT INTO carreras (nombre_carrera, tipo, "año") VALUES (%s, %s, %s) RETURNING id;',
-            (nombre, tipo, año),
-        )
-        new_id = cur.fetchone()[0]
-        print(f"✅ Carrera '{nombre}' {año} ({tipo}) insertada con id {new_id}")
-        return new_id
-
-    # Grandes Vueltas
-    for nombre, año, pos, camiseta in grandes_vueltas:
-        carrera_id = get_or_create_carrera(nombre, "GV", año)
-        cur.execute(
-            "INSERT INTO resultados (ciclista_id, carrera_id, posicion, camiseta_ganada) VALUES (%s, %s, %s, %s);",
-            (ciclista_id, carrera_id, pos, camiseta),
-        )
-        print(f"✅ Resultado GV: {ciclista} {nombre} {año} -> {pos}°\n")
-
-    # World Tour
-    for nombre, año, pos in world_tour:
-        carrera_id = get_or_create_carrera(nombre, "WT", año)
-        cur.execute(
-            "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
-            (ciclista_id, carrera_id, pos),
-        )
-        print(f"✅ Resultado WT: {ciclista} {nombre} {año} -> {pos}°\n")
-    
-    # Mundiales
-    if mundiales:
-        print("🔎 Insertando Mundiales...")
-        for nombre, año, pos in mundiales:
-            carrera_id = get_or_create_carrera(nombre, "Mundial", año)
+    with pool.connection() as conn:
+        cur = conn.cursor()
+
+        # Esquema al día antes de escribir (incluye las tablas de palmarés)
+        applied = migrate(cur)
+
+        def get_or_create_ciclista(cur, nombre):
+            # Buscar si ya existe
+            cur.execute("SELECT id FROM ciclistas WHERE nombre_ciclista = %s;", (nombre,))
+            row = cur.fetchone()
+            if row:
+                return row[0], False
+
+            # Si no existe, insertarlo
             cur.execute(
-                "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
-                (ciclista_id, carrera_id, pos),
+                "INSERT INTO ciclistas (nombre_ciclista) VALUES (%s) RETURNING id;",
+                (nombre,)
             )
-            print(f"🌍 Mundial: {ciclista} {nombre} {año} -> {pos}°")
-        print("")
-
-    # Juegos Olímpicos
-    if juegos_olimpicos:
-        print("🔎 Insertando Juegos Olímpicos...")
-        for nombre, año, pos in juegos_olimpicos:
-            carrera_id = get_or_create_carrera(nombre, "Juegos Olímpicos", año)
+            new_id = cur.fetchone()[0]
+            return new_id, True
+
+        ciclista_id, creado = get_or_create_ciclista(cur, ciclista)
+
+        if creado:
+            print(f"🚴 Nuevo ciclista agregado: {ciclista} (id {ciclista_id})")
+        else:
+            print(f"↩️ Usando ciclista existente: {ciclista} (id {ciclista_id})")
+
+
+        def get_or_create_carrera(nombre, tipo, año):
+            print(f"🔎 Buscando carrera: {nombre} ({año}, {tipo})")
             cur.execute(
-                "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
-                (ciclista_id, carrera_id, pos),
+                'SELECT id FROM carreras WHERE nombre_carrera=%s AND "año"=%s;',
+                (nombre, año),
             )
-            print(f"🏅 JJOO: {ciclista} {nombre} {año} -> {pos}°")
-        print("")
-
-    # Nacionales
-    if nacionales:
-        print("🔎 Insertando nacionales...")
-        for nombre, año, pos in nacionales:
-            carrera_id = get_or_create_carrera(nombre, "Nacional", año)
+            row = cur.fetchone()
+            if row:
+                print(f"➡️ Carrera ya existe con id {row[0]}")
+                return row[0]
+            print("➡️ No existe, creando nueva...")
             cur.execute(
-                "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
-                (ciclista_id, carrera_id, pos),
+                'INSERT INTO carreras (nombre_carrera, tipo, "año") VALUES (%s, %s, %s) RETURNING id;',
+                (nombre, tipo, año),
             )
-            print(f"✅ Nacional: {ciclista} {nombre} {año} -> {pos}°")
-        print("")
-    
-    # Campeones de carreras continentales
-    if campeones_continentales:
-        print("🔎 Insertando campeonatos continentales...")
-        for nombre, año in campeones_continentales:
-            carrera_id = get_or_create_carrera(nombre, "Continental", año)
-
-            # Verificar si tiene continente asignado
-            cur.execute("SELECT continente FROM tours_continentales WHERE carrera_id = %s;", (carrera_id,))
-            row = cur.fetchone()
-            if not row or not row[0]:  # no existe registro o continente vacío
-                continente = input(f"🌍 La carrera '{nombre} {año}' no tiene continente asignado. Ingrese continente: ")
-                cur.execute(
-                    "INSERT INTO tours_continentales (carrera_id, continente) VALUES (%s, %s);",
-                    (carrera_id, continente)
-                )
-                print(f"✅ Continente '{continente}' asignado a {nombre} {año}")
+            new_id = cur.fetchone()[0]
+            print(f"✅ Carrera '{nombre}' {año} ({tipo}) insertada con id {new_id}")
+            return new_id
 
-            # Insertar resultado del campeón
+        # Grandes Vueltas
+        for nombre, año, pos, camiseta in grandes_vueltas:
+            carrera_id = get_or_create_carrera(nombre, "GV", año)
+            cur.execute(
+                "INSERT INTO resultados (ciclista_id, carrera_id, posicion, camiseta_ganada) VALUES (%s, %s, %s, %s);",
+                (ciclista_id, carrera_id, pos, camiseta),
+            )
+            print(f"✅ Resultado GV: {ciclista} {nombre} {año} -> {pos}°\n")
+
+        # World Tour
+        for nombre, año, pos in world_tour:
+            carrera_id = get_or_create_carrera(nombre, "WT", año)
             cur.execute(
                 "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
-                (ciclista_id, carrera_id, 1)
+                (ciclista_id, carrera_id, pos),
             )
-            print(f"🏆 {ciclista} campeón de {nombre} {año}")
-        print("")
+            print(f"✅ Resultado WT: {ciclista} {nombre} {año} -> {pos}°\n")
+
+        # Mundiales
+        if mundiales:
+            print("🔎 Insertando Mundiales...")
+            for nombre, año, pos in mundiales:
+                carrera_id = get_or_create_carrera(nombre, "Mundial", año)
+                cur.execute(
+                    "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
+                    (ciclista_id, carrera_id, pos),
+                )
+                print(f"🌍 Mundial: {ciclista} {nombre} {año} -> {pos}°")
+            print("")
+
+        # Juegos Olímpicos
+        if juegos_olimpicos:
+            print("🔎 Insertando Juegos Olímpicos...")
+            for nombre, año, pos in juegos_olimpicos:
+                carrera_id = get_or_create_carrera(nombre, "Juegos Olímpicos", año)
+                cur.execute(
+                    "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
+                    (ciclista_id, carrera_id, pos),
+                )
+                print(f"🏅 JJOO: {ciclista} {nombre} {año} -> {pos}°")
+            print("")
+
+        # Nacionales
+        if nacionales:
+            print("🔎 Insertando nacionales...")
+            for nombre, año, pos in nacionales:
+                carrera_id = get_or_create_carrera(nombre, "Nacional", año)
+                cur.execute(
+                    "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
+                    (ciclista_id, carrera_id, pos),
+                )
+                print(f"✅ Nacional: {ciclista} {nombre} {año} -> {pos}°")
+            print("")
 
-    # Insertar etapas
-    if etapas:
-        print("🔎 Insertando etapas...")
-        for nombre, año, tipo, cantidad in etapas:
-            carrera_id = get_or_create_carrera(nombre, tipo, año)
+        # Campeones de carreras continentales
+        if campeones_continentales:
+            print("🔎 Insertando campeonatos continentales...")
+            for nombre, año in campeones_continentales:
+                carrera_id = get_or_create_carrera(nombre, "Continental", año)
 
-            # Si es carrera Continental, verificar si tiene continente asignado
-            if tipo == "Continental":
+                # Verificar si tiene continente asignado
                 cur.execute("SELECT continente FROM tours_continentales WHERE carrera_id = %s;", (carrera_id,))
                 row = cur.fetchone()
-                if not row:  # no tiene continente
+                if not row or not row[0]:  # no existe registro o continente vacío
                     continente = input(f"🌍 La carrera '{nombre} {año}' no tiene continente asignado. Ingrese continente: ")
                     cur.execute(
                         "INSERT INTO tours_continentales (carrera_id, continente) VALUES (%s, %s);",
@@ -189,17 +168,52 @@ def insert_data():
                     )
                     print(f"✅ Continente '{continente}' asignado a {nombre} {año}")
 
-            # Insertar la etapa
-            cur.execute(
-                "INSERT INTO etapas (ciclista_id, carrera_id, cantidad_etapas) VALUES (%s, %s, %s);",
-                (ciclista_id, carrera_id, cantidad),
-            )
-            print(f"✅ Etapas: {nombre} {año} ({tipo}) -> {cantidad} ganadas")
-        print("")
-
-    conn.commit()
-    cur.close()
-    conn.close()
+                # Insertar resultado del campeón
+                cur.execute(
+                    "INSERT INTO resultados (ciclista_id, carrera_id, posicion) VALUES (%s, %s, %s);",
+                    (ciclista_id, carrera_id, 1)
+                )
+                print(f"🏆 {ciclista} campeón de {nombre} {año}")
+            print("")
+
+        # Insertar etapas
+        if etapas:
+            print("🔎 Insertando etapas...")
+            for nombre, año, tipo, cantidad in etapas:
+                carrera_id = get_or_create_carrera(nombre, tipo, año)
+
+                # Si es carrera Continental, verificar si tiene continente asignado
+                if tipo == "Continental":
+                    cur.execute("SELECT continente FROM tours_continentales WHERE carrera_id = %s;", (carrera_id,))
+                    row = cur.fetchone()
+                    if not row:  # no tiene continente
+                        continente = input(f"🌍 La carrera '{nombre} {año}' no tiene continente asignado. Ingrese continente: ")
+                        cur.execute(
+                            "INSERT INTO tours_continentales (carrera_id, continente) VALUES (%s, %s);",
+                            (carrera_id, continente)
+                        )
+                        print(f"✅ Continente '{continente}' asignado a {nombre} {año}")
+
+                # Insertar la etapa
+                cur.execute(
+                    "INSERT INTO etapas (ciclista_id, carrera_id, cantidad_etapas) VALUES (%s, %s, %s);",
+                    (ciclista_id, carrera_id, cantidad),
+                )
+                print(f"✅ Etapas: {nombre} {año} ({tipo}) -> {cantidad} ganadas")
+            print("")
+
+        # Palmarés agregado, publicado en la misma transacción. Si la migración
+        # acaba de crear las tablas, se calcula para todos los ciclistas
+        if 2 in applied:
+            refresh_palmares(cur)
+        elif palmares_ready(cur):
+            refresh_palmares(cur, [ciclista_id])
+        else:
+            print("⚠️ Las tablas de palmarés no existen (revisa el error de migración): no se actualizó el palmarés")
+
+        # Si algo falla antes, el pool revierte la transacción al devolver la conexión
+        conn.commit()
+        cur.close()
     print("🚴‍♂️ Datos insertados exitosamente.\n")
 
 if __name__ == "__main__":
@@ -1,55 +1,119 @@
-import psycopg2
+import os
+import sys
 
 # ===============================
 # CONFIGURACIÓN CONEXIÓN
 # ===============================
-DB_NAME = "WebCycling"
-DB_USER = "postgres"
-DB_PASS = "postgres"
-DB_HOST = "localhost"
-DB_PORT = "5432"
+# Pool compartido con el modelo (variables DB_HOST, DB_PORT, DB_NAME,
+# DB_USER, DB_PASSWORD y DB_POOL_*)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Modelo"))
+from DBPool import get_pool
+
+pool = get_pool()
+
+# ===============================
+# CONSULTAS (también las usa benchmarks/bench_query_plans.py)
+# ===============================
+CONSULTA_CICLISTA = """
+(
+    SELECT 
+        ci.nombre_ciclista,
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        'Resultado' AS origen,
+        r.posicion::text AS detalle
+    FROM resultados r
+    JOIN ciclistas ci ON r.ciclista_id = ci.id
+    JOIN carreras ca ON r.carrera_id = ca.id
+    WHERE ci.nombre_ciclista ILIKE %s
+)
+UNION ALL
+(
+    SELECT 
+        ci.nombre_ciclista,
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        'Etapas' AS origen,
+        e.cantidad_etapas::text AS detalle
+    FROM etapas e
+    JOIN ciclistas ci ON e.ciclista_id = ci.id
+    JOIN carreras ca ON e.carrera_id = ca.id
+    WHERE ci.nombre_ciclista ILIKE %s
+)
+ORDER BY año, nombre_carrera, origen;
+"""
+
+CONSULTA_CARRERA = """
+(
+    SELECT 
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        ci.nombre_ciclista,
+        'Resultado' AS origen,
+        r.posicion::text AS detalle
+    FROM resultados r
+    JOIN ciclistas ci ON r.ciclista_id = ci.id
+    JOIN carreras ca ON r.carrera_id = ca.id
+    WHERE ca.nombre_carrera ILIKE %s
+)
+UNION ALL
+(
+    SELECT 
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        ci.nombre_ciclista,
+        'Etapas' AS origen,
+        e.cantidad_etapas::text AS detalle
+    FROM etapas e
+    JOIN ciclistas ci ON e.ciclista_id = ci.id
+    JOIN carreras ca ON e.carrera_id = ca.id
+    WHERE ca.nombre_carrera ILIKE %s
+)
+ORDER BY año, nombre_carrera, origen;
+"""
+
+CONSULTA_ANIO = """
+(
+    SELECT 
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        ci.nombre_ciclista,
+        'Resultado' AS origen,
+        r.posicion::text AS detalle
+    FROM resultados r
+    JOIN ciclistas ci ON r.ciclista_id = ci.id
+    JOIN carreras ca ON r.carrera_id = ca.id
+    WHERE ca."año" = %s
+)
+UNION ALL
+(
+    SELECT 
+        ca.nombre_carrera,
+        ca.año,
+        ca.tipo,
+        ci.nombre_ciclista,
+        'Etapas' AS origen,
+        e.cantidad_etapas::text AS detalle
+    FROM etapas e
+    JOIN ciclistas ci ON e.ciclista_id = ci.id
+    JOIN carreras ca ON e.carrera_id = ca.id
+    WHERE ca."año" = %s
+)
+ORDER BY nombre_carrera, origen;
+"""
 
 # ===============================
 # FUNCIONES DE CONSULTA
 # ===============================
 def consultar_ciclista(nombre_ciclista):
-    conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASS,
-                            host=DB_HOST, port=DB_PORT)
-    cur = conn.cursor()
-
-    query = """
-    (
-        SELECT 
-            ci.nombre_ciclista,
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            'Resultado' AS origen,
-            r.posicion::text AS detalle
-        FROM resultados r
-        JOIN ciclistas ci ON r.ciclista_id = ci.id
-        JOIN carreras ca ON r.carrera_id = ca.id
-        WHERE ci.nombre_ciclista ILIKE %s
-    )
-    UNION ALL
-    (
-        SELECT 
-            ci.nombre_ciclista,
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            'Etapas' AS origen,
-            e.cantidad_etapas::text AS detalle
-        FROM etapas e
-        JOIN ciclistas ci ON e.ciclista_id = ci.id
-        JOIN carreras ca ON e.carrera_id = ca.id
-        WHERE ci.nombre_ciclista ILIKE %s
-    )
-    ORDER BY año, nombre_carrera, origen;
-    """
-
-    cur.execute(query, (nombre_ciclista, nombre_ciclista))
-    rows = cur.fetchall()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(CONSULTA_CICLISTA, (nombre_ciclista, nombre_ciclista))
+        rows = cur.fetchall()
 
     if not rows:
         print(f"\n❌ No se encontraron registros para {nombre_ciclista}")
@@ -61,48 +125,11 @@ def consultar_ciclista(nombre_ciclista):
             else:
                 print(f" - {carrera} {año} ({tipo}) → Ganó {detalle} etapas")
 
-    cur.close()
-    conn.close()
-
 
 def consultar_carrera(nombre_carrera):
-    conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASS,
-                            host=DB_HOST, port=DB_PORT)
-    cur = conn.cursor()
-
-    query = """
-    (
-        SELECT 
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            ci.nombre_ciclista,
-            'Resultado' AS origen,
-            r.posicion::text AS detalle
-        FROM resultados r
-        JOIN ciclistas ci ON r.ciclista_id = ci.id
-        JOIN carreras ca ON r.carrera_id = ca.id
-        WHERE ca.nombre_carrera ILIKE %s
-    )
-    UNION ALL
-    (
-        SELECT 
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            ci.nombre_ciclista,
-            'Etapas' AS origen,
-            e.cantidad_etapas::text AS detalle
-        FROM etapas e
-        JOIN ciclistas ci ON e.ciclista_id = ci.id
-        JOIN carreras ca ON e.carrera_id = ca.id
-        WHERE ca.nombre_carrera ILIKE %s
-    )
-    ORDER BY año, nombre_carrera, origen;
-    """
-
-    cur.execute(query, (nombre_carrera, nombre_carrera))
-    rows = cur.fetchall()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(CONSULTA_CARRERA, (nombre_carrera, nombre_carrera))
+        rows = cur.fetchall()
 
     if not rows:
         print(f"\n❌ No se encontraron registros para la carrera {nombre_carrera}")
@@ -114,48 +141,11 @@ def consultar_carrera(nombre_carrera):
             else:
                 print(f" - {ciclista}: {carrera} {año} ({tipo}) → Ganó {detalle} etapas")
 
-    cur.close()
-    conn.close()
-
 
 def consultar_por_año(anio):
-    conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASS,
-                            host=DB_HOST, port=DB_PORT)
-    cur = conn.cursor()
-
-    query = """
-    (
-        SELECT 
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            ci.nombre_ciclista,
-            'Resultado' AS origen,
-            r.posicion::text AS detalle
-        FROM resultados r
-        JOIN ciclistas ci ON r.ciclista_id = ci.id
-        JOIN carreras ca ON r.carrera_id = ca.id
-        WHERE ca."año" = %s
-    )
-    UNION ALL
-    (
-        SELECT 
-            ca.nombre_carrera,
-            ca.año,
-            ca.tipo,
-            ci.nombre_ciclista,
-            'Etapas' AS origen,
-            e.cantidad_etapas::text AS detalle
-        FROM etapas e
-        JOIN ciclistas ci ON e.ciclista_id = ci.id
-        JOIN carreras ca ON e.carrera_id = ca.id
-        WHERE ca."año" = %s
-    )
-    ORDER BY nombre_carrera, origen;
-    """
-
-    cur.execute(query, (anio, anio))
-    rows = cur.fetchall()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(CONSULTA_ANIO, (anio, anio))
+        rows = cur.fetchall()
 
     if not rows:
         print(f"\n❌ No se encontraron registros para el año {anio}")
@@ -167,9 +157,6 @@ def consultar_por_año(anio):
             else:
                 print(f" - {ciclista}: {carrera} ({tipo}) → Ganó {detalle} etapas")
 
-    cur.close()
-    conn.close()
-
 
 # ===============================
 # MENÚ PRINCIPAL
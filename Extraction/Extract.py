@@ -1,5 +1,13 @@
+import os
+import sys
+
 import psycopg2
 
+# Esquema versionado y palmarés agregado (compartidos con el modelo y el cargador)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Modelo"))
+from Migrations import LATEST_VERSION, migrate, schema_version
+from Palmares import refresh_palmares
+
 # Configuración de conexión a PostgreSQL
 DB_NAME = "WebCycling"
 DB_USER = "postgres"
@@ -7,59 +15,6 @@ DB_PASS = "postgres"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
-# Definición de las tablas
-TABLES = {}
-
-TABLES["ciclistas"] = """
-CREATE TABLE IF NOT EXISTS ciclistas (
-    id SERIAL PRIMARY KEY,
-    nombre_ciclista VARCHAR(150) NOT NULL UNIQUE
-);
-"""
-
-TABLES["carreras"] = """
-CREATE TABLE IF NOT EXISTS carreras (
-    id SERIAL PRIMARY KEY,
-    nombre_carrera VARCHAR(150) NOT NULL,
-    tipo VARCHAR(50),
-    año INT NOT NULL
-);
-"""
-
-TABLES["resultados"] = """
-CREATE TABLE IF NOT EXISTS resultados (
-    id SERIAL PRIMARY KEY,
-    ciclista_id INT NOT NULL,
-    carrera_id INT NOT NULL,
-    posicion INT,
-    camiseta_ganada VARCHAR(100),
-    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
-    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
-);
-"""
-
-TABLES["etapas"] = """
-CREATE TABLE IF NOT EXISTS etapas (
-    id SERIAL PRIMARY KEY,
-    ciclista_id INT NOT NULL,
-    carrera_id INT NOT NULL,
-    resultado_etapa VARCHAR(50),
-    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
-    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
-);
-"""
-
-TABLES["tours_continentales"] = """
-CREATE TABLE IF NOT EXISTS tours_continentales (
-    id SERIAL PRIMARY KEY,
-    ciclista_id INT NOT NULL,
-    carrera_id INT NOT NULL,
-    continente VARCHAR(50),
-    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
-    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
-);
-"""
-
 def create_tables():
     try:
         # Conectar a PostgreSQL
@@ -72,15 +27,21 @@ def create_tables():
         )
         cur = conn.cursor()
 
-        # Crear cada tabla
-        for table_name, ddl in TABLES.items():
-            print(f"Creando tabla {table_name}...")
-            cur.execute(ddl)
+        # Aplicar las migraciones pendientes (tablas, triggers e índices)
+        applied = migrate(cur)
+        if applied:
+            refresh_palmares(cur)
 
         conn.commit()
+        version = schema_version(cur)
         cur.close()
         conn.close()
-        print("✅ Tablas creadas exitosamente.")
+        if version < LATEST_VERSION:
+            print(f"⚠️ Esquema en la versión {version} de {LATEST_VERSION}: revisa el error anterior.")
+        elif applied:
+            print(f"✅ Esquema migrado a la versión {version}.")
+        else:
+            print(f"✅ El esquema ya estaba en la versión {version}.")
 
     except Exception as e:
         print("❌ Error creando tablas:", e)
@@ -0,0 +1,168 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from Metrics import ADMISSIONS, stage
+
+
+class Overloaded(Exception):
+    """La llamada al LLM no fue admitida; `retry_after` en segundos"""
+
+    def __init__(self, reason, retry_after, message):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    @property
+    def status_code(self):
+        # Cuota del despliegue agotada: 429; cola llena o espera excedida: 503
+        return 429 if self.reason == "rate_limited" else 503
+
+
+class TokenBucket:
+    """Cubeta de tokens: `rate` por segundo hasta `capacity` acumulados"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount):
+        """Segundos hasta que haya `amount` tokens (0 si ya los hay)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        """Reservar `amount` tokens (el saldo puede quedar negativo: reserva futura)"""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdmissionController:
+    """Cola acotada delante de las llamadas al LLM: máximo de llamadas en
+    curso, ritmo de la cuota del despliegue (solicitudes y tokens por minuto)
+    y rechazo inmediato cuando la espera no cabe en `max_wait`"""
+
+    def __init__(self, max_in_flight=None, queue_size=None, max_wait=None, rpm=None, tpm=None):
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("LLM_QUEUE_SIZE", "64"))
+        self.max_wait = max_wait or float(os.getenv("LLM_QUEUE_MAX_WAIT", "10"))
+        rpm = rpm if rpm is not None else float(os.getenv("LLM_RATE_RPM", "0"))
+        tpm = tpm if tpm is not None else float(os.getenv("LLM_RATE_TPM", "0"))
+        # 0 desactiva el límite. Ráfagas de hasta 10 s de cuota (la ventana con
+        # la que Azure evalúa los límites por minuto)
+        self.requests = TokenBucket(rpm / 60.0, max(1.0, rpm / 6.0)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, max(1.0, tpm / 6.0)) if tpm else None
+
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = 1.0  # media móvil de la duración de una llamada (s)
+
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "rate_limited": 0, "queue_timeout": 0}
+
+    def _reject(self, purpose, reason, retry_after, message):
+        self.rejected[reason] += 1
+        ADMISSIONS.inc(purpose=purpose, outcome=reason)
+        print(f"🚦 Llamada al LLM rechazada ({reason}), reintentar en {retry_after:.1f}s")
+        return Overloaded(reason, retry_after, message)
+
+    def _queue_delay(self):
+        """Espera estimada para obtener un lugar con la cola actual"""
+        rounds = (self.waiting + 1) / self.max_in_flight
+        return self.service_time * max(1.0, rounds)
+
+    @asynccontextmanager
+    async def admit(self, tokens=0, purpose="llm"):
+        """Esperar turno para una llamada al LLM de ~`tokens` tokens, o lanzar
+        Overloaded sin esperar si no sería atendida dentro de `max_wait`"""
+        # Cola llena, o la espera estimada ya excede max_wait: rechazar sin esperar
+        busy = self.waiting + self.in_flight >= self.max_in_flight
+        if busy and (self.waiting >= self.queue_size or self._queue_delay() > self.max_wait):
+            raise self._reject(purpose, "queue_full", self._queue_delay(),
+                               "El servicio está saturado; intenta de nuevo en unos segundos.")
+
+        # Ritmo de la cuota: la espera se reserva ahora para no adelantar a otros
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(tokens))
+        if delay > self.max_wait:
+            raise self._reject(purpose, "rate_limited", delay,
+                               "Se alcanzó el límite de solicitudes al modelo; intenta de nuevo en unos segundos.")
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+        deadline = time.monotonic() + self.max_wait
+        self.waiting += 1
+        try:
+            with stage("llm_queue"):
+                if delay:
+                    await asyncio.sleep(delay)
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise self._reject(purpose, "queue_timeout", self._queue_delay(),
+                               "El servicio está saturado; intenta de nuevo en unos segundos.")
+        finally:
+            self.waiting -= 1
+
+        self._admitted(purpose)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(start)
+
+    async def try_acquire(self, tokens=0, purpose="llm"):
+        """Tomar un lugar solo si está libre ya, sin cola ni espera de cuota
+        (llamadas opcionales como el respaldo del hedging). True si se tomó:
+        liberarlo con release()"""
+        if self.waiting or self._slots.locked():
+            return False
+        if self.requests is not None and self.requests.delay(1):
+            return False
+        if self.tokens is not None and self.tokens.delay(tokens):
+            return False
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        await self._slots.acquire()  # libre y sin cola: no espera
+        self._admitted(purpose)
+        return True
+
+    def _admitted(self, purpose):
+        self.in_flight += 1
+        self.admitted += 1
+        ADMISSIONS.inc(purpose=purpose, outcome="admitted")
+
+    def release(self, start):
+        """Liberar el lugar de una llamada admitida en `start` (time.monotonic)"""
+        self.in_flight -= 1
+        self._slots.release()
+        self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - start)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "queue_size": self.queue_size,
+            "max_wait": self.max_wait,
+            "service_time_ms": round(1000 * self.service_time, 1),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
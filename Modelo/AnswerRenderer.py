@@ -0,0 +1,189 @@
+from collections import OrderedDict
+
+# Máximo de ciclistas o resultados que se enumeran en una respuesta
+MAX_LISTED = 10
+
+ORDINALS = {1: "primero", 2: "segundo", 3: "tercero"}
+
+
+def count_columns(row):
+    """Columnas de conteo (total_*, count) de una fila de estadísticas"""
+    return [key for key in row.keys() if 'total_' in str(key) or 'count' in str(key).lower()]
+
+
+def is_statistics(query_results):
+    """Detectar si es una consulta de estadísticas"""
+    return any(count_columns(row) for row in query_results)
+
+
+def data_summary(query_results):
+    """Interpretación clara de los datos (líderes, ganadores y posiciones)"""
+    summary = "INTERPRETACIÓN CLARA DE LOS DATOS:\n"
+
+    if is_statistics(query_results):
+        # Manejo especial para estadísticas
+        summary += "\n*** ESTADÍSTICAS DE CICLISTAS ***\n"
+        for i, row in enumerate(query_results, 1):
+            ciclista = row.get('nombre_ciclista', 'No especificado')
+            total_podios = row.get('total_podios', 0)
+            total_victorias = row.get('total_victorias', 0)
+
+            summary += f"\n{i}. {ciclista}:\n"
+            if total_podios > 0:
+                summary += f"   - Total de podios: {total_podios}\n"
+            if total_victorias > 0:
+                summary += f"   - Total de victorias: {total_victorias}\n"
+
+            # Interpretación automática
+            if i == 1:  # El primero en la lista
+                if total_podios > 0:
+                    summary += f"   *** {ciclista} ES EL CICLISTA CON MÁS PODIOS ({total_podios}) ***\n"
+                if total_victorias > 0:
+                    summary += f"   *** {ciclista} ES EL CICLISTA CON MÁS VICTORIAS ({total_victorias}) ***\n"
+    else:
+        # Manejo normal para resultados individuales
+        for i, row in enumerate(query_results, 1):
+            summary += f"\nRegistro {i}:\n"
+
+            ciclista = row.get('nombre_ciclista', 'No especificado')
+            año = row.get('año', 'No especificado')
+            posicion = row.get('posicion', 'No especificada')
+            carrera = row.get('nombre_carrera', 'No especificada')
+
+            summary += f"  - Ciclista: {ciclista}\n"
+            summary += f"  - Año: {año}\n"
+            summary += f"  - Posición: {posicion}\n"
+            summary += f"  - Carrera: {carrera}\n"
+
+            # Interpretación automática de la posición
+            if posicion == 1:
+                summary += f"  *** {ciclista} FUE EL GANADOR/CAMPEÓN en {año} ***\n"
+            elif posicion == 2:
+                summary += f"  *** {ciclista} quedó SEGUNDO en {año} ***\n"
+            elif posicion == 3:
+                summary += f"  *** {ciclista} quedó TERCERO en {año} ***\n"
+
+    return summary
+
+
+def join_names(items):
+    """'a', 'a y b', 'a, b y c'"""
+    items = [str(item) for item in items]
+    if len(items) <= 1:
+        return "".join(items)
+    return f"{', '.join(items[:-1])} y {items[-1]}"
+
+
+def count_label(column):
+    """'total_podios' -> 'podios'"""
+    return str(column).lower().replace("total_", "").replace("count", "").strip("_ ").replace("_", " ")
+
+
+def quantity(value, column):
+    """'1 podio', '5 podios', '3 victorias' a partir del nombre de la columna"""
+    label = count_label(column)
+    if not label:
+        return str(value)
+    if value == 1 and label.endswith("s"):
+        label = label[:-1]
+    return f"{value} {label}"
+
+
+def race_label(row):
+    """'Vuelta a Colombia 1951' con lo que tenga la fila"""
+    parts = [str(row[key]) for key in ("nombre_carrera", "año") if row.get(key) not in (None, "")]
+    return " ".join(parts)
+
+
+def position_phrase(posicion, label=""):
+    """'ganó X', 'quedó segundo en X', 'terminó en la posición 7 de X'"""
+    if posicion == 1:
+        verb, preposition = "ganó", ""
+    elif posicion in ORDINALS:
+        verb, preposition = f"quedó {ORDINALS[posicion]}", "en"
+    else:
+        verb, preposition = f"terminó en la posición {posicion}", "de"
+    return " ".join(part for part in (verb, preposition if label else "", label) if part)
+
+
+def render_statistics(query_results):
+    """Líder (o empatados) y los siguientes de un ranking de conteos"""
+    first = query_results[0]
+    columns = count_columns(first)
+    if not columns or 'nombre_ciclista' not in first:
+        return None
+    column = columns[0]
+    top = first[column]
+
+    leaders = [row for row in query_results if row.get(column) == top]
+    if len(leaders) > 1:
+        names = join_names(row['nombre_ciclista'] for row in leaders[:MAX_LISTED])
+        answer = f"{names} comparten el primer lugar con {quantity(top, column)} cada uno."
+    else:
+        answer = f"{first['nombre_ciclista']} es quien tiene más {count_label(column) or 'registros'}, con {top}."
+        for other in columns[1:]:
+            answer += f" Además suma {quantity(first[other], other)}."
+
+    following = query_results[len(leaders):MAX_LISTED]
+    if following:
+        answer += (" Le sigue " if len(following) == 1 else " Le siguen ") + join_names(f"{row['nombre_ciclista']} ({row.get(column)})" for row in following) + "."
+    return answer
+
+
+def render_results(query_results):
+    """Ganadores, podios y palmarés a partir de filas ciclista/carrera/año/posición"""
+    if not all('nombre_ciclista' in row and 'posicion' in row for row in query_results):
+        return None
+
+    riders = OrderedDict((row['nombre_ciclista'], True) for row in query_results)
+    if len(riders) == 1 and len(query_results) > 1:
+        # Palmarés de un solo ciclista
+        rider = next(iter(riders))
+        lines = [f"{rider} tiene {len(query_results)} resultados registrados:"]
+        for row in query_results[:MAX_LISTED]:
+            lines.append(f"- {race_label(row)}: posición {row['posicion']}")
+        if len(query_results) > MAX_LISTED:
+            lines.append(f"... y {len(query_results) - MAX_LISTED} más.")
+        return "\n".join(lines)
+
+    # Agrupar por carrera y año (un podio es un grupo de varias filas)
+    groups = OrderedDict()
+    for row in query_results:
+        groups.setdefault(race_label(row), []).append(row)
+
+    sentences = []
+    for label, rows in list(groups.items())[:MAX_LISTED]:
+        if len(rows) == 1:
+            sentences.append(f"{rows[0]['nombre_ciclista']} {position_phrase(rows[0]['posicion'], label)}.")
+            continue
+        parts = join_names(f"{row['nombre_ciclista']} {position_phrase(row['posicion'])}" for row in rows)
+        sentences.append(f"En {label}: {parts}." if label else f"{parts}.")
+    if len(groups) > MAX_LISTED:
+        sentences.append(f"Hay {len(groups) - MAX_LISTED} resultados más.")
+    return " ".join(sentences)
+
+
+def render_answer(query_results):
+    """Respuesta en español redactada con plantillas, o None si la forma de
+    los datos no es reconocida (entonces se redacta con el LLM)"""
+    if not query_results:
+        return None
+    if is_statistics(query_results):
+        return render_statistics(query_results)
+    return render_results(query_results)
+
+
+def render_fallback(query_results):
+    """Respuesta que nunca es None: la plantilla si reconoce los datos o, si
+    no, una enumeración simple de las filas (cuando el LLM no está disponible)"""
+    answer = render_answer(query_results)
+    if answer is not None:
+        return answer
+    if not query_results:
+        return "No encontré datos para responder tu pregunta."
+    lines = [f"Estos son los resultados encontrados ({len(query_results)}):"]
+    for row in list(query_results)[:MAX_LISTED]:
+        lines.append("- " + ", ".join(f"{key}: {value}" for key, value in row.items() if value is not None))
+    if len(query_results) > MAX_LISTED:
+        lines.append(f"Hay {len(query_results) - MAX_LISTED} resultados más.")
+    return "\n".join(lines)
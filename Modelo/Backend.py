@@ -1,14 +1,30 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from CyclingLLM import CyclingLLM
+from HealthMonitor import HealthMonitor
+from Metrics import REGISTRY
 import uvicorn
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
+import json
+import time
+import sys
+import uuid
+import asyncio
 
 # Modelos de datos
 class QuestionRequest(BaseModel):
     question: str
+    phrasing: Optional[bool] = None  # True: redactar la respuesta con el LLM
+    timings: bool = False  # Incluir los tiempos por etapa en la respuesta
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None
+    phrasing: Optional[bool] = None
 
 class ApiResponse(BaseModel):
     success: bool
@@ -34,15 +50,81 @@ app.add_middleware(
 # Instancia global de CyclingLLM
 cycling_llm = None
 
+# Lotes grandes: se procesan como trabajos en segundo plano
+BATCH_SYNC_LIMIT = int(os.getenv("BATCH_SYNC_LIMIT", "20"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL", "3600"))
+batch_jobs = {}
+
+# Calentamiento: /ready responde 200 solo cuando termina (reintentos con espera creciente)
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", "2"))
+WARMUP_RETRY_MAX_DELAY = float(os.getenv("WARMUP_RETRY_MAX_DELAY", "60"))
+readiness = {"ready": False, "status": "starting", "attempts": 0, "steps_ms": {}, "error": None}
+warm_up_task = None
+
+# Verificación periódica de BD y LLM: /health sirve el último estado
+health_monitor = None
+health_task = None
+
+# Espera máxima al apagar para que terminen los lotes en curso
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
 @app.on_event("startup")
 async def startup_event():
-    """Inicializar CyclingLLM al arrancar la aplicación"""
-    global cycling_llm
-    try:
-        cycling_llm = CyclingLLM()
-        print("✅ CyclingLLM inicializado correctamente")
-    except Exception as e:
-        print(f"❌ Error inicializando CyclingLLM: {e}")
+    """Inicializar y calentar CyclingLLM en segundo plano (ver /ready)"""
+    global warm_up_task
+    warm_up_task = asyncio.create_task(warm_up())
+
+async def warm_up():
+    """Crear CyclingLLM y calentarlo, reintentando hasta lograrlo"""
+    global cycling_llm, health_monitor, health_task
+    delay = WARMUP_RETRY_DELAY
+    while True:
+        readiness["attempts"] += 1
+        try:
+            if cycling_llm is None:
+                cycling_llm = CyclingLLM()
+                REGISTRY.collector(cycling_llm.runtime_metrics)
+                print("✅ CyclingLLM inicializado correctamente")
+            
+            readiness["status"] = "warming"
+            readiness["steps_ms"] = await cycling_llm.awarm_up()
+            readiness.update(ready=True, status="ready", error=None)
+            print(f"🔥 Calentamiento completo: {readiness['steps_ms']}")
+            
+            health_monitor = HealthMonitor(cycling_llm)
+            health_monitor.seed(readiness["steps_ms"])
+            health_task = asyncio.create_task(health_monitor.run())
+            return
+        except Exception as e:
+            readiness.update(status="retrying", error=str(e))
+            print(f"❌ Error en el calentamiento (intento {readiness['attempts']}), reintento en {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_DELAY)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Apagado ordenado: esperar los lotes en curso, persistir las caches y
+    cerrar las conexiones (uvicorn ya drenó las solicitudes HTTP)"""
+    readiness.update(ready=False, status="stopping")
+    for task in (warm_up_task, health_task):
+        if task is not None and not task.done():
+            task.cancel()
+    
+    running = [job["task"] for job in batch_jobs.values() if job["status"] == "running" and "task" in job]
+    if running:
+        print(f"⏳ Esperando {len(running)} lote(s) en curso...")
+        done, pending = await asyncio.wait(running, timeout=SHUTDOWN_DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"⚠️ {len(pending)} lote(s) cancelados al apagar")
+    
+    if cycling_llm is not None:
+        cycling_llm.sql_cache.save()
+        cycling_llm.executor.shutdown(wait=True)
+        cycling_llm.pool.closeall()
+        print("👋 CyclingLLM detenido")
 
 @app.get("/")
 async def root():
@@ -52,14 +134,20 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready (503 hasta terminar el calentamiento)",
             "ask": "/ask (POST)",
+            "ask-stream": "/ask/stream (POST, Server-Sent Events)",
+            "ask-batch": "/ask/batch (POST), /ask/batch/{job_id}",
+            "ask-results": "/ask/{result_id}/results?cursor=",
+            "metrics": "/metrics (Prometheus)",
             "test-connection": "/test-connection"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Verificar estado de la aplicación"""
+    """Estado de la aplicación según la última verificación en segundo plano
+    (no abre conexiones: las sondas y el frontend no generan carga en la BD)"""
     global cycling_llm
     
     if cycling_llm is None:
@@ -68,21 +156,41 @@ async def health_check():
             error="CyclingLLM no está inicializado"
         )
     
-    # Probar conexión a la base de datos
-    connection_test = cycling_llm.test_connection()
+    if health_monitor is None:
+        return ApiResponse(
+            success=False,
+            data={"status": readiness["status"]},
+            error="Calentamiento en curso"
+        )
+    
+    health = health_monitor.snapshot()
+    error = None
+    if not health["healthy"]:
+        error = health["llm"]["message"] if health["database"]["ok"] else health["database"]["message"]
     
     return ApiResponse(
-        success=connection_test["success"],
+        success=health["healthy"],
         data={
-            "status": "healthy" if connection_test["success"] else "unhealthy",
-            "database": connection_test["message"]
+            "status": health["status"],
+            "database": health["database"]["message"],
+            "checks": health
         },
-        error=None if connection_test["success"] else connection_test["message"]
+        error=error
     )
 
+@app.get("/ready")
+async def ready_check():
+    """Preparada para recibir tráfico: 200 solo tras el calentamiento"""
+    response = ApiResponse(
+        success=readiness["ready"],
+        data=dict(readiness),
+        error=readiness["error"]
+    )
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=response.model_dump())
+
 @app.get("/test-connection")
 async def test_db_connection():
-    """Probar conexión específicamente a la base de datos"""
+    """Estado de la conexión a la base de datos (última verificación)"""
     global cycling_llm
     
     if cycling_llm is None:
@@ -91,23 +199,22 @@ async def test_db_connection():
             detail="CyclingLLM no está inicializado"
         )
     
-    try:
-        result = cycling_llm.test_connection()
-        
-        return ApiResponse(
-            success=result["success"],
-            data={
-                "message": result["message"],
-                "timestamp": None
-            },
-            error=None if result["success"] else result["message"]
-        )
-    
-    except Exception as e:
+    if health_monitor is None:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error probando conexión: {str(e)}"
+            status_code=503,
+            detail="Calentamiento en curso"
         )
+    
+    database = health_monitor.database
+    return ApiResponse(
+        success=bool(database["ok"]),
+        data={
+            "message": database["message"],
+            "timestamp": database["checked_at"],
+            "latency_ms": database["latency_ms"]
+        },
+        error=None if database["ok"] else database["message"]
+    )
 
 @app.post("/ask")
 async def ask_question(request: QuestionRequest):
@@ -127,10 +234,20 @@ async def ask_question(request: QuestionRequest):
         )
     
     try:
-        # Procesar la pregunta
-        result = cycling_llm.ask_question(request.question.strip())
+        # Procesar la pregunta sin bloquear el event loop
+        result = await cycling_llm.aask_question(request.question.strip(), request.phrasing)
+        
+        if result.get("status_code"):
+            # Sin cupo para el LLM: rechazo rápido para que el cliente reintente
+            return JSONResponse(
+                status_code=result["status_code"],
+                content=ApiResponse(success=False, data=None, error=result["error"]).model_dump(),
+                headers={"Retry-After": str(result["retry_after"])}
+            )
         
         if result["success"]:
+            if not request.timings:
+                result["data"].pop("timings_ms", None)
             return ApiResponse(
                 success=True,
                 data=result["data"],
@@ -150,6 +267,178 @@ async def ask_question(request: QuestionRequest):
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """Procesar pregunta emitiendo Server-Sent Events a medida que avanza"""
+    global cycling_llm
+    
+    if cycling_llm is None:
+        raise HTTPException(
+            status_code=500,
+            detail="CyclingLLM no está inicializado"
+        )
+    
+    if not request.question or not request.question.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="La pregunta no puede estar vacía"
+        )
+    
+    async def event_stream():
+        try:
+            async for event, payload in cycling_llm.astream_question(request.question.strip(), request.phrasing):
+                yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Error procesando pregunta: {e}")
+            yield sse_event("error", {"error": f"Error interno del servidor: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def sse_event(event, payload):
+    """Formatear un evento SSE"""
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchRequest):
+    """Procesar un lote de preguntas (como trabajo si el lote es grande)"""
+    global cycling_llm
+    
+    if cycling_llm is None:
+        raise HTTPException(
+            status_code=500,
+            detail="CyclingLLM no está inicializado"
+        )
+    
+    questions = [q.strip() for q in request.questions if q and q.strip()]
+    if not questions:
+        raise HTTPException(
+            status_code=400,
+            detail="El lote no contiene preguntas"
+        )
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote supera el máximo de {BATCH_MAX_QUESTIONS} preguntas"
+        )
+    
+    if len(questions) <= BATCH_SYNC_LIMIT:
+        result = await cycling_llm.aask_batch(questions, request.concurrency, phrasing=request.phrasing)
+        return ApiResponse(success=True, data=result, error=None)
+    
+    # Lote grande: crear trabajo y responder de inmediato
+    purge_batch_jobs()
+    job_id = uuid.uuid4().hex
+    job = {
+        "job_id": job_id,
+        "status": "running",
+        "total_questions": len(questions),
+        "completed": 0,
+        "created_at": time.time(),
+        "finished_at": None,
+        "result": None,
+        "error": None
+    }
+    batch_jobs[job_id] = job
+    publish_job(job)
+    
+    def on_result(key, result):
+        job["completed"] += 1
+        publish_job(job)
+    
+    async def run_job():
+        try:
+            job["result"] = await cycling_llm.aask_batch(questions, request.concurrency, on_result, request.phrasing)
+            job["status"] = "done"
+        except Exception as e:
+            print(f"Error procesando lote {job_id}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["finished_at"] = time.time()
+        publish_job(job)
+    
+    job["task"] = asyncio.create_task(run_job())
+    
+    return ApiResponse(
+        success=True,
+        data={
+            "job_id": job_id,
+            "status": "running",
+            "total_questions": len(questions),
+            "poll_url": f"/ask/batch/{job_id}"
+        },
+        error=None
+    )
+
+@app.get("/ask/batch/{job_id}")
+async def get_batch_job(job_id: str):
+    """Consultar el estado (y resultado) de un trabajo de lote"""
+    job = batch_jobs.get(job_id)
+    if job is None and cycling_llm is not None and cycling_llm.shared_store is not None:
+        # Trabajo creado en otro worker
+        entry = cycling_llm.shared_store.get("lotes", job_id)
+        job = entry[0] if entry else None
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Trabajo no encontrado"
+        )
+    
+    return ApiResponse(
+        success=job["status"] != "failed",
+        data={key: value for key, value in job.items() if key != "task"},
+        error=job["error"]
+    )
+
+@app.get("/ask/{result_id}/results")
+async def get_results_page(result_id: str, cursor: int = 0, limit: Optional[int] = None):
+    """Paginar los resultados de una respuesta a partir del token `cursor`"""
+    global cycling_llm
+    
+    if cycling_llm is None:
+        raise HTTPException(
+            status_code=500,
+            detail="CyclingLLM no está inicializado"
+        )
+    
+    result = await cycling_llm.afetch_results(result_id, cursor, limit)
+    if not result["success"] and cycling_llm.result_sets.get(result_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=result["error"]
+        )
+    
+    return ApiResponse(
+        success=result["success"],
+        data=result["data"],
+        error=result["error"]
+    )
+
+def publish_job(job):
+    """Publicar el estado del trabajo en la cache compartida, para que
+    cualquier worker pueda responder la consulta de su estado"""
+    store = cycling_llm.shared_store if cycling_llm is not None else None
+    if store is not None:
+        data = {key: value for key, value in job.items() if key != "task"}
+        store.set("lotes", job["job_id"], data, time.time() + BATCH_JOB_TTL)
+
+def purge_batch_jobs():
+    """Eliminar trabajos terminados hace más de BATCH_JOB_TTL segundos"""
+    now = time.time()
+    expired = [job_id for job_id, job in batch_jobs.items()
+               if job["finished_at"] and now - job["finished_at"] > BATCH_JOB_TTL]
+    for job_id in expired:
+        del batch_jobs[job_id]
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/schema")
 async def get_database_schema():
     """Obtener esquema de la base de datos (endpoint opcional para debug)"""
@@ -162,12 +451,22 @@ async def get_database_schema():
         )
     
     try:
-        schema = cycling_llm.get_database_schema()
+        schema = await run_in_threadpool(cycling_llm.get_database_schema)
         
         return ApiResponse(
             success=True,
             data={
-                "schema": schema
+                "schema": schema,
+                "cache": cycling_llm.schema_cache.stats(),
+                "sql_cache": cycling_llm.sql_cache.stats(),
+                "result_cache": cycling_llm.result_cache.stats(),
+                "query_guard": cycling_llm.query_guard.stats(),
+                "result_sets": cycling_llm.result_sets.stats(),
+                "single_flight": cycling_llm.in_flight.stats(),
+                "admission": cycling_llm.admission.stats(),
+                "entities": cycling_llm.entity_index.stats(),
+                "llm_calls": {purpose: policy.stats() for purpose, policy in cycling_llm.policies.items()},
+                "shared_cache": cycling_llm.shared_store.stats() if cycling_llm.shared_store else None
             },
             error=None
         )
@@ -189,6 +488,11 @@ async def redirect_to_frontend():
     }
 
 if __name__ == "__main__":
+    if "--production" in sys.argv:
+        # Varios workers con la aplicación precargada (ver gunicorn.conf.py)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "Backend:app"])
+    
     # Configuración para desarrollo
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
@@ -205,5 +509,5 @@ if __name__ == "__main__":
         log_level="info"
     )
 
-# Para producción, usar:
-# uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+# Para producción (varios workers, caches compartidas con SHARED_CACHE_PATH):
+# gunicorn -c gunicorn.conf.py Backend:app   o   python Backend.py --production
\ No newline at end of file
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache LRU acotada con expiración (TTL) y persistencia opcional en disco.
+    Con `shared` (SharedCache.SharedStore) los fallos locales se buscan en el
+    almacén compartido por los workers y las escrituras se publican en él"""
+
+    def __init__(self, maxsize=1000, ttl=3600.0, path=None, persist_interval=5.0, shared=None, namespace=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.persist_interval = persist_interval
+        self.shared = shared
+        self.namespace = namespace
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()     # clave -> (valor, expira_en)
+        self._dirty = False
+        self._saved_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+        if self.path:
+            self.load()
+
+    def get(self, key):
+        """Retornar el valor vigente para `key` o None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self._dirty = True
+            if self.shared is None:
+                self.misses += 1
+                return None
+
+        # Fallo local: la entrada pudo calcularla otro worker
+        entry = self.shared.get(self.namespace, key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            self._store(key, value, expires_at)
+            self.hits += 1
+            self.shared_hits += 1
+            return value
+
+    def _store(self, key, value, expires_at):
+        # Llamar con el lock tomado
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        self._dirty = True
+
+    def set(self, key, value, ttl=None):
+        """Guardar un valor, desalojando el menos usado si se supera el tamaño"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.shared is not None:
+            self.shared.set(self.namespace, key, value, expires_at)
+        if self.path and time.time() - self._saved_at >= self.persist_interval:
+            self.save()
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._dirty = True
+        if self.shared is not None:
+            self.shared.delete(self.namespace, key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._dirty = True
+        if self.shared is not None:
+            self.shared.clear(self.namespace)
+
+    def __len__(self):
+        return len(self._data)
+
+    def load(self):
+        """Cargar entradas vigentes desde disco"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except Exception as e:
+            print(f"Error cargando cache desde {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, (value, expires_at) in stored.items():
+                if expires_at > now:
+                    self._data[key] = (value, expires_at)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        print(f"💾 Cache cargada desde {self.path} ({len(self._data)} entradas)")
+
+    def save(self):
+        """Escribir la cache en disco de forma atómica"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._data)
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error guardando cache en {self.path}: {e}")
+
+    def stats(self):
+        """Contadores de la cache"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": bool(self.path),
+            "shared": self.namespace if self.shared is not None else None,
+            "shared_hits": self.shared_hits,
+        }
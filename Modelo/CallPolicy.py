@@ -0,0 +1,185 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import openai
+
+from Metrics import LLM_HEDGES, LLM_RETRIES
+
+# Errores que vale la pena reintentar (el resto son del request y se repetirían)
+TRANSIENT = (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def transient_reason(error):
+    """Etiqueta del error transitorio para las métricas, o None si no lo es"""
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.InternalServerError):
+        return "server"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return None
+
+
+def _retry_after(error):
+    # Azure indica cuánto esperar en los 429
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class CallPolicy:
+    """Plazo, reintentos con jitter y solicitud de respaldo (hedging) para
+    las llamadas al LLM de una etapa (`purpose`: sql, answer)"""
+
+    def __init__(self, purpose, timeout=None, retries=None, backoff=None, hedge=None,
+                 attempt_timeout=None, admission=None):
+        prefix = f"LLM_{purpose.upper()}"
+        self.purpose = purpose
+        # Plazo total de la etapa (todos los intentos incluidos)
+        self.timeout = timeout or float(os.getenv(f"{prefix}_TIMEOUT", os.getenv("LLM_TIMEOUT", "30")))
+        self.retries = retries if retries is not None else int(os.getenv("LLM_RETRIES", "2"))
+        # Plazo de cada intento (salvo el último, que usa lo que quede de la
+        # etapa): por defecto una parte igual del plazo total por intento
+        attempt_timeout = attempt_timeout or os.getenv(f"{prefix}_ATTEMPT_TIMEOUT", os.getenv("LLM_ATTEMPT_TIMEOUT"))
+        self.attempt_timeout = float(attempt_timeout) if attempt_timeout else self.timeout / (self.retries + 1)
+        self.backoff = backoff or float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+        if hedge is None:
+            hedge = os.getenv(f"{prefix}_HEDGE", os.getenv("LLM_HEDGE", "false")).lower() in ("1", "true", "yes")
+        self.hedge = hedge
+        # El respaldo sale tras el percentil `hedge_quantile` de las latencias recientes
+        self.hedge_quantile = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self._latencies = deque(maxlen=200)
+        # Control de admisión: el respaldo ocupa un lugar propio o no se lanza
+        self.admission = admission
+
+    def hedge_delay(self):
+        """Espera antes del respaldo (None: sin respaldo o sin historial suficiente)"""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))
+        return max(self.hedge_min_delay, ordered[index])
+
+    def _backoff(self, attempt, error, remaining):
+        """Espera antes del siguiente intento: exponencial con jitter completo"""
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+        return min(delay, max(0.0, remaining))
+
+    def _attempt_budget(self, attempt, remaining):
+        """Plazo del intento: acotado para que un intento colgado deje tiempo a
+        los reintentos; el último se queda con todo lo que resta"""
+        if attempt >= self.retries:
+            return remaining
+        return min(self.attempt_timeout, remaining)
+
+    async def call(self, make_call, allow_hedge=True, tokens=0):
+        """Ejecutar `make_call()` (corrutina nueva por intento) dentro del plazo,
+        reintentando errores transitorios. `tokens` estima el tamaño de la
+        llamada para admitir el respaldo. Lanza el último error si se agota"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                return await asyncio.wait_for(self._attempt(make_call, allow_hedge, tokens),
+                                              self._attempt_budget(attempt, remaining))
+            except TRANSIENT as e:
+                reason = transient_reason(e)
+                remaining = deadline - time.monotonic()
+                if attempt >= self.retries or remaining <= 0:
+                    raise
+                delay = self._backoff(attempt, e, remaining)
+                attempt += 1
+                LLM_RETRIES.inc(purpose=self.purpose, reason=reason)
+                print(f"🔁 Reintento {attempt}/{self.retries} de la llamada al LLM ({self.purpose}, {reason}) en {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, make_call, allow_hedge, tokens):
+        start = time.monotonic()
+        delay = self.hedge_delay() if allow_hedge else None
+        if delay is None:
+            result = await make_call()
+            self._latencies.append(time.monotonic() - start)
+            return result
+
+        primary = asyncio.ensure_future(make_call())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            self._latencies.append(time.monotonic() - start)
+            return primary.result()
+
+        # La primera va lenta: lanzar un respaldo (si hay lugar libre sin
+        # esperar en la cola) y quedarse con la que termine antes
+        admitted_at = None
+        if self.admission is not None:
+            if not await self.admission.try_acquire(tokens, self.purpose):
+                LLM_HEDGES.inc(purpose=self.purpose, outcome="skipped")
+                result = await primary
+                self._latencies.append(time.monotonic() - start)
+                return result
+            admitted_at = time.monotonic()
+        LLM_HEDGES.inc(purpose=self.purpose, outcome="fired")
+        backup = asyncio.ensure_future(make_call())
+        if admitted_at is not None:
+            # El lugar se libera al terminar el respaldo (también si se cancela)
+            backup.add_done_callback(lambda _: self.admission.release(admitted_at))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished = [task for task in done if task.exception() is None]
+                if finished or not pending:
+                    # Si una falló, se espera la otra; si fallan las dos, se propaga el error
+                    task = finished[0] if finished else done.pop()
+                    if task is backup:
+                        LLM_HEDGES.inc(purpose=self.purpose, outcome="won")
+                    self._latencies.append(time.monotonic() - start)
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def call_sync(self, make_call):
+        """Versión bloqueante: `make_call(plazo del intento)` con reintentos (sin respaldo)"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                return make_call(self._attempt_budget(attempt, remaining))
+            except TRANSIENT as e:
+                reason = transient_reason(e)
+                remaining = deadline - time.monotonic()
+                if attempt >= self.retries or remaining <= 0:
+                    raise
+                delay = self._backoff(attempt, e, remaining)
+                attempt += 1
+                LLM_RETRIES.inc(purpose=self.purpose, reason=reason)
+                print(f"🔁 Reintento {attempt}/{self.retries} de la llamada al LLM ({self.purpose}, {reason}) en {delay:.2f}s")
+                time.sleep(delay)
+
+    def stats(self):
+        delay = self.hedge_delay()
+        return {
+            "timeout": self.timeout,
+            "attempt_timeout": self.attempt_timeout,
+            "retries": self.retries,
+            "hedge": self.hedge,
+            "hedge_delay_ms": round(1000 * delay, 1) if delay is not None else None,
+            "samples": len(self._latencies),
+        }
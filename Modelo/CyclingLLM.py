@@ -1,241 +1,347 @@
 import os
-import psycopg2
-from openai import AzureOpenAI
+import time
+import asyncio
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
-import re
+from SchemaCache import SchemaCache
+from Cache import TTLCache
+from ResultCache import ResultCache
+from Router import IntentRouter
+from Normalizer import QuestionNormalizer
+from QueryGuard import QueryGuard, QueryRejected
+from ResultPages import ResultSets, count_rows, read_page, results_count
+from AnswerRenderer import data_summary, render_answer, render_fallback
+from Metrics import StageTimer, stage, record_llm_usage, ERRORS, LLM_REQUESTS, QUESTIONS, QUESTION_SECONDS, COALESCED
+from SingleFlight import SingleFlight
+from Admission import AdmissionController, Overloaded
+from CallPolicy import CallPolicy
+from SqlCanon import question_shape, question_constants, mention_catalog, sql_template, fill_template
+from Palmares import PROMPT_HINT
+from EntityIndex import EntityIndex, render_mentions
+from DBPool import get_pool, db_config_from_env
+from SharedCache import get_shared_store
 
 # Cargar variables de entorno
 load_dotenv()
 
+NO_DATA_ANSWER = "No encontré datos para responder tu pregunta en la base de datos."
+ANSWER_ERROR = "No pude generar una respuesta en este momento."
+
+def estimate_tokens(messages):
+    """Estimación aproximada de tokens (~4 caracteres por token)"""
+    return sum(len(message["content"]) for message in messages) // 4 + 1
+
 class CyclingLLM:
     def __init__(self):
-        # Configurar conexión a PostgreSQL
-        self.db_config = {
-            "host": os.getenv("DB_HOST", "localhost"),
-            "port": os.getenv("DB_PORT", "5432"),
-            "database": os.getenv("DB_NAME", "WebCycling"),
-            "user": os.getenv("DB_USER", "postgres"),
-            "password": os.getenv("DB_PASSWORD", "")
-        }
+        # Configurar conexión a PostgreSQL (pool compartido)
+        self.db_config = db_config_from_env()
+        self.pool = get_pool()
         
-        # Configurar Azure OpenAI
+        # Configurar Azure OpenAI (sin reintentos propios del SDK: los maneja CallPolicy)
         self.client = AzureOpenAI(
             api_key=os.getenv('AZURE_OPENAI_API_KEY'),
             api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
-            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT')
+            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
+            max_retries=0
+        )
+        self.async_client = AsyncAzureOpenAI(
+            api_key=os.getenv('AZURE_OPENAI_API_KEY'),
+            api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
+            azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
+            max_retries=0
         )
         self.deployment_name = os.getenv('AZURE_OPENAI_DEPLOYMENT')
 
-    def connect_db(self):
-        """Conectar a PostgreSQL"""
-        try:
-            return psycopg2.connect(**self.db_config)
-        except Exception as e:
-            print(f"Error conectando a la base de datos: {e}")
-            return None
-    
+        # Límites de concurrencia por etapa del pipeline asíncrono
+        db_concurrency = int(os.getenv("DB_CONCURRENCY", str(self.pool.maxconn)))
+        self.limits = {
+            "db": asyncio.Semaphore(db_concurrency),
+        }
+        # Llamadas al LLM: cola acotada, máximo en curso y cuota del despliegue
+        # (las respuestas desde cache o el router no pasan por aquí)
+        self.admission = AdmissionController()
+        # Plazo, reintentos y solicitud de respaldo por etapa
+        self.policies = {"sql": CallPolicy("sql", admission=self.admission),
+                         "answer": CallPolicy("answer", admission=self.admission)}
+        # Hilos para el trabajo bloqueante (psycopg2, esquema)
+        self.executor = ThreadPoolExecutor(max_workers=db_concurrency + 2, thread_name_prefix="cycling-db")
+
+        # Almacén compartido entre workers (SHARED_CACHE_PATH): las caches
+        # calculadas por un proceso sirven a los demás
+        self.shared_store = get_shared_store()
+
+        # Cache del esquema y catálogo (se invalida solo si la BD cambia)
+        self.schema_cache = SchemaCache(self.pool, shared=self.shared_store)
+
+        # Cache pregunta normalizada -> SQL (evita la llamada al LLM)
+        self.sql_cache = TTLCache(
+            maxsize=int(os.getenv("SQL_CACHE_SIZE", "1000")),
+            ttl=float(os.getenv("SQL_CACHE_TTL", "86400")),
+            path=os.getenv("SQL_CACHE_PATH") or None,
+            shared=self.shared_store,
+            namespace="sql"
+        )
+
+        # Cache SQL -> resultados, invalidada cuando se escriben las tablas leídas
+        self.result_cache = ResultCache(self.pool, shared=self.shared_store)
+
+        # Guardián de costo y tiempo para el SQL generado por el LLM
+        self.query_guard = QueryGuard()
+
+        # Paginación: filas leídas por consulta y filas por página de la API
+        self.fetch_size = int(os.getenv("QUERY_FETCH_SIZE", "500"))
+        self.page_size = int(os.getenv("RESULTS_PAGE_SIZE", "10"))
+        self.result_sets = ResultSets(shared=self.shared_store)
+
+        # Redacción de la respuesta: plantillas locales salvo que se pida el LLM
+        # (globalmente, por intención o por petición)
+        self.llm_phrasing = os.getenv("ANSWER_LLM_PHRASING", "false").lower() in ("1", "true", "yes")
+        self.llm_phrasing_intents = {intent.strip() for intent in os.getenv("ANSWER_LLM_INTENTS", "").split(",") if intent.strip()}
+
+        # Calentamiento: abrir también la conexión con el LLM (una solicitud de 1 token)
+        self.warmup_llm = os.getenv("WARMUP_LLM", "true").lower() in ("1", "true", "yes")
+
+        # Máximo de nombres del catálogo que se incluyen en el prompt
+        self.catalog_top_k = int(os.getenv("CATALOG_TOP_K", "15"))
+
+        # Normalizador compilado una sola vez (sinónimos + años)
+        self.normalizer = QuestionNormalizer()
+
+        # Router de intenciones: formas comunes resueltas sin LLM
+        self.router = IntentRouter()
+
+        # Ciclistas y carreras de la pregunta resueltos a ids (se pone al día
+        # con las filas nuevas cuando cambia la versión de la BD)
+        self.entity_index = EntityIndex()
+        self._entities_token = None
+        self._entities_lock = threading.Lock()  # una sola actualización del índice a la vez
+
+        # Nombres de ciclistas para la forma de la pregunta (por token del catálogo)
+        self._mentions = []
+        self._mentions_token = None
+
+        # Preguntas idénticas en curso comparten una sola ejecución del pipeline
+        self.in_flight = SingleFlight()
+
     def get_database_schema(self):
-        """Extraer esquema real de la base de datos"""
-        conn = self.connect_db()
-        if not conn:
-            return "Error conectando a la base de datos"
-        
-        try:
-            cursor = conn.cursor()
-            
-            # Obtener información detallada de las tablas
-            cursor.execute("""
-                SELECT 
-                    t.table_name,
-                    c.column_name,
-                    c.data_type,
-                    CASE 
-                        WHEN tc.constraint_type = 'PRIMARY KEY' THEN 'PK'
-                        WHEN tc.constraint_type = 'FOREIGN KEY' THEN 'FK'
-                        ELSE ''
-                    END as constraint_info
-                FROM information_schema.tables t
-                JOIN information_schema.columns c ON t.table_name = c.table_name
-                LEFT JOIN information_schema.key_column_usage kcu ON c.table_name = kcu.table_name 
-                    AND c.column_name = kcu.column_name
-                LEFT JOIN information_schema.table_constraints tc ON kcu.constraint_name = tc.constraint_name
-                WHERE t.table_schema = 'public' 
-                    AND t.table_type = 'BASE TABLE'
-                ORDER BY t.table_name, c.ordinal_position;
-            """)
-            
-            results = cursor.fetchall()
-            
-            # Formatear el esquema
-            schema_dict = {}
-            for row in results:
-                table_name, column_name, data_type, constraint_info = row
-                if table_name not in schema_dict:
-                    schema_dict[table_name] = []
-                
-                column_info = f"{column_name} ({data_type})"
-                if constraint_info:
-                    column_info += f" {constraint_info}"
-                
-                schema_dict[table_name].append(column_info)
-            
-            # También obtener nombres de carreras disponibles
-            cursor.execute("SELECT DISTINCT nombre_carrera FROM carreras ORDER BY nombre_carrera;")
-            carreras_disponibles = [row[0] for row in cursor.fetchall()]
-            
-            # Construir texto del esquema
-            schema_text = "ESQUEMA DE BASE DE DATOS:\n\n"
-            for table, columns in schema_dict.items():
-                schema_text += f"Tabla: {table}\n"
-                for column in columns:
-                    schema_text += f"  - {column}\n"
-                schema_text += "\n"
-            
-            schema_text += f"CARRERAS DISPONIBLES EN LA BD:\n"
-            for carrera in carreras_disponibles:
-                schema_text += f"- {carrera}\n"
-            schema_text += "\n"
-            
-            cursor.close()
-            conn.close()
-            return schema_text
-            
-        except Exception as e:
-            print(f"Error obteniendo esquema: {e}")
-            if conn:
-                conn.close()
+        """Obtener esquema de la base de datos desde la cache versionada"""
+        with stage("schema"):
+            schema = self.schema_cache.get()
+        if schema is None:
             return "Error obteniendo esquema de la base de datos"
+        return schema
 
     def normalize_year(self, text):
         """Convertir años en formato coloquial a formato completo"""
-        year_patterns = [
-            r"\b'?(\d{2})\'?\b",  # '46, 46', 46
-            r"\b(\d{4})\b"        # 1946
-        ]
-        
-        normalized_text = text
-        for pattern in year_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if len(match) == 2:  # Año de 2 dígitos
-                    year_num = int(match)
-                    if year_num >= 0 and year_num <= 30:  # 00-30 = 2000-2030
-                        full_year = 2000 + year_num
-                    else:  # 31-99 = 1931-1999
-                        full_year = 1900 + year_num
-                    
-                    # Reemplazar en el texto
-                    old_patterns = [f"'{match}'", f"'{match}", f"{match}'", f"{match}"]
-                    for old_pattern in old_patterns:
-                        if old_pattern in normalized_text:
-                            normalized_text = normalized_text.replace(old_pattern, str(full_year))
-                            break
-        
-        return normalized_text
+        return self.normalizer.normalize_year(text)
 
     def normalize_question(self, question):
         """Normalizar la pregunta para manejar lenguaje coloquial"""
-        question = question.lower()
-        
-        # Normalizar años
-        question = self.normalize_year(question)
-        
-        # Sinónimos y términos coloquiales
-        replacements = {
-            # Carreras
-            'nacionales': 'nacional',
-            'nacional de ruta': 'nacional',
-            'nacionales de ruta': 'nacional',
-            'campeonato nacional': 'nacional',
-            'campeonatos nacionales': 'nacional',
-            
-            # Posiciones y logros múltiples
-            'podio': 'posicion <= 3',
-            'podium': 'posicion <= 3',
-            'podios': 'posicion <= 3',
-            'los 3 primeros': 'posicion <= 3',
-            'top 3': 'posicion <= 3',
-            'primeros tres': 'posicion <= 3',
-            'mas podios': 'count podios',
-            'más podios': 'count podios',
-            'con mas podios': 'count podios',
-            'con más podios': 'count podios',
-            'mayor cantidad de podios': 'count podios',
-            'más triunfos': 'count victorias',
-            'mas triunfos': 'count victorias',
-            'más victorias': 'count victorias',
-            'mas victorias': 'count victorias',
-            
-            # Ganadores
-            'campeón': 'posicion = 1',
-            'campeon': 'posicion = 1',
-            'ganador': 'posicion = 1',
-            'quien ganó': 'posicion = 1',
-            'quien gano': 'posicion = 1',
-            'el que ganó': 'posicion = 1',
-            'el que gano': 'posicion = 1',
-            
-            # Años
-            'año a año': 'por año',
-            'todos los años': 'por año',
-            'cada año': 'por año',
-        }
-        
-        for old, new in replacements.items():
-            question = question.replace(old, new)
-        
-        return question
+        with stage("normalize"):
+            return self.normalizer.normalize(question)
 
-    def execute_query(self, query):
-        """Ejecutar consulta SQL y retornar resultados"""
-        conn = self.connect_db()
-        if not conn:
-            return None, "Error de conexión a la base de datos"
+    def execute_query(self, query, params=None, trusted=False):
+        """Ejecutar consulta SQL y retornar resultados (a lo sumo fetch_size
+        filas). Las consultas no confiables (generadas por el LLM) pasan antes
+        por el guardián"""
+        with stage("execute_query"):
+            return self._execute_query(query, params, trusted)
+    
+    def _execute_query(self, query, params, trusted):
+        cached = self.result_cache.get(query, params)
+        if cached is not None:
+            return cached, None
         
+        # Generaciones tomadas antes de ejecutar: una escritura concurrente
+        # invalida la entrada en lugar de dejar un resultado viejo
+        snapshot = self.result_cache.snapshot(query)
         try:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            
-            # Convertir a lista de diccionarios
-            data = []
-            for row in results:
-                row_dict = {}
-                for i, value in enumerate(row):
-                    if hasattr(value, 'isoformat'):  # datetime objects
-                        row_dict[columns[i]] = value.isoformat()
-                    else:
-                        row_dict[columns[i]] = value
-                data.append(row_dict)
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                query_to_run = self.query_guard.apply(cursor, query, params, explain=not trusted)
+                cursor.close()
+                # Cursor del servidor: la memoria no depende del tamaño del resultado
+                data = read_page(conn, query_to_run, params, 0, self.fetch_size)
+                if data.has_more:
+                    data.total = self._count_rows(conn, query_to_run, params)
             
-            cursor.close()
-            conn.close()
+            self.result_cache.set(query, data, snapshot, params)
             return data, None
         
+        except QueryRejected as e:
+            ERRORS.inc(stage="query_guard")
+            return None, str(e)
+        
         except Exception as e:
+            ERRORS.inc(stage="execute_query")
             error_msg = f"Error ejecutando consulta: {str(e)}"
             print(error_msg)
-            if conn:
-                conn.close()
             return None, error_msg
     
-    def generate_sql_query(self, user_question):
-        """Generar consulta SQL con mejor comprensión coloquial y estadísticas"""
+    def _count_rows(self, conn, query, params):
+        """Total real de un resultado que no cupo en fetch_size (None si el
+        conteo falla o excede el statement_timeout del guardián)"""
+        try:
+            return count_rows(conn, query, params)
+        except Exception as e:
+            print(f"⚠️ No se pudo contar el total de resultados: {e}")
+            return None
+
+    def fetch_results(self, result_id, cursor=0, limit=None):
+        """Leer la página de resultados que empieza en `cursor`"""
+        entry = self.result_sets.get(result_id)
+        if entry is None:
+            return self._error_response("Los resultados no existen o expiraron; vuelve a hacer la pregunta.")
         
-        # Normalizar la pregunta
+        cursor = max(0, cursor)
+        limit = max(1, min(limit or self.page_size, self.fetch_size))
+        try:
+            with self.pool.connection() as conn:
+                # La consulta ya pasó el guardián al registrarse: solo el límite de tiempo
+                guard_cursor = conn.cursor()
+                self.query_guard.apply(guard_cursor, entry["query"], entry["params"], explain=False)
+                guard_cursor.close()
+                page = read_page(conn, entry["query"], entry["params"], cursor, limit)
+        except Exception as e:
+            error_msg = f"Error leyendo resultados: {str(e)}"
+            print(error_msg)
+            return self._error_response(error_msg)
+        
+        return {
+            "success": True,
+            "error": None,
+            "data": {
+                "result_id": result_id,
+                "cursor": cursor,
+                "rows": list(page),
+                "count": len(page),
+                "has_more": page.has_more,
+                "next_cursor": cursor + len(page) if page.has_more else None
+            }
+        }
+    
+    async def _offload(self, func, *args):
+        """Ejecutar una función bloqueante en el pool de hilos acotado"""
+        loop = asyncio.get_running_loop()
+        # Copiar el contexto para que las etapas medidas en el hilo cuenten en la pregunta
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    async def aexecute_query(self, query, params=None, trusted=False):
+        """Versión asíncrona de execute_query"""
+        async with self.limits["db"]:
+            return await self._offload(self.execute_query, query, params, trusted)
+
+    async def afetch_results(self, result_id, cursor=0, limit=None):
+        """Versión asíncrona de fetch_results"""
+        async with self.limits["db"]:
+            return await self._offload(self.fetch_results, result_id, cursor, limit)
+
+    def route_question(self, user_question):
+        """Resolver la pregunta con el router local (None si no aplica)"""
         normalized_question = self.normalize_question(user_question)
-        schema = self.get_database_schema()
+        self.get_database_schema()  # catálogo de carreras para el slot de carrera
+        mentions = self.resolve_entities(user_question)
+        riders = [mention for mention in mentions if mention.kind == "ciclista"]
+        with stage("route"):
+            return self.router.route(normalized_question, self.schema_cache.carreras,
+                                     aggregates=self.has_palmares(),
+                                     rider_ids=riders[0].ids if len(riders) == 1 else (),
+                                     mentions_race=any(mention.kind == "carrera" for mention in mentions))
+
+    def resolve_entities(self, user_question):
+        """Ciclistas y carreras mencionados en la pregunta, resueltos a ids"""
+        token = self.schema_cache.catalog_token
+        # Si otro hilo ya lo está actualizando, usar el índice vigente sin esperar
+        if token is not None and token != self._entities_token and self._entities_lock.acquire(blocking=False):
+            try:
+                if token != self._entities_token:
+                    with self.pool.connection() as conn:
+                        cursor = conn.cursor()
+                        self.entity_index.refresh(cursor)
+                        cursor.close()
+                    self._entities_token = token
+            except Exception as e:
+                # Sin base de datos: seguir con el índice que haya
+                print(f"Error actualizando índice de entidades: {e}")
+            finally:
+                self._entities_lock.release()
+        with stage("entities"):
+            return self.entity_index.resolve(self.normalize_year(user_question))
+
+    def lookup_sql(self, user_question):
+        """Buscar SQL ya generado para la pregunta normalizada y el esquema vigente"""
+        normalized_question = self.normalize_question(user_question)
+        self.get_database_schema()  # asegura que la versión del esquema esté al día
+        if self.schema_cache.version is None:
+            # Sin esquema no hay versión con la que validar la cache
+            return normalized_question, None, None
+        cache_key = f"{self.schema_cache.version}|{normalized_question}"
+        sql_query = self.sql_cache.get(cache_key)
+        if sql_query is None:
+            # Misma forma con otros años o ciclistas: reutilizar el SQL con sus valores
+            shape, numbers, names = question_shape(normalized_question, self.mention_catalog())
+            template = self.sql_cache.get(f"{self.schema_cache.version}|forma|{shape}")
+            if template is not None:
+                sql_query = fill_template(template, numbers, names, self.rider_ids(names))
+                if sql_query:
+                    print(f"🧩 SQL reutilizado por forma de pregunta: {shape}")
+        return normalized_question, cache_key, sql_query
+
+    def remember_sql(self, cache_key, normalized_question, sql_query):
+        """Guardar el SQL generado para la pregunta y, si se puede, para su forma"""
+        self.sql_cache.set(cache_key, sql_query)
+        shape, numbers, names = question_shape(normalized_question, self.mention_catalog())
+        template = sql_template(sql_query, numbers, names, self.rider_ids(names),
+                                question_constants(normalized_question))
+        if template is not None:
+            self.sql_cache.set(f"{self.schema_cache.version}|forma|{shape}", template)
+
+    def mention_catalog(self):
+        """Nombres de ciclistas para reconocerlos en la forma de la pregunta.
+        Por token del catálogo: la versión del esquema no cambia al agregar ciclistas"""
+        token = self.schema_cache.catalog_token
+        if self._mentions_token != token:
+            self._mentions = mention_catalog(self.schema_cache.ciclistas)
+            self._mentions_token = token
+        return self._mentions
+
+    def rider_ids(self, names):
+        """Ids de ciclistas por nombre exacto (None si el índice no lo tiene)"""
+        return [self.entity_index.rider_id(name) for name in names]
+
+    def has_palmares(self):
+        """Las tablas de palmarés agregado existen en la BD (ver Palmares.py)"""
+        return "palmares_ciclistas" in self.schema_cache.tables
+
+    def build_sql_request(self, user_question, normalized_question=None):
+        """Construir la petición al LLM para generar la consulta SQL"""
+        
+        # Normalizar la pregunta
+        if normalized_question is None:
+            normalized_question = self.normalize_question(user_question)
+        
+        # Solo los nombres de carreras/ciclistas relevantes para la pregunta
+        with stage("prompt"):
+            schema = self.schema_cache.schema_for(f"{user_question} {normalized_question}", self.catalog_top_k)
+        if schema is None:
+            schema = "Error obteniendo esquema de la base de datos"
+        palmares = PROMPT_HINT if self.has_palmares() else ""
+        entities = render_mentions(self.resolve_entities(user_question))
         
         prompt = f"""Eres un experto en SQL para ciclismo colombiano. Genera consultas SQL precisas para estadísticas y conteos.
 
 {schema}
-
+{palmares}{entities}
 REGLAS CRÍTICAS:
 1. Genera SOLO código SQL válido, sin explicaciones
 2. El nombre exacto de las carreras es "Campeonato Nacional de Ruta"
 3. Para búsquedas de carreras nacionales usa: nombre_carrera ILIKE '%nacional%'
-4. Para búsquedas de ciclistas usa ILIKE '%nombre%' (coincidencias parciales)
+4. Ciclistas y carreras de ENTIDADES IDENTIFICADAS: filtra con el id indicado (r.ciclista_id, r.carrera_id). Para otros ciclistas usa ILIKE '%nombre%'
 5. SIEMPRE incluye año, nombre_ciclista, posicion en SELECT cuando sea relevante
 
 TÉRMINOS ESPECIALES PARA ESTADÍSTICAS:
@@ -291,85 +397,110 @@ Pregunta normalizada: {normalized_question}
 
 SQL:"""
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.0,
-                max_tokens=500
-            )
-            
-            sql_query = response.choices[0].message.content.strip()
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
+        return {
+            "model": self.deployment_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0,
+            "max_tokens": 500
+        }
+
+    def parse_sql_response(self, response):
+        """Extraer la consulta SQL de la respuesta del LLM"""
+        sql_query = response.choices[0].message.content.strip()
+        sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
+        
+        if not sql_query.upper().startswith('SELECT'):
+            return None
             
-            if not sql_query.upper().startswith('SELECT'):
-                return None
-                
-            return sql_query
+        return sql_query
+
+    def generate_sql(self, user_question):
+        """Generar consulta SQL y retornar (sql, info) con datos de cache y tokens"""
+        normalized_question, cache_key, sql_query = self.lookup_sql(user_question)
+        if sql_query:
+            return sql_query, {"sql_cached": True, "prompt_tokens": 0}
+        
+        request = self.build_sql_request(user_question, normalized_question)
+        try:
+            with stage("sql_generation"):
+                response = self.policies["sql"].call_sync(
+                    lambda budget: self.client.chat.completions.create(timeout=budget, **request))
+            sql_query = self.parse_sql_response(response)
         
         except Exception as e:
             print(f"Error generando consulta SQL: {e}")
-            return None
+            LLM_REQUESTS.inc(purpose="sql", status="error")
+            ERRORS.inc(stage="sql_generation")
+            return None, {"sql_cached": False, "prompt_tokens": None}
+        
+        self._record_sql_response(response, sql_query)
+        if sql_query and cache_key:
+            self.remember_sql(cache_key, normalized_question, sql_query)
+        return sql_query, self._prompt_info(request, response)
+
+    def generate_sql_query(self, user_question):
+        """Generar consulta SQL con mejor comprensión coloquial y estadísticas"""
+        return self.generate_sql(user_question)[0]
+
+    async def agenerate_sql(self, user_question):
+        """Versión asíncrona de generate_sql"""
+        # El esquema puede requerir la base de datos: resolver fuera del event loop
+        normalized_question, cache_key, sql_query = await self._offload(self.lookup_sql, user_question)
+        if sql_query:
+            return sql_query, {"sql_cached": True, "prompt_tokens": 0}
+        
+        request = await self._offload(self.build_sql_request, user_question, normalized_question)
+        try:
+            tokens = self.request_tokens(request)
+            async with self.admission.admit(tokens, "sql"):
+                with stage("sql_generation"):
+                    response = await self.policies["sql"].call(
+                        lambda: self.async_client.chat.completions.create(**request),
+                        allow_hedge=not self.admission.waiting, tokens=tokens)
+            sql_query = self.parse_sql_response(response)
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"Error generando consulta SQL: {e}")
+            LLM_REQUESTS.inc(purpose="sql", status="error")
+            ERRORS.inc(stage="sql_generation")
+            return None, {"sql_cached": False, "prompt_tokens": None}
+        
+        self._record_sql_response(response, sql_query)
+        if sql_query and cache_key:
+            self.remember_sql(cache_key, normalized_question, sql_query)
+        return sql_query, self._prompt_info(request, response)
+
+    async def agenerate_sql_query(self, user_question):
+        """Versión asíncrona de generate_sql_query"""
+        return (await self.agenerate_sql(user_question))[0]
+
+    def _record_sql_response(self, response, sql_query):
+        """Contadores de la llamada al LLM para SQL"""
+        LLM_REQUESTS.inc(purpose="sql", status="ok")
+        record_llm_usage("sql", response)
+        if not sql_query:
+            ERRORS.inc(stage="sql_generation")
+
+    def _prompt_info(self, request, response):
+        """Tokens del prompt SQL: los reportados por el LLM o una estimación"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(request["messages"])
+        print(f"🧮 Tokens del prompt SQL: {prompt_tokens}")
+        return {"sql_cached": False, "prompt_tokens": prompt_tokens}
     
-    def generate_answer(self, user_question, query_results):
-        """Generar respuesta final con mejor manejo de estadísticas"""
+    def build_answer_request(self, user_question, query_results):
+        """Construir la petición al LLM para redactar la respuesta final"""
         
-        if not query_results:
-            return "No encontré datos para responder tu pregunta en la base de datos."
-        
-        # Detectar si es una consulta de estadísticas
-        has_count_column = any('total_' in str(key) or 'count' in str(key).lower() 
-                                for row in query_results for key in row.keys())
-        
-        # Crear interpretación clara de los datos
-        data_summary = "INTERPRETACIÓN CLARA DE LOS DATOS:\n"
-        
-        if has_count_column:
-            # Manejo especial para estadísticas
-            data_summary += "\n*** ESTADÍSTICAS DE CICLISTAS ***\n"
-            for i, row in enumerate(query_results, 1):
-                ciclista = row.get('nombre_ciclista', 'No especificado')
-                total_podios = row.get('total_podios', 0)
-                total_victorias = row.get('total_victorias', 0)
-                
-                data_summary += f"\n{i}. {ciclista}:\n"
-                if total_podios > 0:
-                    data_summary += f"   - Total de podios: {total_podios}\n"
-                if total_victorias > 0:
-                    data_summary += f"   - Total de victorias: {total_victorias}\n"
-                
-                # Interpretación automática
-                if i == 1:  # El primero en la lista
-                    if total_podios > 0:
-                        data_summary += f"   *** {ciclista} ES EL CICLISTA CON MÁS PODIOS ({total_podios}) ***\n"
-                    if total_victorias > 0:
-                        data_summary += f"   *** {ciclista} ES EL CICLISTA CON MÁS VICTORIAS ({total_victorias}) ***\n"
-        else:
-            # Manejo normal para resultados individuales
-            for i, row in enumerate(query_results, 1):
-                data_summary += f"\nRegistro {i}:\n"
-                
-                ciclista = row.get('nombre_ciclista', 'No especificado')
-                año = row.get('año', 'No especificado')
-                posicion = row.get('posicion', 'No especificada')
-                carrera = row.get('nombre_carrera', 'No especificada')
-                
-                data_summary += f"  - Ciclista: {ciclista}\n"
-                data_summary += f"  - Año: {año}\n"
-                data_summary += f"  - Posición: {posicion}\n"
-                data_summary += f"  - Carrera: {carrera}\n"
-                
-                # Interpretación automática de la posición
-                if posicion == 1:
-                    data_summary += f"  *** {ciclista} FUE EL GANADOR/CAMPEÓN en {año} ***\n"
-                elif posicion == 2:
-                    data_summary += f"  *** {ciclista} quedó SEGUNDO en {año} ***\n"
-                elif posicion == 3:
-                    data_summary += f"  *** {ciclista} quedó TERCERO en {año} ***\n"
+        # Interpretación de los datos (la misma que usan las plantillas)
+        summary = data_summary(query_results)
 
         prompt = f"""Eres un experto en ciclismo colombiano. Responde basándote ÚNICAMENTE en estos datos interpretados.
 
-{data_summary}
+{summary}
 
 REGLAS SIMPLES:
 1. Los datos ya están interpretados arriba
@@ -383,78 +514,470 @@ Pregunta: {user_question}
 
 Respuesta natural:"""
 
+        return {
+            "model": self.deployment_name,
+            "messages": [
+                {"role": "system", "content": "Eres un experto comentarista de ciclismo colombiano. Respondes basándote únicamente en los datos proporcionados, sin inventar información."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.0,
+            "max_tokens": 800
+        }
+
+    def generate_answer(self, user_question, query_results):
+        """Generar respuesta final con mejor manejo de estadísticas"""
+        
+        if not query_results:
+            return NO_DATA_ANSWER
+        
+        request = self.build_answer_request(user_question, query_results)
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=[
-                    {"role": "system", "content": "Eres un experto comentarista de ciclismo colombiano. Respondes basándote únicamente en los datos proporcionados, sin inventar información."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.0,
-                max_tokens=800
-            )
-            
+            with stage("answer_llm"):
+                response = self.policies["answer"].call_sync(
+                    lambda budget: self.client.chat.completions.create(timeout=budget, **request))
+            LLM_REQUESTS.inc(purpose="answer", status="ok")
+            record_llm_usage("answer", response)
+            return response.choices[0].message.content.strip()
+        
+        except Exception as e:
+            print(f"Error generando respuesta: {e}")
+            LLM_REQUESTS.inc(purpose="answer", status="error")
+            ERRORS.inc(stage="answer_llm")
+            return ANSWER_ERROR
+
+    async def agenerate_answer(self, user_question, query_results):
+        """Versión asíncrona de generate_answer"""
+        
+        if not query_results:
+            return NO_DATA_ANSWER
+        
+        request = self.build_answer_request(user_question, query_results)
+        try:
+            tokens = self.request_tokens(request)
+            async with self.admission.admit(tokens, "answer"):
+                with stage("answer_llm"):
+                    response = await self.policies["answer"].call(
+                        lambda: self.async_client.chat.completions.create(**request),
+                        allow_hedge=not self.admission.waiting, tokens=tokens)
+            LLM_REQUESTS.inc(purpose="answer", status="ok")
+            record_llm_usage("answer", response)
             return response.choices[0].message.content.strip()
         
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"Error generando respuesta: {e}")
+            LLM_REQUESTS.inc(purpose="answer", status="error")
+            ERRORS.inc(stage="answer_llm")
+            return ANSWER_ERROR
+
+    async def astream_answer(self, user_question, query_results):
+        """Generar la respuesta final como fragmentos de texto a medida que llegan"""
+        
+        if not query_results:
+            yield NO_DATA_ANSWER
+            return
+        
+        request = self.build_answer_request(user_question, query_results)
+        sent = False
+        try:
+            async with self.admission.admit(self.request_tokens(request), "answer"):
+                with stage("answer_llm"):
+                    # Plazo y reintentos solo hasta abrir el stream: después ya se envió texto
+                    stream = await self.policies["answer"].call(
+                        lambda: self.async_client.chat.completions.create(stream=True, **request),
+                        allow_hedge=False)
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            sent = True
+                            yield chunk.choices[0].delta.content
+            LLM_REQUESTS.inc(purpose="answer", status="ok")
+        
+        except Overloaded:
+            raise
         except Exception as e:
             print(f"Error generando respuesta: {e}")
-            return "No pude generar una respuesta en este momento."
+            LLM_REQUESTS.inc(purpose="answer", status="error")
+            ERRORS.inc(stage="answer_llm")
+            if not sent:
+                yield ANSWER_ERROR
     
-    def ask_question(self, user_question):
+    def request_tokens(self, request):
+        """Tokens que la solicitud descuenta de la cuota (prompt + máximo de salida)"""
+        return estimate_tokens(request["messages"]) + request.get("max_tokens", 0)
+
+    def wants_llm_phrasing(self, intent, phrasing=None):
+        """¿Redactar con el LLM? La petición manda; si no, la configuración por intención"""
+        if phrasing is not None:
+            return phrasing
+        return self.llm_phrasing or intent in self.llm_phrasing_intents
+
+    def render_local_answer(self, query_results, intent, phrasing=None):
+        """Respuesta con plantillas, o None si toca redactarla con el LLM"""
+        if not query_results:
+            return NO_DATA_ANSWER
+        if self.wants_llm_phrasing(intent, phrasing):
+            return None
+        with stage("answer_template"):
+            return render_answer(query_results)
+
+    def ask_question(self, user_question, phrasing=None):
         """Procesar pregunta completa del usuario - Método principal para API"""
+        timer = StageTimer()
+        token = timer.activate()
+        try:
+            result = self._ask_question(user_question, phrasing)
+        finally:
+            timer.deactivate(token)
+        self._record_question(result["data"], timer)
+        return result
+
+    def _ask_question(self, user_question, phrasing):
         print(f"\n🚴 Pregunta: {user_question}")
         
+        # 0. Formas conocidas: SQL parametrizado sin pasar por el LLM
+        routed = self.route_question(user_question)
+        if routed:
+            print(f"🧭 Intención local: {routed.intent} {routed.slots}")
+            results, error = self.execute_query(routed.sql, routed.params, trusted=True)
+            if not error and results:
+                answer = self.render_local_answer(results, routed.intent, phrasing)
+                answer_source = "template" if answer is not None else "llm"
+                if answer is None:
+                    answer = self.generate_answer(user_question, results)
+                return self._success_response(user_question, answer, routed.sql, results,
+                                              source="router", intent=routed.intent,
+                                              sql_params=list(routed.params),
+                                              answer_source=answer_source)
+            # Sin datos o con error: dejar que el LLM lo intente
+        
         # 1. Generar consulta SQL
-        sql_query = self.generate_sql_query(user_question)
+        sql_query, sql_info = self.generate_sql(user_question)
         if not sql_query:
-            return {
-                "success": False,
-                "error": "No pude generar una consulta SQL válida para tu pregunta.",
-                "data": None
-            }
+            return self._error_response("No pude generar una consulta SQL válida para tu pregunta.")
         
         print(f"📊 SQL generado: {sql_query}")
         
         # 2. Ejecutar consulta
         results, error = self.execute_query(sql_query)
         if error:
-            return {
-                "success": False,
-                "error": f"Error en la consulta: {error}",
-                "data": None
-            }
+            return self._error_response(f"Error en la consulta: {error}")
         
         print(f"📈 Resultados encontrados: {len(results) if results else 0} registros")
         
-        # 3. Generar respuesta final
-        answer = self.generate_answer(user_question, results)
+        # 3. Generar respuesta final (plantilla local o LLM)
+        answer = self.render_local_answer(results, "llm", phrasing)
+        answer_source = "template" if answer is not None else "llm"
+        if answer is None:
+            answer = self.generate_answer(user_question, results)
+        
+        return self._success_response(user_question, answer, sql_query, results, source="llm",
+                                      answer_source=answer_source, **sql_info)
+
+    async def aask_question(self, user_question, phrasing=None):
+        """Versión asíncrona de ask_question: no bloquea el event loop. Las
+        preguntas idénticas en curso comparten una sola ejecución"""
+        key = f"{phrasing}|{self.normalize_question(user_question)}"
+        result, shared = await self.in_flight.do(key, lambda: self._aask_question(user_question, phrasing))
+        if shared:
+            COALESCED.inc()
+            print(f"🔗 Pregunta coalescida con una ejecución en curso: {user_question}")
+        
+        # Copia por solicitud: quien la recibe puede modificarla. La pregunta es
+        # la de cada quien (la ejecución compartida pudo venir con otra redacción)
+        data = dict(result["data"]) if result["data"] is not None else None
+        if data is not None:
+            data["question"] = user_question
+            data["coalesced"] = shared
+        return {**result, "data": data}
+
+    async def _aask_question(self, user_question, phrasing):
+        async for event, payload in self._apipeline(user_question, stream_answer=False, phrasing=phrasing):
+            if event == "error":
+                # Rechazo del control de admisión: estado HTTP y Retry-After para la API
+                overload = {key: payload[key] for key in ("status_code", "retry_after") if key in payload}
+                return {**self._error_response(payload["error"]), **overload}
+            if event == "done":
+                return {"success": True, "error": None, "data": payload}
+
+    async def aask_batch(self, questions, concurrency=None, on_result=None, phrasing=None):
+        """Procesar varias preguntas: deduplica por pregunta normalizada y
+        ejecuta las únicas en paralelo con un límite de concurrencia"""
+        start = time.perf_counter()
+        if concurrency is None:
+            concurrency = int(os.getenv("BATCH_CONCURRENCY", "4"))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        # El esquema se obtiene una sola vez para todo el lote
+        await self._offload(self.get_database_schema)
+        
+        # Agrupar preguntas equivalentes
+        groups = {}
+        normalized = []
+        for question in questions:
+            key = self.normalize_question(question)
+            normalized.append(key)
+            groups.setdefault(key, question)
+        
+        async def run(key, question):
+            async with semaphore:
+                question_start = time.perf_counter()
+                result = await self.aask_question(question, phrasing)
+                result["elapsed_ms"] = round(1000 * (time.perf_counter() - question_start), 1)
+            if on_result:
+                on_result(key, result)
+            return key, result
+        
+        outcomes = dict(await asyncio.gather(*(run(key, question) for key, question in groups.items())))
+        
+        results = []
+        first_seen = set()
+        for question, key in zip(questions, normalized):
+            outcome = outcomes[key]
+            results.append({
+                "question": question,
+                "normalized_question": key,
+                "success": outcome["success"],
+                "data": outcome["data"],
+                "error": outcome["error"],
+                "elapsed_ms": outcome["elapsed_ms"],
+                "deduplicated": key in first_seen
+            })
+            first_seen.add(key)
+        
+        return {
+            "results": results,
+            "total_questions": len(questions),
+            "unique_questions": len(groups),
+            "elapsed_ms": round(1000 * (time.perf_counter() - start), 1)
+        }
+
+    def astream_question(self, user_question, phrasing=None):
+        """Procesar la pregunta emitiendo eventos (stage, results, token, done, error)"""
+        return self._apipeline(user_question, stream_answer=True, phrasing=phrasing)
+
+    async def _apipeline(self, user_question, stream_answer, phrasing=None):
+        """Pipeline asíncrono como secuencia de eventos (evento, datos)"""
+        # Cada pregunta corre en su propia tarea: el medidor no se comparte
+        timer = StageTimer()
+        timer.activate()
+        async for event, payload in self._apipeline_steps(user_question, stream_answer, phrasing):
+            if event == "done":
+                self._record_question(payload, timer)
+            elif event == "error":
+                self._record_question(None, timer)
+            yield event, payload
+
+    async def _apipeline_steps(self, user_question, stream_answer, phrasing):
+        print(f"\n🚴 Pregunta: {user_question}")
+        
+        sql_query, results, extra = None, None, None
         
+        # 0. Formas conocidas: SQL parametrizado sin pasar por el LLM
+        routed = await self._offload(self.route_question, user_question)
+        if routed:
+            print(f"🧭 Intención local: {routed.intent} {routed.slots}")
+            results, error = await self.aexecute_query(routed.sql, routed.params, trusted=True)
+            if not error and results:
+                sql_query = routed.sql
+                extra = {"source": "router", "intent": routed.intent, "sql_params": list(routed.params)}
+                yield "stage", {"stage": "sql", "sql_query": sql_query, **extra}
+            # Sin datos o con error: dejar que el LLM lo intente
+        
+        if sql_query is None:
+            # 1. Generar consulta SQL (LLM asíncrono, sujeto al control de admisión)
+            try:
+                sql_query, sql_info = await self.agenerate_sql(user_question)
+            except Overloaded as e:
+                yield "error", {"error": str(e), "status_code": e.status_code, "retry_after": e.retry_after}
+                return
+            if not sql_query:
+                yield "error", {"error": "No pude generar una consulta SQL válida para tu pregunta."}
+                return
+            
+            print(f"📊 SQL generado: {sql_query}")
+            extra = {"source": "llm", **sql_info}
+            yield "stage", {"stage": "sql", "sql_query": sql_query, **extra}
+            
+            # 2. Ejecutar consulta (psycopg2 en el pool de hilos)
+            results, error = await self.aexecute_query(sql_query)
+            if error:
+                yield "error", {"error": f"Error en la consulta: {error}"}
+                return
+        
+        print(f"📈 Resultados encontrados: {results_count(results)} registros")
+        yield "results", {
+            "results_count": results_count(results),
+            **self.first_page(results)
+        }
+        
+        # 3. Generar respuesta final: plantilla local (sin segunda llamada al LLM)...
+        answer = self.render_local_answer(results, extra.get("intent", extra["source"]), phrasing)
+        if answer is not None:
+            extra["answer_source"] = "template"
+            if stream_answer:
+                yield "token", {"text": answer}
+            yield "done", self._success_response(user_question, answer, sql_query, results, **extra)["data"]
+            return
+        
+        # ...o redactada por el LLM asíncrono (con la plantilla si no hay cupo)
+        extra["answer_source"] = "llm"
+        try:
+            if stream_answer:
+                parts = []
+                async for text in self.astream_answer(user_question, results):
+                    parts.append(text)
+                    yield "token", {"text": text}
+                answer = "".join(parts).strip()
+            else:
+                answer = await self.agenerate_answer(user_question, results)
+        except Overloaded:
+            extra["answer_source"] = "template"
+            extra["answer_degraded"] = True
+            with stage("answer_template"):
+                answer = render_fallback(results)
+            if stream_answer:
+                yield "token", {"text": answer}
+        
+        yield "done", self._success_response(user_question, answer, sql_query, results, **extra)["data"]
+
+    def first_page(self, results):
+        """Primera página de resultados y token de continuación si hay más"""
+        rows = list(results[:self.page_size]) if results else []
+        has_more = bool(results) and (len(results) > self.page_size or getattr(results, "has_more", False))
+        page = {"raw_results": rows, "has_more": has_more, "result_id": None, "next_cursor": None}
+        if has_more and getattr(results, "query", None):
+            page["result_id"] = self.result_sets.register(results)
+            page["next_cursor"] = len(rows)
+        return page
+
+    def _record_question(self, data, timer):
+        """Métricas de la pregunta completa y tiempos por etapa en la respuesta"""
+        source = data.get("source", "unknown") if data else "error"
+        answer_source = data.get("answer_source", "none") if data else "none"
+        QUESTIONS.inc(source=source, answer_source=answer_source)
+        QUESTION_SECONDS.observe(timer.elapsed(), source=source, answer_source=answer_source)
+        if data is not None:
+            data["timings_ms"] = timer.as_ms()
+
+    def _error_response(self, error):
+        return {
+            "success": False,
+            "error": error,
+            "data": None
+        }
+
+    def _success_response(self, user_question, answer, sql_query, results, **extra):
+        data = {
+            "question": user_question,
+            "answer": answer,
+            "results_count": results_count(results),
+            "sql_query": sql_query,  # Para debug si se necesita
+            **self.first_page(results)  # Solo la primera página para evitar payload grande
+        }
+        data.update(extra)
         return {
             "success": True,
             "error": None,
-            "data": {
-                "question": user_question,
-                "answer": answer,
-                "results_count": len(results) if results else 0,
-                "sql_query": sql_query,  # Para debug si se necesita
-                "raw_results": results[:10] if results else []  # Solo primeros 10 para evitar payload grande
-            }
+            "data": data
+        }
+
+    def runtime_metrics(self):
+        """Valores vigentes del pool y las caches para /metrics"""
+        pool = self.pool.stats()
+        caches = {
+            "schema": self.schema_cache.stats(),
+            "sql": self.sql_cache.stats(),
+            "result": self.result_cache.stats(),
         }
+        guard = self.query_guard.stats()
+        return [
+            ("cycling_db_pool_connections", "gauge", "Conexiones del pool por estado",
+             {(("state", "idle"),): pool["idle"], (("state", "in_use"),): pool["in_use"]}),
+            ("cycling_db_pool_checkouts_total", "counter", "Conexiones prestadas por el pool",
+             {(): pool["checkouts"]}),
+            ("cycling_db_pool_timeouts_total", "counter", "Esperas del pool que agotaron el tiempo",
+             {(): pool["timeouts"]}),
+            ("cycling_cache_hits_total", "counter", "Aciertos por cache",
+             {(("cache", name),): stats["hits"] for name, stats in caches.items()}),
+            ("cycling_cache_misses_total", "counter", "Fallos por cache",
+             {(("cache", name),): stats["misses"] for name, stats in caches.items()}),
+            ("cycling_cache_hit_ratio", "gauge", "Proporción de aciertos por cache",
+             {(("cache", name),): stats["hit_rate"] for name, stats in caches.items()}),
+            ("cycling_questions_in_flight", "gauge", "Ejecuciones del pipeline en curso (sin contar coalescidas)",
+             {(): self.in_flight.in_flight()}),
+            ("cycling_llm_in_flight", "gauge", "Llamadas al LLM admitidas en curso",
+             {(): self.admission.in_flight}),
+            ("cycling_llm_queue_depth", "gauge", "Llamadas al LLM esperando turno",
+             {(): self.admission.waiting}),
+            ("cycling_query_guard_total", "counter", "Consultas revisadas por el guardián",
+             {(("outcome", outcome),): guard[outcome] for outcome in ("checked", "rejected", "rewritten")}),
+        ]
+
+    async def awarm_up(self):
+        """Calentar la instancia antes de recibir tráfico: conexiones del pool,
+        esquema y catálogo, índice de entidades, normalizador/router y conexión HTTP con el LLM.
+        Retorna los milisegundos por paso; lanza excepción si alguno falla"""
+        steps = {}
+        
+        start = time.perf_counter()
+        await self._offload(self.pool.fill)
+        steps["pool"] = round(1000 * (time.perf_counter() - start), 1)
+        
+        start = time.perf_counter()
+        # La cache retorna None sin esquema (get_database_schema retorna un texto de error)
+        if await self._offload(self.schema_cache.get) is None:
+            raise RuntimeError("No se pudo construir la cache de esquema")
+        steps["schema"] = round(1000 * (time.perf_counter() - start), 1)
+        
+        start = time.perf_counter()
+        await self._offload(self.resolve_entities, "")
+        steps["entities"] = round(1000 * (time.perf_counter() - start), 1)
+        
+        start = time.perf_counter()
+        await self._offload(self._prime_question_path)
+        steps["normalizer"] = round(1000 * (time.perf_counter() - start), 1)
+        
+        if self.warmup_llm:
+            # Abre la conexión TLS que reutilizarán las preguntas
+            start = time.perf_counter()
+            await self.aping_llm("warmup")
+            steps["llm"] = round(1000 * (time.perf_counter() - start), 1)
+        
+        return steps
+
+    async def aping_llm(self, purpose="ping"):
+        """Solicitud mínima (1 token) al LLM; lanza excepción si no responde"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[{"role": "user", "content": "ping"}],
+                temperature=0.0,
+                max_tokens=1
+            )
+        except Exception:
+            LLM_REQUESTS.inc(purpose=purpose, status="error")
+            raise
+        LLM_REQUESTS.inc(purpose=purpose, status="ok")
+        record_llm_usage(purpose, response)
+
+    def _prime_question_path(self):
+        """Ejercitar normalizador, router y catálogo de nombres (sin BD ni LLM)"""
+        for question in ("¿Quién tiene más podios en el nacional?", "¿Quién ganó el Tour de Francia en 1990?"):
+            normalized_question = self.normalize_question(question)
+            self.router.route(normalized_question, self.schema_cache.carreras, aggregates=self.has_palmares())
+            question_shape(normalized_question, self.mention_catalog())
 
     def test_connection(self):
         """Probar conexión a la base de datos"""
-        conn = self.connect_db()
-        if conn:
-            try:
+        try:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT 1")
                 cursor.close()
-                conn.close()
-                return {"success": True, "message": "Conexión exitosa"}
-            except Exception as e:
-                return {"success": False, "message": f"Error en prueba: {e}"}
-        else:
-            return {"success": False, "message": "No se pudo conectar a la base de datos"}
+            return {"success": True, "message": "Conexión exitosa"}
+        except Exception as e:
+            return {"success": False, "message": f"No se pudo conectar a la base de datos: {e}"}
 
 def main():
     """Función principal para pruebas locales"""
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from dotenv import load_dotenv
+
+from Metrics import DB_POOL_WAIT_SECONDS
+
+# Cargar variables de entorno
+load_dotenv()
+
+
+def db_config_from_env():
+    """Configuración de PostgreSQL desde las variables de entorno"""
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "database": os.getenv("DB_NAME", "WebCycling"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "")
+    }
+
+
+class PoolTimeout(Exception):
+    """No hubo una conexión disponible dentro del tiempo de espera"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Conexión del pool con su cache de sentencias preparadas (PREPARE vive
+    lo que vive la sesión)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()  # clave de la forma -> nombre de la sentencia
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones psycopg2 con verificación al prestar"""
+
+    def __init__(self, db_config, minconn=1, maxconn=10, timeout=10.0,
+                 healthcheck_idle=30.0, max_lifetime=3600.0):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle = deque()       # (conexión, momento en que se devolvió)
+        self._created = {}         # id(conexión) -> momento de creación
+        self._size = 0             # conexiones abiertas (libres + prestadas)
+        self._closed = False
+        self.pid = os.getpid()     # las conexiones no sobreviven a un fork
+
+        # Métricas
+        self.checkouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.db_config)
+        self._created[id(conn)] = time.monotonic()
+        self.created += 1
+        return conn
+
+    def _discard(self, conn):
+        """Cerrar una conexión y liberar su lugar en el pool"""
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.recycled += 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, idle_since):
+        """Verificar que una conexión libre siga siendo utilizable"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        created = self._created.get(id(conn), 0)
+        if self.max_lifetime and time.monotonic() - created > self.max_lifetime:
+            return False
+        if time.monotonic() - idle_since >= self.healthcheck_idle:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def getconn(self, timeout=None):
+        """Prestar una conexión, esperando como máximo `timeout` segundos"""
+        if timeout is None:
+            timeout = self.timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("El pool está cerrado")
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        conn, idle_since = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        DB_POOL_WAIT_SECONDS.observe(timeout)
+                        raise PoolTimeout(f"Sin conexiones libres tras {timeout}s")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, idle_since):
+                # Conexión rota o vieja: reciclar y volver a intentar
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            DB_POOL_WAIT_SECONDS.observe(waited)
+            return conn
+
+    def putconn(self, conn, broken=False):
+        """Devolver una conexión al pool"""
+        if not broken and not conn.closed:
+            try:
+                # No dejar transacciones abiertas en conexiones libres
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Prestar una conexión dentro de un bloque `with`"""
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken)
+
+    def fill(self):
+        """Abrir conexiones hasta alcanzar el mínimo configurado"""
+        conns = []
+        try:
+            while len(conns) < self.minconn:
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def closeall(self):
+        """Cerrar todas las conexiones libres y rechazar nuevos préstamos"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Métricas del pool"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min": self.minconn,
+                "max": self.maxconn,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(1000 * self.wait_total / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_max_ms": round(1000 * self.wait_max, 2),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool compartido del proceso, configurado desde el entorno"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            # Heredado del proceso padre (preload de gunicorn): no cerrar sus
+            # sockets, que siguen siendo del padre; abrir un pool propio
+            print("🔀 Pool heredado de otro proceso: creando uno nuevo para este worker")
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(
+                db_config_from_env(),
+                minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                healthcheck_idle=float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30")),
+                max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+            )
+        return _pool
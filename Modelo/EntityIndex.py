@@ -0,0 +1,268 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from NameIndex import TrigramIndex, words
+from Router import YEAR
+
+# Mención de la pregunta resuelta a filas de la BD. `ids` tiene varios
+# elementos si el nombre es ambiguo (ciclistas) o cubre varias ediciones
+# (carreras sin año); `year` es el año con el que se acotó la carrera
+Mention = namedtuple("Mention", ["kind", "text", "ids", "names", "year"])
+
+RIDERS_QUERY = "SELECT id, nombre_ciclista FROM ciclistas WHERE id > %s ORDER BY id;"
+RACES_QUERY = 'SELECT id, nombre_carrera, "año" FROM carreras WHERE id > %s ORDER BY id;'
+
+# Actualizaciones y borrados de ciclistas/carreras: si cambian, se reconstruye
+# el índice; si solo hubo inserciones, basta leer los ids nuevos
+CHANGES_QUERY = """
+    SELECT COALESCE(SUM(n_tup_upd + n_tup_del), 0)
+      FROM pg_stat_user_tables
+     WHERE schemaname = 'public' AND relname IN ('carreras', 'ciclistas');
+"""
+
+# Nombres coloquiales de carreras -> nombre exacto (si existe en la BD)
+RACE_ALIASES = {
+    "tour": "Tour de Francia",
+    "giro": "Giro de Italia",
+    "tour del porvenir": "Tour de l'Avenir",
+    "porvenir": "Tour de l'Avenir",
+    "paris niza": "París - Niza",
+    "clasico rcn": "Clásico RCN",
+}
+
+# Apodos de nombres de pila: "lucho herrera" busca "luis ... herrera"
+NICKNAMES = {
+    "lucho": "luis",
+    "rigo": "rigoberto",
+    "pacho": "francisco",
+    "chepe": "jose",
+    "pepe": "jose",
+    "nacho": "ignacio",
+    "santi": "santiago",
+}
+
+
+def _load_aliases(path):
+    """Alias adicionales desde JSON: {"ciclistas": {alias: nombre}, "carreras": {alias: nombre}}"""
+    if not path:
+        return {}, {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudieron cargar los alias de {path}: {e}")
+        return {}, {}
+    return data.get("ciclistas", {}), data.get("carreras", {})
+
+
+class EntityIndex:
+    """Índice en proceso de ciclistas y carreras: nombres sin tildes, alias,
+    búsqueda por palabra, prefijo y trigramas. Resuelve las menciones de la
+    pregunta a ids para que el SQL filtre por igualdad en lugar de ILIKE"""
+
+    def __init__(self, aliases_path=None, max_candidates=None):
+        self.aliases_path = aliases_path or os.getenv("ENTITY_ALIASES_PATH") or None
+        # Un nombre que coincide con más ciclistas que esto no se resuelve ("luis")
+        self.max_candidates = max_candidates or int(os.getenv("ENTITY_MAX_CANDIDATES", "8"))
+        # _lock protege las estructuras (lecturas de resolve y su actualización);
+        # _refresh_lock deja una sola actualización en curso
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.refreshed_at = None
+
+    def _reset(self):
+        self.riders = {}                   # id -> nombre
+        self.races = {}                    # nombre -> {año: [ids]}
+        self._phrases = {}                 # palabras del nombre o alias -> (tipo, nombre)
+        self._max_phrase = 1
+        self._rider_names = {}             # nombre -> id (los nombres de ciclista son únicos)
+        self._postings = defaultdict(set)  # palabra -> ids de ciclistas que la contienen
+        self._vocabulary = []              # palabras de ciclistas ordenadas (búsqueda por prefijo)
+        self._fuzzy = TrigramIndex()
+        self._max_rider_id = 0
+        self._max_race_id = 0
+        self._changes = None
+
+    def refresh(self, cursor):
+        """Poner el índice al día: solo las filas nuevas, o todo si hubo
+        actualizaciones o borrados desde la última vez. Las consultas van
+        fuera de `_lock`: resolve solo espera a que se apliquen las filas"""
+        with self._refresh_lock:
+            cursor.execute(CHANGES_QUERY)
+            changes = cursor.fetchone()[0]
+            rebuild = changes != self._changes
+            cursor.execute(RIDERS_QUERY, (0 if rebuild else self._max_rider_id,))
+            riders = cursor.fetchall()
+            cursor.execute(RACES_QUERY, (0 if rebuild else self._max_race_id,))
+            races = cursor.fetchall()
+            aliases = _load_aliases(self.aliases_path)
+
+            with self._lock:
+                if rebuild:
+                    self._reset()
+                    self._changes = changes
+                    self.rebuilds += 1
+                self._add_riders(riders)
+                self._add_races(races)
+                self._apply_aliases(*aliases)
+                self.refreshes += 1
+                self.refreshed_at = time.time()
+
+            if rebuild:
+                print(f"🔎 Índice de entidades: {len(self.riders)} ciclistas, {len(self.races)} carreras")
+            elif riders or races:
+                print(f"🔎 Índice de entidades: {len(riders) + len(races)} filas nuevas")
+
+    def _add_riders(self, rows):
+        for rider_id, name in rows:
+            self.riders[rider_id] = name
+            self._rider_names[name] = rider_id
+            self._add_phrase(words(name), "ciclista", name)
+            for word in set(words(name)):
+                if word not in self._postings:
+                    bisect.insort(self._vocabulary, word)
+                    self._fuzzy.add(word)
+                self._postings[word].add(rider_id)
+            self._max_rider_id = max(self._max_rider_id, rider_id)
+
+    def _add_races(self, rows):
+        for race_id, name, year in rows:
+            self.races.setdefault(name, {}).setdefault(year, []).append(race_id)
+            self._add_phrase(words(name), "carrera", name)
+            self._max_race_id = max(self._max_race_id, race_id)
+
+    def _add_phrase(self, tokens, kind, name):
+        if tokens:
+            self._phrases[tuple(tokens)] = (kind, name)
+            self._max_phrase = max(self._max_phrase, len(tokens))
+
+    def _apply_aliases(self, riders, races):
+        """Alias cuyo nombre exacto existe en la BD (los demás se ignoran)"""
+        for alias, name in {**RACE_ALIASES, **races}.items():
+            if name in self.races:
+                self._add_phrase(words(alias), "carrera", name)
+        for alias, name in riders.items():
+            if name in self._rider_names:
+                self._add_phrase(words(alias), "ciclista", name)
+
+    def _rider_ids(self, word, fuzzy=False):
+        """Ciclistas con la palabra: exacta (o su apodo), por prefijo y, si
+        `fuzzy`, por parecido de trigramas"""
+        word = NICKNAMES.get(word, word)
+        if word in self._postings:
+            return self._postings[word]
+        ids = set()
+        if len(word) >= 5:
+            position = bisect.bisect_left(self._vocabulary, word)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+                ids |= self._postings[self._vocabulary[position]]
+                position += 1
+        if not ids and fuzzy and len(word) >= 5:
+            for similar in self._fuzzy.search(word, k=3, min_score=0.7):
+                ids |= self._postings[similar]
+        return ids
+
+    def resolve(self, text):
+        """Menciones de ciclistas y carreras en el texto, en orden de aparición"""
+        tokens = words(text)
+        years = {int(year) for year in YEAR.findall(text)}
+        year = years.pop() if len(years) == 1 else None
+        with self._lock:
+            return self._resolve(tokens, year)
+
+    def _resolve(self, tokens, year):
+        mentions = []
+
+        # Nombres completos y alias: la frase más larga en cada posición
+        free = []
+        position = 0
+        while position < len(tokens):
+            for size in range(min(self._max_phrase, len(tokens) - position), 0, -1):
+                phrase = tuple(tokens[position:position + size])
+                if phrase in self._phrases:
+                    kind, name = self._phrases[phrase]
+                    mentions.append((position, self._mention(kind, " ".join(phrase), name, year)))
+                    position += size
+                    break
+            else:
+                free.append((position, tokens[position]))
+                position += 1
+
+        # Nombres parciales de ciclistas ("nairo quintana", "lopez"): palabras
+        # consecutivas cuyos ciclistas en común no son demasiados
+        index = 0
+        while index < len(free):
+            start, word = free[index]
+            candidates = self._rider_ids(word) if len(word) >= 4 and not word.isdigit() else set()
+            end = index + 1
+            while candidates and end < len(free) and free[end][0] == start + end - index:
+                narrowed = candidates & self._rider_ids(free[end][1], fuzzy=True)
+                if not narrowed:
+                    break
+                candidates = narrowed
+                end += 1
+            if candidates and len(candidates) <= self.max_candidates:
+                ids = tuple(sorted(candidates))
+                text_span = " ".join(token for _, token in free[index:end])
+                mentions.append((start, Mention("ciclista", text_span, ids, tuple(self.riders[i] for i in ids), None)))
+                index = end
+            else:
+                index += 1
+
+        return [mention for _, mention in sorted(mentions, key=lambda item: item[0])]
+
+    def _mention(self, kind, text, name, year):
+        if kind == "ciclista":
+            return Mention(kind, text, (self._rider_names[name],), (name,), None)
+        editions = self.races[name]
+        if year in editions:
+            return Mention(kind, text, tuple(editions[year]), (name,), year)
+        ids = tuple(sorted(race_id for ids in editions.values() for race_id in ids))
+        return Mention(kind, text, ids, (name,), None)
+
+    def rider_id(self, name):
+        """Id del ciclista con ese nombre exacto (o None)"""
+        with self._lock:
+            return self._rider_names.get(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ciclistas": len(self.riders),
+                "carreras": len(self.races),
+                "alias": len(self._phrases) - len(self.riders) - len(self.races),
+                "refreshes": self.refreshes,
+                "rebuilds": self.rebuilds,
+                "age_seconds": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            }
+
+
+def render_mentions(mentions):
+    """Bloque del prompt con las entidades ya resueltas y el filtro a usar"""
+    if not mentions:
+        return ""
+    lines = ["ENTIDADES IDENTIFICADAS EN LA PREGUNTA (filtra por id con =, no uses ILIKE para ellas):"]
+    for mention in mentions:
+        if mention.kind == "ciclista":
+            if len(mention.ids) == 1:
+                lines.append(f'- "{mention.text}": ciclista {mention.names[0]} → ciclista_id = {mention.ids[0]}')
+            else:
+                ids = ", ".join(str(i) for i in mention.ids)
+                lines.append(f'- "{mention.text}": puede ser {", ".join(mention.names)} → ciclista_id IN ({ids})')
+        elif mention.year is not None:
+            ids = ", ".join(str(i) for i in mention.ids)
+            condition = f"carrera_id = {ids}" if len(mention.ids) == 1 else f"carrera_id IN ({ids})"
+            lines.append(f'- "{mention.text}": carrera {mention.names[0]} {mention.year} → {condition}')
+        else:
+            # Todas las ediciones: igualdad sobre el nombre exacto
+            name = mention.names[0].replace("'", "''")
+            lines.append(f"- \"{mention.text}\": carrera {mention.names[0]} → ca.nombre_carrera = '{name}'")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+
+from Metrics import LLM_REQUESTS
+
+
+def _component():
+    return {"ok": None, "message": "Sin verificar", "checked_at": None, "latency_ms": None}
+
+
+class HealthMonitor:
+    """Verificación periódica de la base de datos y del LLM. Los endpoints de
+    salud leen el último estado en lugar de abrir una conexión por sonda"""
+
+    def __init__(self, llm, interval=None, llm_interval=None, timeout=None):
+        self.llm = llm
+        self.interval = interval or float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+        # El LLM se sondea solo si no hubo tráfico real desde la última verificación
+        self.llm_interval = llm_interval or float(os.getenv("HEALTH_LLM_INTERVAL", "300"))
+        self.timeout = timeout or float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+        self.database = _component()
+        self.llm_status = _component()
+        self.checks = 0
+        self._llm_counts = (0, 0)  # (ok, error) de LLM_REQUESTS en la última verificación
+
+    async def run(self):
+        """Ciclo de verificación (tarea en segundo plano)"""
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Error en la verificación de salud: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def check(self):
+        """Verificar BD y LLM y publicar el resultado"""
+        await self._check_database()
+        await self._check_llm()
+        self.checks += 1
+
+    async def _check_database(self):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.llm._offload(self.llm.test_connection), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"success": False, "message": f"Sin respuesta de la base de datos en {self.timeout:.0f}s"}
+        self.database = {
+            "ok": result["success"],
+            "message": result["message"],
+            "checked_at": time.time(),
+            "latency_ms": round(1000 * (time.perf_counter() - start), 1),
+            "pool": self.llm.pool.stats(),
+        }
+
+    async def _check_llm(self):
+        now = time.time()
+        counts = (LLM_REQUESTS.total(status="ok"), LLM_REQUESTS.total(status="error"))
+        ok_delta = counts[0] - self._llm_counts[0]
+        error_delta = counts[1] - self._llm_counts[1]
+        self._llm_counts = counts
+
+        # Respuestas reales desde la última verificación: alcanzable sin sondear
+        if ok_delta and not error_delta:
+            self.llm_status = {"ok": True, "message": f"{ok_delta} respuesta(s) recientes",
+                               "checked_at": now, "latency_ms": None}
+            return
+
+        last = self.llm_status["checked_at"]
+        if not error_delta and self.llm_status["ok"] and last and now - last < self.llm_interval:
+            return
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.llm.aping_llm("health"), self.timeout)
+            ok, message = True, "LLM disponible"
+        except asyncio.TimeoutError:
+            ok, message = False, f"Sin respuesta del LLM en {self.timeout:.0f}s"
+        except Exception as e:
+            ok, message = False, f"LLM no disponible: {e}"
+        self._llm_counts = (LLM_REQUESTS.total(status="ok"), LLM_REQUESTS.total(status="error"))
+        self.llm_status = {"ok": ok, "message": message, "checked_at": time.time(),
+                           "latency_ms": round(1000 * (time.perf_counter() - start), 1)}
+
+    def seed(self, steps_ms):
+        """Estado inicial tomado del calentamiento (BD y LLM ya verificados)"""
+        now = time.time()
+        self.database = {"ok": True, "message": "Conexión exitosa", "checked_at": now,
+                         "latency_ms": steps_ms.get("pool"), "pool": self.llm.pool.stats()}
+        if "llm" in steps_ms:
+            self.llm_status = {"ok": True, "message": "LLM disponible", "checked_at": now,
+                               "latency_ms": steps_ms["llm"]}
+        self._llm_counts = (LLM_REQUESTS.total(status="ok"), LLM_REQUESTS.total(status="error"))
+
+    def snapshot(self):
+        """Último estado conocido (sin E/S)"""
+        healthy = bool(self.database["ok"]) and self.llm_status["ok"] is not False
+        return {
+            "healthy": healthy,
+            "status": "healthy" if healthy else "unhealthy",
+            "database": self.database,
+            "llm": self.llm_status,
+            "interval": self.interval,
+            "checks": self.checks,
+        }
@@ -0,0 +1,217 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self, **labels):
+        """Suma de las series cuyas etiquetas coinciden con `labels`"""
+        wanted = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(value for key, value in self._values.items()
+                       if all(key[index] == expected for index, expected in wanted))
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Histograma acumulado al estilo Prometheus (buckets, suma y conteo)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}  # etiquetas -> [conteos por bucket, suma, conteo]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if position < len(self.buckets):
+                entry[0][position] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", self.labelnames, key, (("le", _number(bound)),), cumulative))
+                samples.append((f"{self.name}_bucket", self.labelnames, key, (("le", "+Inf"),), count))
+                samples.append((f"{self.name}_sum", self.labelnames, key, (), round(total, 6)))
+                samples.append((f"{self.name}_count", self.labelnames, key, (), count))
+        return samples
+
+
+class Registry:
+    """Métricas registradas y colectores evaluados al momento de exportar"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Registrar una función que retorna [(nombre, tipo, ayuda, {etiquetas: valor})]
+        con los valores vigentes (pools, caches)"""
+        self.collectors.append(func)
+        return func
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, values, extra, value in metric.samples():
+                lines.append(f"{name}{_labels_text(labelnames, values, extra)} {_number(value)}")
+
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error leyendo métricas: {e}")
+                continue
+            for name, kind, documentation, values in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in values.items():
+                    lines.append(f"{name}{_labels_text([k for k, _ in labels], [v for _, v in labels])} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "cycling_stage_seconds", "Duración de cada etapa del pipeline de preguntas", ["stage"])
+QUESTION_SECONDS = REGISTRY.histogram(
+    "cycling_question_seconds", "Duración total de una pregunta", ["source", "answer_source"])
+QUESTIONS = REGISTRY.counter(
+    "cycling_questions_total", "Preguntas respondidas", ["source", "answer_source"])
+COALESCED = REGISTRY.counter(
+    "cycling_coalesced_questions_total", "Preguntas que esperaron una ejecución idéntica en curso")
+ERRORS = REGISTRY.counter(
+    "cycling_errors_total", "Errores por etapa", ["stage"])
+LLM_REQUESTS = REGISTRY.counter(
+    "cycling_llm_requests_total", "Llamadas al LLM", ["purpose", "status"])
+LLM_TOKENS = REGISTRY.counter(
+    "cycling_llm_tokens_total", "Tokens consumidos en el LLM", ["purpose", "kind"])
+PREPARED = REGISTRY.counter(
+    "cycling_prepared_statements_total", "Uso de sentencias preparadas por forma de consulta", ["outcome"])
+LLM_RETRIES = REGISTRY.counter(
+    "cycling_llm_retries_total", "Reintentos de llamadas al LLM por error transitorio", ["purpose", "reason"])
+LLM_HEDGES = REGISTRY.counter(
+    "cycling_llm_hedges_total", "Solicitudes de respaldo al LLM (lanzadas, ganadas y omitidas sin lugar)", ["purpose", "outcome"])
+ADMISSIONS = REGISTRY.counter(
+    "cycling_llm_admissions_total", "Control de admisión de llamadas al LLM", ["purpose", "outcome"])
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "cycling_db_pool_wait_seconds", "Espera para obtener una conexión del pool")
+
+# Tiempos por etapa de la pregunta en curso (si alguien los está midiendo)
+_current_timer = contextvars.ContextVar("cycling_stage_timer", default=None)
+
+
+class StageTimer:
+    """Tiempos por etapa de una pregunta"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = {}
+
+    def activate(self):
+        """Asociar este medidor al contexto actual (tarea o hilo)"""
+        return _current_timer.set(self)
+
+    def deactivate(self, token):
+        _current_timer.reset(token)
+
+    def add(self, name, elapsed):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def as_ms(self):
+        timings = {name: round(1000 * value, 2) for name, value in self.timings.items()}
+        timings["total"] = round(1000 * self.elapsed(), 2)
+        return timings
+
+
+@contextmanager
+def stage(name):
+    """Medir una etapa: va al histograma y al medidor de la pregunta en curso"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.add(name, elapsed)
+
+
+def record_llm_usage(purpose, response):
+    """Sumar los tokens reportados por el LLM (si los reporta)"""
+    usage = getattr(response, "usage", None)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if isinstance(value, int):
+            LLM_TOKENS.inc(value, purpose=purpose, kind=kind.replace("_tokens", ""))
@@ -0,0 +1,245 @@
+# Migraciones versionadas del esquema. Cada migración se aplica una sola vez,
+# en orden, y queda registrada en schema_migraciones; las primeras usan
+# IF NOT EXISTS para adoptar las bases creadas con el antiguo create_tables.
+# Los índices se crean dentro de la transacción (sin CONCURRENTLY): para
+# tablas grandes en producción conviene aplicar la migración en una ventana
+from Palmares import PALMARES_CICLISTAS_DDL, PALMARES_TIPOS_DDL
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migraciones (
+    version INT PRIMARY KEY,
+    descripcion TEXT NOT NULL,
+    aplicada_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Un solo proceso migra a la vez (dos despliegues simultáneos esperan)
+LOCK_QUERY = "SELECT pg_advisory_xact_lock(hashtext('webcycling_migraciones'));"
+
+BASE_TABLES = """
+CREATE TABLE IF NOT EXISTS ciclistas (
+    id SERIAL PRIMARY KEY,
+    nombre_ciclista VARCHAR(150) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS carreras (
+    id SERIAL PRIMARY KEY,
+    nombre_carrera VARCHAR(150) NOT NULL,
+    tipo VARCHAR(50),
+    año INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS resultados (
+    id SERIAL PRIMARY KEY,
+    ciclista_id INT NOT NULL,
+    carrera_id INT NOT NULL,
+    posicion INT,
+    camiseta_ganada VARCHAR(100),
+    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
+    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
+);
+
+CREATE TABLE IF NOT EXISTS etapas (
+    id SERIAL PRIMARY KEY,
+    ciclista_id INT NOT NULL,
+    carrera_id INT NOT NULL,
+    cantidad_etapas INT,
+    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
+    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
+);
+
+CREATE TABLE IF NOT EXISTS tours_continentales (
+    id SERIAL PRIMARY KEY,
+    ciclista_id INT NOT NULL,
+    carrera_id INT NOT NULL,
+    continente VARCHAR(50),
+    FOREIGN KEY (ciclista_id) REFERENCES ciclistas(id),
+    FOREIGN KEY (carrera_id) REFERENCES carreras(id)
+);
+"""
+
+# Contadores de generación por tabla: cada escritura los incrementa y la
+# cache de resultados del modelo descarta lo que leyó de esas tablas
+GENERATION_DDL = """
+CREATE TABLE IF NOT EXISTS cache_generaciones (
+    tabla VARCHAR(63) PRIMARY KEY,
+    generacion BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION incrementar_generacion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cache_generaciones (tabla, generacion) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (tabla) DO UPDATE SET generacion = cache_generaciones.generacion + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+GENERATION_TABLES = ["ciclistas", "carreras", "resultados", "etapas", "tours_continentales",
+                     "palmares_ciclistas", "palmares_tipos"]
+
+# Bases anteriores: la cantidad de etapas ganadas se guardaba como texto
+ETAPAS_CANTIDAD = r"""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = 'etapas'
+                  AND column_name = 'resultado_etapa') THEN
+        ALTER TABLE etapas RENAME COLUMN resultado_etapa TO cantidad_etapas;
+        ALTER TABLE etapas ALTER COLUMN cantidad_etapas TYPE INT
+            USING NULLIF(regexp_replace(cantidad_etapas, '\D', '', 'g'), '')::int;
+    END IF;
+END
+$$;
+"""
+
+# El cargador registra el continente de la carrera sin ciclista
+TOURS_CICLISTA_OPCIONAL = "ALTER TABLE tours_continentales ALTER COLUMN ciclista_id DROP NOT NULL;"
+
+# Una edición por carrera y año: los duplicados se funden en el id menor
+# (sus resultados, etapas y continentes pasan a ese id) antes de la restricción
+CARRERAS_UNICAS = """
+CREATE TEMP TABLE carreras_duplicadas ON COMMIT DROP AS
+SELECT id, MIN(id) OVER (PARTITION BY nombre_carrera, año) AS conservar FROM carreras;
+DELETE FROM carreras_duplicadas WHERE id = conservar;
+
+UPDATE resultados t SET carrera_id = d.conservar FROM carreras_duplicadas d WHERE t.carrera_id = d.id;
+UPDATE etapas t SET carrera_id = d.conservar FROM carreras_duplicadas d WHERE t.carrera_id = d.id;
+UPDATE tours_continentales t SET carrera_id = d.conservar FROM carreras_duplicadas d WHERE t.carrera_id = d.id;
+DELETE FROM carreras c USING carreras_duplicadas d WHERE c.id = d.id;
+DROP TABLE carreras_duplicadas;
+"""
+
+UNIQUE_INDEXES = {
+    # Búsqueda del cargador (nombre, año) y filtros por nombre exacto; id y
+    # tipo incluidos para unir sin leer la tabla
+    "uq_carreras_nombre_anio": 'CREATE UNIQUE INDEX IF NOT EXISTS uq_carreras_nombre_anio '
+                               'ON carreras (nombre_carrera, año) INCLUDE (id, tipo);',
+}
+
+# Claves foráneas con las columnas que leen las consultas (index-only scans)
+FK_INDEXES = {
+    "idx_resultados_ciclista": "CREATE INDEX IF NOT EXISTS idx_resultados_ciclista "
+                               "ON resultados (ciclista_id, carrera_id) INCLUDE (posicion, camiseta_ganada);",
+    "idx_resultados_carrera": "CREATE INDEX IF NOT EXISTS idx_resultados_carrera "
+                              "ON resultados (carrera_id, posicion) INCLUDE (ciclista_id);",
+    "idx_resultados_posicion": "CREATE INDEX IF NOT EXISTS idx_resultados_posicion "
+                               "ON resultados (posicion) INCLUDE (ciclista_id, carrera_id);",
+    "idx_etapas_ciclista": "CREATE INDEX IF NOT EXISTS idx_etapas_ciclista "
+                           "ON etapas (ciclista_id, carrera_id) INCLUDE (cantidad_etapas);",
+    "idx_etapas_carrera": "CREATE INDEX IF NOT EXISTS idx_etapas_carrera "
+                          "ON etapas (carrera_id) INCLUDE (ciclista_id, cantidad_etapas);",
+    "idx_tours_continentales_carrera": "CREATE INDEX IF NOT EXISTS idx_tours_continentales_carrera "
+                                       "ON tours_continentales (carrera_id) INCLUDE (continente);",
+    "idx_tours_continentales_ciclista": "CREATE INDEX IF NOT EXISTS idx_tours_continentales_ciclista "
+                                        "ON tours_continentales (ciclista_id);",
+    "idx_carreras_anio": "CREATE INDEX IF NOT EXISTS idx_carreras_anio "
+                         "ON carreras (año) INCLUDE (id, nombre_carrera, tipo);",
+}
+
+# ILIKE '%texto%' sobre nombres (prompt del LLM, Estadisticas, router)
+TRIGRAM_INDEXES = {
+    "idx_ciclistas_nombre_trgm": "CREATE INDEX IF NOT EXISTS idx_ciclistas_nombre_trgm "
+                                 "ON ciclistas USING gin (nombre_ciclista gin_trgm_ops);",
+    "idx_carreras_nombre_trgm": "CREATE INDEX IF NOT EXISTS idx_carreras_nombre_trgm "
+                                "ON carreras USING gin (nombre_carrera gin_trgm_ops);",
+}
+
+# Índices que cambian los planes de las consultas (ver benchmarks/bench_query_plans.py)
+PLAN_INDEXES = {**UNIQUE_INDEXES, **FK_INDEXES, **TRIGRAM_INDEXES}
+
+
+def _generation_triggers(cur):
+    cur.execute(GENERATION_DDL)
+    for table_name in GENERATION_TABLES:
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_generacion ON {table_name};")
+        cur.execute(f"""
+            CREATE TRIGGER trg_generacion
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name}
+            FOR EACH STATEMENT EXECUTE FUNCTION incrementar_generacion();
+        """)
+
+
+def _unique_races(cur):
+    cur.execute(CARRERAS_UNICAS)
+    for ddl in UNIQUE_INDEXES.values():
+        cur.execute(ddl)
+
+
+def _fk_indexes(cur):
+    for ddl in FK_INDEXES.values():
+        cur.execute(ddl)
+
+
+def _trigram_indexes(cur):
+    # pg_trgm es una extensión "trusted" desde PostgreSQL 13: basta con
+    # privilegio CREATE sobre la base de datos
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    for ddl in TRIGRAM_INDEXES.values():
+        cur.execute(ddl)
+
+
+# (versión, descripción, SQL o función que recibe el cursor). Nunca editar
+# una migración ya publicada: agregar una nueva al final
+MIGRATIONS = [
+    (1, "Tablas base: ciclistas, carreras, resultados, etapas, tours_continentales", BASE_TABLES),
+    (2, "Tablas de palmarés agregado", PALMARES_TIPOS_DDL + PALMARES_CICLISTAS_DDL),
+    (3, "Contadores de generación para la cache de resultados", _generation_triggers),
+    (4, "etapas.resultado_etapa (texto) -> cantidad_etapas (INT)", ETAPAS_CANTIDAD),
+    (5, "tours_continentales.ciclista_id opcional", TOURS_CICLISTA_OPCIONAL),
+    (6, "Carreras únicas por nombre y año", _unique_races),
+    (7, "Índices de claves foráneas con columnas incluidas", _fk_indexes),
+    (8, "pg_trgm e índices GIN para búsquedas ILIKE por nombre", _trigram_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(cur):
+    """Versiones ya aplicadas (conjunto vacío si la tabla de control no existe)"""
+    cur.execute("SELECT to_regclass('schema_migraciones') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return set()
+    cur.execute("SELECT version FROM schema_migraciones;")
+    return {row[0] for row in cur.fetchall()}
+
+
+def schema_version(cur):
+    """Versión actual del esquema (0 si nunca se migró)"""
+    return max(applied_versions(cur), default=0)
+
+
+def migrate(cur, target=None):
+    """Aplicar en orden las migraciones pendientes hasta `target` (por defecto
+    la última). Cada una va en su propio savepoint: si una falla se detiene
+    ahí y las anteriores quedan listas para el commit del llamador.
+    Retorna las versiones aplicadas"""
+    target = LATEST_VERSION if target is None else target
+    cur.execute(MIGRATIONS_TABLE)
+    cur.execute(LOCK_QUERY)
+    done = applied_versions(cur)
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version > target or version in done:
+            continue
+        print(f"🛠️ Migración {version}: {description}...")
+        cur.execute("SAVEPOINT migracion;")
+        try:
+            if callable(step):
+                step(cur)
+            else:
+                cur.execute(step)
+            cur.execute("INSERT INTO schema_migraciones (version, descripcion) VALUES (%s, %s);",
+                        (version, description))
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT migracion;")
+            print(f"❌ Error en la migración {version}: {e}")
+            break
+        cur.execute("RELEASE SAVEPOINT migracion;")
+        applied.append(version)
+
+    if applied:
+        # Estadísticas al día para que el planificador use los índices nuevos
+        cur.execute("ANALYZE ciclistas, carreras, resultados, etapas, tours_continentales;")
+    return applied
@@ -0,0 +1,62 @@
+import re
+from collections import defaultdict
+
+from Router import fold_accents
+
+# Palabras que no aportan al parecido entre nombres
+STOPWORDS = {"de", "del", "la", "las", "el", "los", "y", "en", "a", "al", "por", "con"}
+
+_WORD = re.compile(r"[a-z0-9ñ]+")
+
+
+def words(text):
+    """Palabras significativas del texto (sin tildes ni stopwords)"""
+    return [w for w in _WORD.findall(fold_accents(text)) if w not in STOPWORDS]
+
+
+def trigrams(text):
+    """Trigramas por palabra, con relleno al estilo pg_trgm"""
+    grams = set()
+    for word in words(text):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Índice invertido de trigramas para buscar nombres parecidos a un texto"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self._grams = []
+        self._postings = defaultdict(set)
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        position = len(self.names)
+        grams = trigrams(name)
+        self.names.append(name)
+        self._grams.append(grams)
+        for gram in grams:
+            self._postings[gram].add(position)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, text, k=10, min_score=0.3):
+        """Los `k` nombres mejor cubiertos por el texto (fracción de sus trigramas presentes)"""
+        query = trigrams(text)
+        shared = defaultdict(int)
+        for gram in query:
+            for position in self._postings.get(gram, ()):
+                shared[position] += 1
+
+        scored = []
+        for position, count in shared.items():
+            score = count / len(self._grams[position])
+            if score >= min_score:
+                scored.append((score, self.names[position]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [name for _, name in scored[:k]]
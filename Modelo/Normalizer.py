@@ -0,0 +1,95 @@
+import re
+
+# Sinónimos y términos coloquiales -> términos que entiende el prompt SQL
+SYNONYMS = {
+    # Carreras
+    'nacionales': 'nacional',
+    'nacional de ruta': 'nacional',
+    'nacionales de ruta': 'nacional',
+    'campeonato nacional': 'nacional',
+    'campeonatos nacionales': 'nacional',
+
+    # Posiciones y logros múltiples
+    'podio': 'posicion <= 3',
+    'podium': 'posicion <= 3',
+    'podios': 'posicion <= 3',
+    'los 3 primeros': 'posicion <= 3',
+    'top 3': 'posicion <= 3',
+    'primeros tres': 'posicion <= 3',
+    'mas podios': 'count podios',
+    'más podios': 'count podios',
+    'con mas podios': 'count podios',
+    'con más podios': 'count podios',
+    'mayor cantidad de podios': 'count podios',
+    'más triunfos': 'count victorias',
+    'mas triunfos': 'count victorias',
+    'más victorias': 'count victorias',
+    'mas victorias': 'count victorias',
+
+    # Ganadores
+    'campeón': 'posicion = 1',
+    'campeon': 'posicion = 1',
+    'ganador': 'posicion = 1',
+    'ganadores': 'posicion = 1',
+    'campeones': 'posicion = 1',
+    'quien ganó': 'posicion = 1',
+    'quien gano': 'posicion = 1',
+    'quién ganó': 'posicion = 1',
+    'quién gano': 'posicion = 1',
+    'el que ganó': 'posicion = 1',
+    'el que gano': 'posicion = 1',
+
+    # Años
+    'año a año': 'por año',
+    'todos los años': 'por año',
+    'cada año': 'por año',
+}
+
+# '46, 46', 46 -> 1946 (00-30 = 2000-2030, 31-99 = 1931-1999)
+YEAR_PATTERN = re.compile(r"'?\b(\d{2})\b'?")
+
+
+def trie_pattern(phrases):
+    """Expresión regular en forma de trie: el costo por posición depende del
+    largo de las frases y no de cuántas haya. Los opcionales codiciosos
+    prueban primero la frase más larga"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        children = sorted(ch for ch in node if ch != "")
+        if not children:
+            return ""
+        alternatives = [re.escape(ch) + build(node[ch]) for ch in children]
+        body = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie) or r"(?!)"
+
+
+def _expand_year(match):
+    year_num = int(match.group(1))
+    return str(2000 + year_num if year_num <= 30 else 1900 + year_num)
+
+
+class QuestionNormalizer:
+    """Normalizador de una sola pasada: una expresión regular compilada con
+    todas las frases, probando primero la más larga en cada posición"""
+
+    def __init__(self, synonyms=None):
+        self.synonyms = dict(SYNONYMS if synonyms is None else synonyms)
+        # Solo frases completas: "campeon" no debe tocar "campeonato"
+        self.pattern = re.compile(rf"(?<!\w)(?:{trie_pattern(self.synonyms)})(?!\w)")
+
+    def normalize_year(self, text):
+        """Convertir años en formato coloquial a formato completo"""
+        return YEAR_PATTERN.sub(_expand_year, text)
+
+    def normalize(self, question):
+        """Minúsculas, años completos y sinónimos en una sola pasada"""
+        question = self.normalize_year(question.lower())
+        return self.pattern.sub(lambda match: self.synonyms[match.group(0)], question)
@@ -0,0 +1,108 @@
+# Palmarés agregado por ciclista y por tipo de carrera. Lo mantiene el
+# cargador (CargaDatos.insert_data) en la misma transacción que los datos,
+# así los rankings leen filas ya contadas en lugar de agrupar en cada pregunta.
+# Las tablas las crea la migración 2 (Migrations.py) con este DDL
+
+# Totales por ciclista y tipo de carrera
+PALMARES_TIPOS_DDL = """
+CREATE TABLE IF NOT EXISTS palmares_tipos (
+    ciclista_id INT NOT NULL,
+    nombre_ciclista VARCHAR(150) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    victorias INT NOT NULL DEFAULT 0,
+    podios INT NOT NULL DEFAULT 0,
+    etapas_ganadas INT NOT NULL DEFAULT 0,
+    camisetas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ciclista_id, tipo)
+);
+CREATE INDEX IF NOT EXISTS idx_palmares_tipos_victorias ON palmares_tipos (tipo, victorias DESC);
+CREATE INDEX IF NOT EXISTS idx_palmares_tipos_podios ON palmares_tipos (tipo, podios DESC);
+"""
+
+# Totales por ciclista (suma de todos los tipos)
+PALMARES_CICLISTAS_DDL = """
+CREATE TABLE IF NOT EXISTS palmares_ciclistas (
+    ciclista_id INT PRIMARY KEY,
+    nombre_ciclista VARCHAR(150) NOT NULL,
+    victorias INT NOT NULL DEFAULT 0,
+    podios INT NOT NULL DEFAULT 0,
+    etapas_ganadas INT NOT NULL DEFAULT 0,
+    camisetas INT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_palmares_ciclistas_victorias ON palmares_ciclistas (victorias DESC);
+CREATE INDEX IF NOT EXISTS idx_palmares_ciclistas_podios ON palmares_ciclistas (podios DESC);
+CREATE INDEX IF NOT EXISTS idx_palmares_ciclistas_etapas ON palmares_ciclistas (etapas_ganadas DESC);
+"""
+
+# {filtro} restringe a los ciclistas a recalcular ("" = todos). Las camisetas
+# se guardan separadas por comas ("General, Joven" son dos)
+REFRESH_TIPOS = """
+INSERT INTO palmares_tipos (ciclista_id, nombre_ciclista, tipo, victorias, podios, etapas_ganadas, camisetas)
+SELECT ci.id, ci.nombre_ciclista, t.tipo,
+       COALESCE(SUM(t.victorias), 0), COALESCE(SUM(t.podios), 0),
+       COALESCE(SUM(t.etapas), 0), COALESCE(SUM(t.camisetas), 0)
+FROM (
+    SELECT r.ciclista_id, COALESCE(ca.tipo, 'Sin tipo') AS tipo,
+           COUNT(*) FILTER (WHERE r.posicion = 1) AS victorias,
+           COUNT(*) FILTER (WHERE r.posicion <= 3) AS podios,
+           0 AS etapas,
+           SUM(COALESCE(array_length(string_to_array(NULLIF(r.camiseta_ganada, ''), ','), 1), 0)) AS camisetas
+    FROM resultados r
+    JOIN carreras ca ON r.carrera_id = ca.id
+    WHERE TRUE {filtro_resultados}
+    GROUP BY r.ciclista_id, COALESCE(ca.tipo, 'Sin tipo')
+    UNION ALL
+    SELECT e.ciclista_id, COALESCE(ca.tipo, 'Sin tipo'), 0, 0, SUM(COALESCE(e.cantidad_etapas, 0)), 0
+    FROM etapas e
+    JOIN carreras ca ON e.carrera_id = ca.id
+    WHERE TRUE {filtro_etapas}
+    GROUP BY e.ciclista_id, COALESCE(ca.tipo, 'Sin tipo')
+) t
+JOIN ciclistas ci ON t.ciclista_id = ci.id
+GROUP BY ci.id, ci.nombre_ciclista, t.tipo;
+"""
+
+REFRESH_CICLISTAS = """
+INSERT INTO palmares_ciclistas (ciclista_id, nombre_ciclista, victorias, podios, etapas_ganadas, camisetas)
+SELECT ciclista_id, nombre_ciclista, SUM(victorias), SUM(podios), SUM(etapas_ganadas), SUM(camisetas)
+FROM palmares_tipos
+WHERE TRUE {filtro}
+GROUP BY ciclista_id, nombre_ciclista;
+"""
+
+# Indicaciones para el prompt de generación de SQL
+PROMPT_HINT = """TABLAS DE PALMARÉS (totales ya calculados, usar para rankings sin filtro de carrera ni año):
+- palmares_ciclistas: una fila por ciclista con victorias, podios, etapas_ganadas y camisetas
+- palmares_tipos: lo mismo por tipo de carrera (tipo = 'GV', 'Mundial', 'Nacional', 'Continental', ...)
+Ejemplo: SELECT nombre_ciclista, podios AS total_podios FROM palmares_ciclistas
+         WHERE podios > 0 ORDER BY podios DESC, nombre_ciclista ASC;
+Si la pregunta filtra por una carrera concreta o por año, agrupar sobre resultados como se indica abajo.
+"""
+
+
+def palmares_ready(cur):
+    """Si las tablas de palmarés existen (migración 2 aplicada)"""
+    cur.execute("SELECT to_regclass('palmares_ciclistas') IS NOT NULL AND to_regclass('palmares_tipos') IS NOT NULL;")
+    return cur.fetchone()[0]
+
+
+def refresh_palmares(cur, ciclista_ids=None):
+    """Recalcular el palmarés de los ciclistas indicados (todos si es None).
+    Se ejecuta dentro de la transacción del llamador: se publica con su commit"""
+    if ciclista_ids is None:
+        cur.execute("DELETE FROM palmares_ciclistas;")
+        cur.execute("DELETE FROM palmares_tipos;")
+        cur.execute(REFRESH_TIPOS.format(filtro_resultados="", filtro_etapas=""))
+        cur.execute(REFRESH_CICLISTAS.format(filtro=""))
+        print("🏆 Palmarés recalculado para todos los ciclistas")
+        return
+
+    ids = sorted(set(ciclista_ids))
+    if not ids:
+        return
+    cur.execute("DELETE FROM palmares_ciclistas WHERE ciclista_id = ANY(%s);", (ids,))
+    cur.execute("DELETE FROM palmares_tipos WHERE ciclista_id = ANY(%s);", (ids,))
+    cur.execute(REFRESH_TIPOS.format(filtro_resultados="AND r.ciclista_id = ANY(%(ids)s)",
+                                     filtro_etapas="AND e.ciclista_id = ANY(%(ids)s)"), {"ids": ids})
+    cur.execute(REFRESH_CICLISTAS.format(filtro="AND ciclista_id = ANY(%(ids)s)"), {"ids": ids})
+    print(f"🏆 Palmarés actualizado para {len(ids)} ciclista(s)")
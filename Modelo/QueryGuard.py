@@ -0,0 +1,63 @@
+import json
+import os
+
+
+class QueryRejected(Exception):
+    """Consulta rechazada por el guardián antes de ejecutarse"""
+
+
+class QueryGuard:
+    """Control de admisión para SQL generado: límite de tiempo por sentencia
+    y verificación del plan (EXPLAIN) antes de ejecutar"""
+
+    def __init__(self, max_cost=None, max_rows=None, statement_timeout_ms=None):
+        self.max_cost = max_cost or float(os.getenv("SQL_MAX_COST", "100000"))
+        self.max_rows = max_rows or int(os.getenv("SQL_MAX_ROWS", "10000"))
+        self.statement_timeout_ms = statement_timeout_ms or int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+
+        self.checked = 0
+        self.rejected = 0
+        self.rewritten = 0
+
+    def apply(self, cursor, query, params=None, explain=True):
+        """Preparar la transacción y retornar la consulta a ejecutar (quizás
+        reescrita con LIMIT). Lanza QueryRejected si el plan es demasiado caro"""
+        # Solo afecta a la transacción actual: la conexión vuelve limpia al pool
+        cursor.execute("SET LOCAL statement_timeout = %s", (self.statement_timeout_ms,))
+        if not explain:
+            return query
+
+        self.checked += 1
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        cost = root.get("Total Cost", 0)
+        rows = root.get("Plan Rows", 0)
+
+        if cost > self.max_cost:
+            self.rejected += 1
+            print(f"🛑 Consulta rechazada (costo {cost:.0f} > {self.max_cost:.0f}, filas {rows}):\n{query}\n"
+                  f"Plan: {json.dumps(root, ensure_ascii=False)[:2000]}")
+            raise QueryRejected(
+                f"La consulta es demasiado costosa (costo estimado {cost:.0f}, máximo {self.max_cost:.0f})"
+            )
+
+        if rows > self.max_rows:
+            self.rewritten += 1
+            print(f"✂️ Consulta limitada a {self.max_rows} filas (estimadas {rows})")
+            return f"SELECT * FROM ({query.strip().rstrip(';')}) AS consulta LIMIT {self.max_rows}"
+
+        return query
+
+    def stats(self):
+        """Contadores del guardián"""
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "rewritten": self.rewritten,
+            "max_cost": self.max_cost,
+            "max_rows": self.max_rows,
+            "statement_timeout_ms": self.statement_timeout_ms,
+        }
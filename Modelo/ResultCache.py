@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+from Cache import TTLCache
+from ResultPages import ResultPage
+from SqlCanon import cache_key
+
+# Tablas cuyas escrituras invalidan resultados (contadores mantenidos por
+# los triggers de Migrations.py en la tabla cache_generaciones)
+CACHED_TABLES = ("resultados", "etapas", "carreras", "ciclistas", "tours_continentales",
+                 "palmares_ciclistas", "palmares_tipos")
+
+GENERATIONS_QUERY = "SELECT tabla, generacion FROM cache_generaciones;"
+
+_STRING_OR_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\s+|[^\s'\"]+", re.S)
+_SQL_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[a-z_][a-z0-9_$]*|\S")
+# Palabras que cierran la lista de tablas de un FROM
+_FROM_END = {"where", "group", "order", "limit", "offset", "having", "union", "except", "intersect",
+             "window", "on", "using", "select", "returning", "for"}
+
+
+def canonical_sql(sql):
+    """Forma canónica del SQL: sin comentarios, espacios colapsados y
+    palabras en minúscula (los literales se conservan tal cual)"""
+    parts = []
+    for token in _STRING_OR_TOKEN.findall(sql.strip().rstrip(";")):
+        if token.startswith("--") or token.startswith("/*"):
+            continue
+        if token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+            continue
+        parts.append(token if token[0] in "'\"" else token.lower())
+    return "".join(parts).strip()
+
+
+def sql_fingerprint(sql, params=None):
+    """Huella estable del SQL canónico (y sus parámetros, si los hay)"""
+    text = canonical_sql(sql)
+    if params:
+        text += "|" + repr(tuple(params))
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def result_key(sql, params=None):
+    """Clave por forma de la consulta y sus valores: el mismo SQL con literales
+    en línea o con parámetros comparte entrada"""
+    return cache_key(sql, params) or sql_fingerprint(sql, params)
+
+
+def table_refs(sql):
+    """Nombres tras FROM y JOIN, incluidas las listas con comas
+    (FROM resultados r, carreras c), en cada nivel de subconsulta"""
+    names = []
+    in_from = [False]   # por profundidad de paréntesis: dentro de la lista del FROM
+    expect = [False]    # por profundidad: el siguiente nombre es una tabla
+    for token in _SQL_TOKEN.findall(canonical_sql(sql)):
+        if token == "(":
+            in_from.append(False)
+            expect.append(False)
+        elif token == ")":
+            if len(in_from) > 1:
+                in_from.pop()
+                expect.pop()
+        elif token in ("from", "join"):
+            in_from[-1] = True
+            expect[-1] = True
+        elif token == "," and in_from[-1]:
+            expect[-1] = True
+        elif token == "." and in_from[-1]:
+            expect[-1] = True   # esquema.tabla
+        elif token in _FROM_END:
+            in_from[-1] = False
+            expect[-1] = False
+        elif expect[-1] and token[0] != "'":
+            names.append(token.strip('"'))
+            expect[-1] = False
+    return names
+
+
+def tables_read(sql):
+    """Tablas conocidas que lee la consulta (todas si no se reconoce ninguna)"""
+    found = {name for name in table_refs(sql) if name in CACHED_TABLES}
+    return tuple(sorted(found)) if found else CACHED_TABLES
+
+
+class ResultCache:
+    """Cache de resultados SQL invalidada por contadores de generación por tabla"""
+
+    def __init__(self, pool, maxsize=None, ttl=None, check_interval=None, shared=None):
+        self.pool = pool
+        self.cache = TTLCache(
+            maxsize=maxsize or int(os.getenv("RESULT_CACHE_SIZE", "500")),
+            ttl=ttl or float(os.getenv("RESULT_CACHE_TTL", "3600")),
+            shared=shared,
+            namespace="resultados",
+        )
+        if check_interval is None:
+            check_interval = float(os.getenv("RESULT_CACHE_CHECK_INTERVAL", "1"))
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._generations = None
+        self._checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generations(self):
+        """Contadores de generación vigentes (None si no están disponibles).
+        Se releen como mucho una vez por `check_interval`, también tras un error"""
+        with self._lock:
+            now = time.time()
+            if now - self._checked_at < self.check_interval:
+                return self._generations
+            self._checked_at = now
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(GENERATIONS_QUERY)
+                    self._generations = dict(cursor.fetchall())
+                    cursor.close()
+            except Exception as e:
+                # Sin contadores no se puede validar nada: no cachear hasta el
+                # próximo intento (sin consultar la BD en cada petición)
+                print(f"⚠️ Error leyendo generaciones de la cache: {e}")
+                self._generations = None
+            return self._generations
+
+    def snapshot(self, sql):
+        """Generaciones de las tablas que lee la consulta, tomadas ANTES de ejecutarla"""
+        generations = self.generations()
+        if generations is None:
+            return None
+        return {table: generations.get(table, 0) for table in tables_read(sql)}
+
+    def get(self, sql, params=None):
+        """Resultados cacheados si ninguna tabla leída ha cambiado, o None"""
+        key = result_key(sql, params)
+        entry = self.cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        generations = self.generations()
+        if generations is None or any(generations.get(table, 0) != gen
+                                      for table, gen in entry["generations"].items()):
+            self.cache.delete(key)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return ResultPage(entry["rows"], entry.get("query"), entry.get("params"), entry.get("has_more", False),
+                          entry.get("total"))
+
+    def set(self, sql, rows, snapshot, params=None):
+        """Guardar resultados junto con las generaciones tomadas antes de ejecutar"""
+        if snapshot is None:
+            return
+        # Entrada serializable: puede publicarse en la cache compartida
+        self.cache.set(result_key(sql, params), {
+            "rows": list(rows),
+            "query": getattr(rows, "query", None),
+            "params": list(params) if params else None,
+            "has_more": getattr(rows, "has_more", False),
+            "total": getattr(rows, "total", None),
+            "generations": snapshot,
+        })
+
+    def stats(self):
+        """Contadores de la cache de resultados"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "check_interval": self.check_interval,
+        }
@@ -0,0 +1,161 @@
+import os
+import uuid
+
+import psycopg2
+
+from Cache import TTLCache
+from Metrics import PREPARED
+from SqlCanon import cache_key, canonicalize
+
+# Sentencias preparadas por conexión (0 desactiva PREPARE)
+PREPARED_MAX = int(os.getenv("PREPARED_STATEMENTS_MAX", "100"))
+
+# Formas que Postgres no pudo preparar (p. ej. tipos de parámetro ambiguos)
+_unpreparable = set()
+
+
+class ResultPage(list):
+    """Filas leídas de una consulta (acotadas) junto con la consulta que las
+    produjo; `has_more` indica que el cursor del servidor tenía más filas y
+    `total` el número real de filas (None si no se contó)"""
+
+    def __init__(self, rows=(), query=None, params=None, has_more=False, total=None):
+        super().__init__(rows)
+        self.query = query
+        self.params = params
+        self.has_more = has_more
+        self.total = total if total is not None or has_more else len(self)
+        self.result_id = None
+
+
+def rows_to_dicts(columns, rows):
+    """Convertir filas a diccionarios (fechas en formato ISO)"""
+    data = []
+    for row in rows:
+        row_dict = {}
+        for i, value in enumerate(row):
+            if hasattr(value, 'isoformat'):  # datetime objects
+                row_dict[columns[i]] = value.isoformat()
+            else:
+                row_dict[columns[i]] = value
+        data.append(row_dict)
+    return data
+
+
+def prepare(conn, cursor, canonical):
+    """Nombre de la sentencia preparada para la forma de la consulta en esta
+    conexión (PREPARE la primera vez), o None si no se puede preparar"""
+    prepared = getattr(conn, "prepared", None)
+    if prepared is None or not PREPARED_MAX or canonical.key in _unpreparable:
+        return None
+
+    name = prepared.get(canonical.key)
+    if name:
+        prepared.move_to_end(canonical.key)
+        PREPARED.inc(outcome="hit")
+        return name
+
+    # Paginada con LIMIT/OFFSET como parámetros: DECLARE no admite EXECUTE
+    name = f"consulta_{canonical.key[:16]}"
+    count = len(canonical.values)
+    cursor.execute("SAVEPOINT preparar")
+    try:
+        cursor.execute(f"PREPARE {name} AS SELECT * FROM ({canonical.shape}) AS consulta "
+                       f"LIMIT ${count + 1} OFFSET ${count + 2}")
+        cursor.execute("RELEASE SAVEPOINT preparar")
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT preparar")
+        if e.pgcode != "42P05":  # duplicate_prepared_statement: ya existe en la sesión
+            _unpreparable.add(canonical.key)
+            PREPARED.inc(outcome="failed")
+            print(f"⚠️ No se pudo preparar la consulta, se ejecuta sin PREPARE: {e}")
+            return None
+
+    PREPARED.inc(outcome="prepared")
+    prepared[canonical.key] = name
+    while len(prepared) > PREPARED_MAX:
+        _, oldest = prepared.popitem(last=False)
+        cursor.execute(f"DEALLOCATE {oldest}")
+    return name
+
+
+def read_page(conn, query, params=None, offset=0, limit=500):
+    """Leer a lo sumo `limit` filas desde `offset`. Con la forma de la
+    consulta preparada en la conexión se reutiliza su plan; si no, un cursor
+    con nombre: en ambos casos las filas que sobran no salen del servidor"""
+    canonical = canonicalize(query, params)
+    if canonical is not None:
+        cursor = conn.cursor()
+        try:
+            name = prepare(conn, cursor, canonical)
+            if name:
+                placeholders = ", ".join(["%s"] * (len(canonical.values) + 2))
+                cursor.execute(f"EXECUTE {name} ({placeholders})", list(canonical.values) + [limit + 1, offset])
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                return ResultPage(rows_to_dicts(columns, rows[:limit]), query, params, has_more=len(rows) > limit)
+        finally:
+            cursor.close()
+
+    cursor = conn.cursor(name=f"consulta_{uuid.uuid4().hex[:16]}")
+    cursor.itersize = limit + 1
+    try:
+        cursor.execute(query, params)
+        if offset:
+            cursor.scroll(offset)  # MOVE en el servidor
+        rows = cursor.fetchmany(limit + 1)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+    finally:
+        cursor.close()
+
+    return ResultPage(rows_to_dicts(columns, rows[:limit]), query, params, has_more=len(rows) > limit)
+
+
+def results_count(results):
+    """Número real de filas del resultado: el conteo si se leyó solo una
+    parte, o las filas leídas"""
+    if not results:
+        return 0
+    total = getattr(results, "total", None)
+    return total if total is not None else len(results)
+
+
+def count_rows(conn, query, params=None):
+    """Total de filas de la consulta (solo se llama si no cupo en una página)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM ({query.strip().rstrip(';')}) AS consulta", params)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+class ResultSets:
+    """Registro de resultados paginables: id -> consulta ya validada y sus
+    parámetros. Las páginas siguientes se vuelven a leer desde la BD"""
+
+    def __init__(self, maxsize=None, ttl=None, shared=None):
+        self.cache = TTLCache(
+            maxsize=maxsize or int(os.getenv("RESULT_SETS_SIZE", "1000")),
+            ttl=ttl or float(os.getenv("RESULT_SETS_TTL", "1800")),
+            shared=shared,
+            namespace="paginas",
+        )
+
+    def register(self, page):
+        """Id del conjunto de resultados: el mismo para la misma consulta y
+        parámetros, así cualquier worker puede servir las páginas siguientes"""
+        if page.result_id and self.cache.get(page.result_id) is not None:
+            return page.result_id
+        result_id = cache_key(page.query, page.params) or uuid.uuid4().hex
+        params = list(page.params) if page.params else None
+        self.cache.set(result_id, {"query": page.query, "params": params})
+        page.result_id = result_id
+        return result_id
+
+    def get(self, result_id):
+        """Consulta registrada para `result_id`, o None si expiró"""
+        return self.cache.get(result_id)
+
+    def stats(self):
+        return self.cache.stats()
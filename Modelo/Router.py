@@ -0,0 +1,157 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+# Consulta resuelta localmente: SQL parametrizado + valores de los slots
+RoutedQuery = namedtuple("RoutedQuery", ["intent", "sql", "params", "slots"])
+
+YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Formas reconocidas sobre la salida de CyclingLLM.normalize_question
+MOST_PODIUMS = re.compile(r"\bcount podios\b")
+MOST_WINS = re.compile(r"\bcount victorias\b|\bmayor cantidad de (?:victorias|triunfos)\b")
+PALMARES = re.compile(r"(?:palmar[eé]s|resultados|logros|historial)\s+(?:de|del)\s+(?P<rider>[^\d?¿!.,;]+)")
+# Palabras que ya no son parte del nombre sino una condición ("... en el tour",
+# "... con movistar"). "de" y "del" no cortan: son parte de nombres (Isaac del Toro)
+# Condiciones que las plantillas no expresan: rangos de años y etapas
+# (se comparan sin tildes)
+YEAR_RANGE = re.compile(r"\b(?:desde|hasta|entre|antes|despues|a partir)\b")
+STAGES = re.compile(r"\betapas?\b")
+RIDER_QUALIFIER = re.compile(r"\s(?:en|con|durante|desde|hasta|entre|contra|para|por|sin|antes|despues|cuando|y|o)\s")
+
+RANKING_SQL = """SELECT
+    ci.nombre_ciclista,
+    COUNT(*) as {alias}
+FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE {where}
+GROUP BY ci.nombre_ciclista
+ORDER BY {alias} DESC, ci.nombre_ciclista ASC;"""
+
+# Ranking sin filtro de carrera ni año: lectura de la tabla de palmarés (Palmares.py)
+AGGREGATE_RANKING_SQL = """SELECT
+    nombre_ciclista,
+    {column} as {alias}
+FROM palmares_ciclistas
+WHERE {column} > 0
+ORDER BY {alias} DESC, nombre_ciclista ASC;"""
+
+RESULTS_SQL = """SELECT
+    ci.nombre_ciclista,
+    ca.nombre_carrera,
+    ca.año,
+    r.posicion,
+    r.camiseta_ganada
+FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE {where}
+ORDER BY ca.año ASC, r.posicion ASC;"""
+
+POSITIONS = {
+    "= 1": "r.posicion = 1",
+    "<= 3": "r.posicion <= 3",
+}
+
+# Columna de palmares_ciclistas equivalente a cada posición
+AGGREGATE_COLUMNS = {
+    "= 1": "victorias",
+    "<= 3": "podios",
+}
+
+
+def fold_accents(text):
+    """Minúsculas y sin tildes, para comparar nombres"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class IntentRouter:
+    """Clasificador de intenciones que genera SQL sin llamar al LLM"""
+
+    def route(self, normalized_question, carreras=(), aggregates=False, rider_ids=(), mentions_race=False):
+        """Retornar un RoutedQuery para las formas conocidas, o None.
+        Con `aggregates` los rankings globales leen la tabla de palmarés;
+        `rider_ids` son los ids del ciclista mencionado y `mentions_race` si
+        se reconoció una carrera en la pregunta (EntityIndex)"""
+        text = normalized_question.strip().strip("¿?").strip()
+        folded = fold_accents(text)
+        years = {int(year) for year in YEAR.findall(text)}
+        year = next(iter(years)) if len(years) == 1 else None
+        race = self._match_race(text, carreras)
+
+        # Condiciones que las plantillas perderían (respuesta equivocada): el
+        # LLM resuelve rangos o varios años, etapas y carreras que el
+        # EntityIndex reconoció pero que no están tal cual en el catálogo
+        if len(years) > 1 or YEAR_RANGE.search(folded) or STAGES.search(folded) or (mentions_race and not race):
+            return None
+
+        # Ciclista con más podios / victorias
+        if MOST_PODIUMS.search(text):
+            return self._ranking("most_podiums", "total_podios", "<= 3", race, year, aggregates)
+        if MOST_WINS.search(text):
+            return self._ranking("most_wins", "total_victorias", "= 1", race, year, aggregates)
+
+        # Ganador (o podio) de la carrera X en el año Y
+        position = "= 1" if "posicion = 1" in text else "<= 3" if "posicion <= 3" in text else None
+        if position and race and year:
+            return self._race_results(position, race, year)
+
+        # Palmarés completo de un ciclista: si la pregunta lo acota (carrera,
+        # año, equipo...) el router no puede expresarlo y la resuelve el LLM
+        match = PALMARES.search(text)
+        if match and not race and not year and not mentions_race:
+            rider = match.group("rider").strip()
+            rest = text[match.end():].strip(" .!?")
+            if rider and not rest and not RIDER_QUALIFIER.search(f" {fold_accents(rider)} "):
+                return self._palmares(rider, rider_ids)
+
+        return None
+
+    def _match_race(self, text, carreras):
+        """Slot de carrera: nombre exacto del catálogo o el patrón de nacionales"""
+        folded = fold_accents(text)
+        best = None
+        for name in carreras:
+            folded_name = fold_accents(name)
+            if folded_name and folded_name in folded and (best is None or len(name) > len(best)):
+                best = name
+        if best:
+            return ("ca.nombre_carrera = %s", best)
+        if "nacional" in folded:
+            return ("ca.nombre_carrera ILIKE %s", "%nacional%")
+        return None
+
+    def _ranking(self, intent, alias, position, race, year, aggregates=False):
+        slots = {"race": race[1] if race else None, "year": year, "position": position}
+        if aggregates and not race and not year:
+            sql = AGGREGATE_RANKING_SQL.format(column=AGGREGATE_COLUMNS[position], alias=alias)
+            return RoutedQuery(intent, sql, (), slots)
+
+        conditions, params = [POSITIONS[position]], []
+        if race:
+            conditions.append(race[0])
+            params.append(race[1])
+        if year:
+            conditions.append("ca.año = %s")
+            params.append(year)
+        sql = RANKING_SQL.format(alias=alias, where=" AND ".join(conditions))
+        return RoutedQuery(intent, sql, tuple(params), slots)
+
+    def _race_results(self, position, race, year):
+        conditions = [POSITIONS[position], race[0], "ca.año = %s"]
+        sql = RESULTS_SQL.format(where=" AND ".join(conditions))
+        slots = {"race": race[1], "year": year, "position": position}
+        intent = "race_winner" if position == "= 1" else "race_podium"
+        return RoutedQuery(intent, sql, (race[1], year), slots)
+
+    def _palmares(self, rider, rider_ids=()):
+        if rider_ids:
+            # Ciclista ya resuelto: búsqueda por id en lugar de ILIKE
+            placeholders = ", ".join(["%s"] * len(rider_ids))
+            where = "r.ciclista_id = %s" if len(rider_ids) == 1 else f"r.ciclista_id IN ({placeholders})"
+            sql = RESULTS_SQL.format(where=where)
+            return RoutedQuery("palmares", sql, tuple(rider_ids), {"rider": rider})
+        sql = RESULTS_SQL.format(where="ci.nombre_ciclista ILIKE %s")
+        return RoutedQuery("palmares", sql, (f"%{rider}%",), {"rider": rider})
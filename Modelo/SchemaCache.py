@@ -0,0 +1,224 @@
+import hashlib
+import os
+import threading
+import time
+
+from NameIndex import TrigramIndex
+
+# Consulta completa del esquema (solo se ejecuta al reconstruir la cache)
+SCHEMA_QUERY = """
+    SELECT
+        t.table_name,
+        c.column_name,
+        c.data_type,
+        CASE
+            WHEN tc.constraint_type = 'PRIMARY KEY' THEN 'PK'
+            WHEN tc.constraint_type = 'FOREIGN KEY' THEN 'FK'
+            ELSE ''
+        END as constraint_info
+    FROM information_schema.tables t
+    JOIN information_schema.columns c ON t.table_name = c.table_name
+    LEFT JOIN information_schema.key_column_usage kcu ON c.table_name = kcu.table_name
+        AND c.column_name = kcu.column_name
+    LEFT JOIN information_schema.table_constraints tc ON kcu.constraint_name = tc.constraint_name
+    WHERE t.table_schema = 'public'
+        AND t.table_type = 'BASE TABLE'
+        AND t.table_name NOT IN ('schema_migraciones', 'cache_generaciones')  -- tablas de control
+    ORDER BY t.table_name, c.ordinal_position;
+"""
+
+CARRERAS_QUERY = "SELECT DISTINCT nombre_carrera FROM carreras ORDER BY nombre_carrera;"
+CICLISTAS_QUERY = "SELECT nombre_ciclista FROM ciclistas ORDER BY nombre_ciclista;"
+
+# Consulta barata para saber si algo cambió: contador de escrituras de
+# carreras y ciclistas (pg_stat_user_tables) + huella de columnas y restricciones
+VERSION_QUERY = """
+    SELECT
+        (SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+           FROM pg_stat_user_tables
+          WHERE schemaname = 'public' AND relname IN ('carreras', 'ciclistas')),
+        (SELECT md5(COALESCE(string_agg(c.relname || '.' || a.attname || ':' ||
+                    format_type(a.atttypid, a.atttypmod), ',' ORDER BY c.relname, a.attnum), ''))
+           FROM pg_attribute a
+           JOIN pg_class c ON a.attrelid = c.oid
+           JOIN pg_namespace n ON c.relnamespace = n.oid
+          WHERE n.nspname = 'public' AND c.relkind = 'r'
+            AND a.attnum > 0 AND NOT a.attisdropped),
+        (SELECT md5(COALESCE(string_agg(con.conname || ':' || con.contype, ',' ORDER BY con.conname), ''))
+           FROM pg_constraint con
+           JOIN pg_namespace n ON con.connamespace = n.oid
+          WHERE n.nspname = 'public');
+"""
+
+
+class SchemaCache:
+    """Cache versionada en proceso del esquema y catálogo de carreras y ciclistas"""
+
+    def __init__(self, pool, check_interval=None, shared=None):
+        self.pool = pool
+        self.shared = shared  # SharedCache.SharedStore: esquema construido por otro worker
+        if check_interval is None:
+            check_interval = float(os.getenv("SCHEMA_CACHE_CHECK_INTERVAL", "30"))
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self.tables = {}
+        self.carreras = []
+        self.ciclistas = []
+        self.carreras_index = TrigramIndex()
+        self.ciclistas_index = TrigramIndex()
+        self.tables_text = ""
+        self.schema_text = None
+        self.version = None
+        self._db_token = None
+        self.built_at = None
+        self.checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def get(self):
+        """Retornar el texto del esquema, reconstruyéndolo solo si cambió"""
+        with self._lock:
+            now = time.time()
+            if self.schema_text is not None and now - self.checked_at < self.check_interval:
+                self.hits += 1
+                return self.schema_text
+
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(VERSION_QUERY)
+                    token = tuple(cursor.fetchone())
+                    self.checked_at = now
+
+                    if self.schema_text is not None and token == self._db_token:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                        if not self._load_shared(token):
+                            self._build(cursor)
+                            self._publish(token)
+                        self._db_token = token
+                    cursor.close()
+
+            except Exception as e:
+                # Sin base de datos: servir la última versión conocida
+                print(f"Error actualizando cache de esquema: {e}")
+
+            return self.schema_text
+
+    def _build(self, cursor):
+        """Reconstruir esquema y catálogo desde la base de datos"""
+        cursor.execute(SCHEMA_QUERY)
+
+        tables = {}
+        for table_name, column_name, data_type, constraint_info in cursor.fetchall():
+            column_info = f"{column_name} ({data_type})"
+            if constraint_info:
+                column_info += f" {constraint_info}"
+            tables.setdefault(table_name, []).append(column_info)
+
+        cursor.execute(CARRERAS_QUERY)
+        carreras = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(CICLISTAS_QUERY)
+        ciclistas = [row[0] for row in cursor.fetchall()]
+
+        self._apply(tables, carreras, ciclistas)
+        self.rebuilds += 1
+        print(f"📋 Esquema cacheado (versión {self.version})")
+
+    def _apply(self, tables, carreras, ciclistas):
+        """Instalar esquema y catálogo, con sus índices y textos para el prompt"""
+        self.tables = tables
+        self.carreras = carreras
+        self.ciclistas = ciclistas
+        self.carreras_index = TrigramIndex(carreras)
+        self.ciclistas_index = TrigramIndex(ciclistas)
+        self.tables_text = self.render_tables()
+        self.schema_text = self.tables_text + self.render_catalog(carreras)
+        self.version = hashlib.md5(self.schema_text.encode("utf-8")).hexdigest()[:12]
+        self.built_at = time.time()
+
+    def _load_shared(self, token):
+        """Usar el esquema publicado por otro worker si es de la misma versión de la BD"""
+        if self.shared is None:
+            return False
+        entry = self.shared.get("esquema", "actual")
+        if entry is None or entry[0]["token"] != list(token):
+            return False
+        stored = entry[0]
+        self._apply(stored["tables"], stored["carreras"], stored["ciclistas"])
+        print(f"📋 Esquema cargado de la cache compartida (versión {self.version})")
+        return True
+
+    def _publish(self, token):
+        if self.shared is not None:
+            self.shared.set("esquema", "actual", {
+                "token": list(token),
+                "tables": self.tables,
+                "carreras": self.carreras,
+                "ciclistas": self.ciclistas,
+            }, time.time() + 86400)
+
+    def render_tables(self):
+        """Texto de tablas y columnas para el prompt"""
+        schema_text = "ESQUEMA DE BASE DE DATOS:\n\n"
+        for table, columns in self.tables.items():
+            schema_text += f"Tabla: {table}\n"
+            for column in columns:
+                schema_text += f"  - {column}\n"
+            schema_text += "\n"
+        return schema_text
+
+    def render_catalog(self, carreras, ciclistas=None, title="CARRERAS DISPONIBLES EN LA BD"):
+        """Texto del catálogo de nombres para el prompt"""
+        catalog_text = f"{title}:\n"
+        for carrera in carreras:
+            catalog_text += f"- {carrera}\n"
+        catalog_text += "\n"
+        if ciclistas:
+            catalog_text += "CICLISTAS MENCIONADOS (nombres exactos en la BD):\n"
+            for ciclista in ciclistas:
+                catalog_text += f"- {ciclista}\n"
+            catalog_text += "\n"
+        return catalog_text
+
+    def schema_for(self, question, k):
+        """Esquema con solo los `k` nombres de carreras y ciclistas más parecidos
+        a la pregunta, para que el prompt no crezca con la base de datos"""
+        schema = self.get()
+        if schema is None:
+            return None
+        carreras = self.carreras if len(self.carreras) <= k else self.carreras_index.search(question, k)
+        ciclistas = self.ciclistas_index.search(question, k)
+        return self.tables_text + self.render_catalog(
+            carreras, ciclistas, title="CARRERAS DISPONIBLES EN LA BD (relevantes para la pregunta)"
+        )
+
+    @property
+    def catalog_token(self):
+        """Versión de la BD con la que se construyó la cache (cambia con cada
+        escritura en carreras o ciclistas)"""
+        return self._db_token
+
+    def invalidate(self):
+        """Forzar la verificación de versión en la próxima consulta"""
+        with self._lock:
+            self.checked_at = 0.0
+            self._db_token = None
+
+    def stats(self):
+        """Estadísticas de la cache para /schema"""
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "age_seconds": round(time.time() - self.built_at, 1) if self.built_at else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+            "check_interval": self.check_interval,
+        }
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+# Almacén compartido por los workers del mismo host (SQLite en modo WAL):
+# una entrada calculada en un proceso queda disponible para los demás
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    espacio TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    expira_en REAL NOT NULL,
+    PRIMARY KEY (espacio, clave)
+) WITHOUT ROWID;
+"""
+
+
+def _json_default(value):
+    # Decimal de psycopg2 (SUM, AVG): entero si no tiene decimales
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+class SharedStore:
+    """Clave-valor con expiración en un archivo SQLite, por espacio de nombres"""
+
+    def __init__(self, path, maxsize=None, busy_timeout=None):
+        self.path = path
+        self.maxsize = maxsize or int(os.getenv("SHARED_CACHE_SIZE", "20000"))
+        self.busy_timeout = busy_timeout or float(os.getenv("SHARED_CACHE_BUSY_TIMEOUT", "2"))
+        self._local = threading.local()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _conn(self):
+        """Conexión del hilo actual (sqlite3 no comparte conexiones entre
+        hilos ni se puede heredar tras un fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace, key):
+        """(valor, expira_en) vigente, o None"""
+        try:
+            row = self._conn().execute(
+                "SELECT valor, expira_en FROM entradas WHERE espacio = ? AND clave = ? AND expira_en > ?;",
+                (namespace, key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            # El almacén compartido es una optimización: fallar como un miss
+            self.errors += 1
+            print(f"⚠️ Error leyendo cache compartida: {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, expires_at):
+        try:
+            data = json.dumps(value, ensure_ascii=False, default=_json_default)
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Valor no serializable para la cache compartida: {e}")
+            return
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entradas (espacio, clave, valor, expira_en) VALUES (?, ?, ?, ?);",
+                (namespace, key, data, expires_at),
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Error escribiendo cache compartida: {e}")
+            return
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self.purge()
+
+    def delete(self, namespace, key):
+        try:
+            self._conn().execute("DELETE FROM entradas WHERE espacio = ? AND clave = ?;", (namespace, key))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Error borrando de la cache compartida: {e}")
+
+    def clear(self, namespace):
+        try:
+            self._conn().execute("DELETE FROM entradas WHERE espacio = ?;", (namespace,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Error limpiando la cache compartida: {e}")
+
+    def purge(self):
+        """Eliminar entradas expiradas y, si sobran, las que expiran antes"""
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM entradas WHERE expira_en <= ?;", (time.time(),))
+            excess = conn.execute("SELECT COUNT(*) FROM entradas;").fetchone()[0] - self.maxsize
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM entradas WHERE (espacio, clave) IN "
+                    "(SELECT espacio, clave FROM entradas ORDER BY expira_en LIMIT ?);",
+                    (excess,),
+                )
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Error depurando la cache compartida: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "errors": self.errors,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """Almacén compartido configurado con SHARED_CACHE_PATH (None si no hay)"""
+    global _store
+    path = os.getenv("SHARED_CACHE_PATH")
+    if not path:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SharedStore(path)
+        return _store
@@ -0,0 +1,45 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalescencia de llamadas idénticas en curso: la primera ejecuta y las
+    demás esperan su resultado en lugar de repetir el trabajo"""
+
+    def __init__(self):
+        self._calls = {}  # clave -> tarea en curso
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, func):
+        """Ejecutar `func()` una sola vez por clave en curso. Retorna
+        (resultado, compartido) donde compartido indica que se esperó a otro"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            # Tarea propia: si el primer cliente se desconecta, los demás no pierden el trabajo
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # marcar como recuperada aunque nadie la espere
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        """Contadores de coalescencia"""
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_rate": round(self.followers / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,252 @@
+import hashlib
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from Router import fold_accents
+
+# Consulta canónica: SQL con $1..$n en lugar de literales, sus valores y la
+# clave de la forma (la misma para consultas que solo difieren en literales)
+CanonicalSQL = namedtuple("CanonicalSQL", ["shape", "values", "key"])
+
+_TOKEN = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<space>\s+)
+  | (?P<placeholder>%s)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<word>[^\W\d]\w*)
+  | (?P<op>::|<=|>=|<>|!=|\|\||%%|.)
+""", re.S | re.X)
+
+# Palabras tras las que un literal no puede ser un parámetro (DATE '2020-01-01', E'...')
+_TYPED_LITERAL = {"date", "time", "timestamp", "timestamptz", "interval", "e", "b", "x", "u"}
+# Cláusulas donde un número es una posición de columna (ORDER BY 1) o parte de la sintaxis
+_POSITIONAL = {"order", "group", "fetch"}
+_CLAUSE_END = {"limit", "offset", "having", "union", "except", "intersect", "window", "for",
+               "select", "from", "where"}
+
+_QUESTION_NUMBER = re.compile(r"\b\d+\b")
+# Cortes de posición que inserta el normalizador ("podio" -> "posicion <= 3"):
+# son constantes de la forma, no números que haya dicho el usuario
+_CUTOFF = re.compile(r"\bposicion\s*(?:<=|>=|=|<|>)\s*(\d+)\b")
+# Literales de LIMIT/OFFSET en la forma canónica
+_PAGING = re.compile(r"\b(?:limit|offset)\s*\$(\d+)\b")
+
+
+def _number_value(text):
+    if "." in text or "e" in text.lower():
+        return Decimal(text)
+    return int(text)
+
+
+def canonicalize(sql, params=None):
+    """Extraer los literales del SQL como parámetros ($1..$n). Los %s
+    existentes se convierten también con sus valores. None si no se puede"""
+    if "$" in sql:
+        return None  # cadenas con $$ o parámetros ya numerados: no tocar
+    params = list(params or ())
+    parts, values, kinds = [], [], []
+    previous = None        # última palabra significativa
+    positional = None      # profundidad de paréntesis donde empezó ORDER/GROUP BY
+    depth = 0
+    pending = 0            # siguiente %s existente
+    spaced = False         # hubo espacio (o comentario) antes del token
+    last_op = None         # el token anterior era un operador
+
+    for match in _TOKEN.finditer(sql.strip().rstrip(";").strip()):
+        kind = match.lastgroup
+        token = match.group()
+        if kind in ("comment", "space"):
+            spaced = True
+            continue
+        # Espacios canónicos: solo entre palabras/valores o entre dos operadores
+        # (así "a=1" y "a = 1" tienen la misma forma y "- -1" no se vuelve comentario)
+        is_op = kind == "op"
+        if spaced and parts and is_op == last_op:
+            parts.append(" ")
+        spaced = False
+        last_op = is_op
+
+        if kind == "placeholder":
+            if pending >= len(params):
+                return None
+            values.append(params[pending])
+            kinds.append("s" if isinstance(params[pending], str) else "n")
+            pending += 1
+            parts.append(f"${len(values)}")
+        elif kind == "string" and previous not in _TYPED_LITERAL and positional is None:
+            values.append(token[1:-1].replace("''", "'"))
+            kinds.append("s")
+            parts.append(f"${len(values)}")
+        elif kind == "number" and positional is None:
+            values.append(_number_value(token))
+            kinds.append("n")
+            parts.append(f"${len(values)}")
+        elif kind == "word":
+            word = token.lower()
+            if word in _POSITIONAL:
+                positional = depth
+            elif word in _CLAUSE_END and positional is not None and depth <= positional:
+                positional = None
+            parts.append(word)
+            previous = word
+            continue
+        elif kind == "op":
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+                if positional is not None and depth < positional:
+                    positional = None
+            parts.append("%" if token == "%%" and params else token)
+        else:
+            parts.append(token)
+        previous = None
+
+    if pending != len(params):
+        return None
+    shape = "".join(parts).strip()
+    key = hashlib.md5(f"{shape}|{''.join(kinds)}".encode("utf-8")).hexdigest()
+    return CanonicalSQL(shape, tuple(values), key)
+
+
+def render(shape, values):
+    """SQL con los valores en línea (inverso de canonicalize)"""
+    def literal(match):
+        value = values[int(match.group(1)) - 1]
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        return str(value)
+    return re.sub(r"\$(\d+)\b", literal, shape)
+
+
+def cache_key(sql, params=None):
+    """Clave de cache de resultados: forma de la consulta + valores"""
+    canonical = canonicalize(sql, params)
+    if canonical is None:
+        return None
+    return hashlib.md5(f"{canonical.key}|{canonical.values!r}".encode("utf-8")).hexdigest()
+
+
+def mention_catalog(names, min_length=5):
+    """Nombres conocidos (ciclistas) listos para buscarlos en preguntas:
+    (nombre, nombre sin tildes), los más largos primero"""
+    pairs = [(name, fold_accents(name)) for name in names if len(name) >= min_length]
+    return sorted(pairs, key=lambda pair: len(pair[1]), reverse=True)
+
+
+def _find_word(text, phrase):
+    """Posición de `phrase` como palabras completas dentro de `text` (o -1)"""
+    position = text.find(phrase)
+    while position >= 0:
+        end = position + len(phrase)
+        if (position == 0 or not text[position - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+            return position
+        position = text.find(phrase, position + 1)
+    return -1
+
+
+def question_constants(normalized_question):
+    """Números que el normalizador insertó en la pregunta (cortes de posición)"""
+    return [int(number) for number in _CUTOFF.findall(fold_accents(normalized_question))]
+
+
+def question_shape(normalized_question, catalog=()):
+    """Forma de la pregunta: números -> '#' y nombres del catálogo -> '@'.
+    Los cortes de posición del normalizador quedan tal cual en la forma.
+    Retorna (forma, números, nombres en orden de aparición)"""
+    folded = fold_accents(normalized_question)
+    found = []
+    for name, folded_name in catalog:
+        position = _find_word(folded, folded_name)
+        if position >= 0:
+            found.append((position, name))
+            folded = folded[:position] + "@" + folded[position + len(folded_name):]
+    cutoffs = [match.span(1) for match in _CUTOFF.finditer(folded)]
+    numbers, parts, last = [], [], 0
+    for match in _QUESTION_NUMBER.finditer(folded):
+        if match.span() in cutoffs:
+            continue
+        numbers.append(int(match.group()))
+        parts.append(folded[last:match.start()] + "#")
+        last = match.end()
+    shape = "".join(parts) + folded[last:]
+    return shape, numbers, [name for _, name in sorted(found)]
+
+
+def sql_template(sql, numbers, names=(), ids=(), constants=()):
+    """Plantilla del SQL para la forma de la pregunta: qué valores salen de
+    los números o nombres de la pregunta (o de los ids de esos nombres,
+    `ids[i]` el de `names[i]`). `constants` son los números que no vienen
+    del usuario (question_constants). None si la asociación no es segura"""
+    canonical = canonicalize(sql)
+    if canonical is None or not (numbers or names):
+        return None
+    # Cada número (o id) de la pregunta debe identificar un único literal:
+    # repetido en la pregunta, en varios literales, igual a una constante de
+    # la forma o usado como LIMIT/OFFSET, no se sabe qué literal reemplazar
+    keys = list(numbers) + [i for i in ids if i is not None]
+    if len(set(keys)) != len(keys):
+        return None
+    literals = [value for value in canonical.values if not isinstance(value, str)]
+    paging = {canonical.values[int(index) - 1] for index in _PAGING.findall(canonical.shape)}
+    for key in keys:
+        if literals.count(key) > 1 or key in constants or key in paging:
+            return None
+    folded_names = [fold_accents(name) for name in names]
+    slots, used = [], set()
+    for value in canonical.values:
+        if isinstance(value, str):
+            stripped = value.strip("%")
+            folded = fold_accents(stripped)
+            if folded in folded_names:
+                index = folded_names.index(folded)
+                prefix, suffix = value[:len(value) - len(value.lstrip("%"))], value[len(value.rstrip("%")):]
+                slots.append(["name", index, prefix, suffix])
+                used.add(("name", index))
+                continue
+            # Un número o nombre de la pregunta metido en otro texto: no generalizar
+            if any(str(number) in value for number in numbers) or any(name in folded for name in folded_names):
+                return None
+            slots.append(None)
+        elif value in numbers:
+            index = numbers.index(value)
+            slots.append(["number", index])
+            used.add(("number", index))
+        elif value in ids:
+            index = ids.index(value)
+            slots.append(["id", index])
+            used.add(("name", index))
+        else:
+            slots.append(None)
+
+    # Todo número y nombre de la pregunta debe aparecer en el SQL
+    expected = {("number", numbers.index(number)) for number in numbers}
+    expected |= {("name", index) for index in range(len(names))}
+    if used != expected:
+        return None
+    return {"shape": canonical.shape, "values": [_jsonable(value) for value in canonical.values], "slots": slots}
+
+
+def fill_template(template, numbers, names=(), ids=()):
+    """SQL de la plantilla con los números y nombres de otra pregunta de la misma forma"""
+    values = []
+    for value, slot in zip(template["values"], template["slots"]):
+        if slot is None:
+            values.append(value)
+        elif slot[0] == "number":
+            values.append(numbers[slot[1]])
+        elif slot[0] == "id":
+            if ids[slot[1]] is None:
+                return None
+            values.append(ids[slot[1]])
+        else:
+            values.append(f"{slot[2]}{names[slot[1]]}{slot[3]}")
+    return render(template["shape"], values)
+
+
+def _jsonable(value):
+    # La cache de SQL se persiste en JSON
+    return float(value) if isinstance(value, Decimal) else value
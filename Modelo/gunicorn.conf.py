@@ -0,0 +1,48 @@
+# Modo producción: varios workers uvicorn bajo gunicorn
+#
+#     cd Modelo && gunicorn -c gunicorn.conf.py Backend:app
+#     (o: python Backend.py --production)
+#
+# Cada worker tiene su propio pool de conexiones (DB_POOL_MAX por worker:
+# el total hacia PostgreSQL es WEB_CONCURRENCY * DB_POOL_MAX). Con
+# SHARED_CACHE_PATH las caches de esquema, SQL, resultados y páginas se
+# comparten entre workers a través de un archivo SQLite local.
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Importar la aplicación una sola vez en el maestro: los workers la heredan
+# con fork (el pool de conexiones y CyclingLLM se crean en cada worker)
+preload_app = True
+
+# Apagado ordenado: SIGTERM deja de aceptar conexiones y espera las
+# solicitudes en curso (y los lotes, ver shutdown_event) hasta este límite
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+accesslog = os.getenv("ACCESS_LOG") or None
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Calentar la cache compartida antes de crear los workers: el esquema se
+    construye una vez y cada worker lo carga en lugar de consultarlo"""
+    from SharedCache import get_shared_store
+    store = get_shared_store()
+    if store is None:
+        print("ℹ️ Sin SHARED_CACHE_PATH: cada worker construye sus propias caches")
+        return
+
+    from DBPool import get_pool
+    from SchemaCache import SchemaCache
+    store.purge()
+    pool = get_pool()
+    try:
+        SchemaCache(pool, shared=store).get()
+    finally:
+        pool.closeall()  # los workers abren sus propias conexiones
+    print(f"💾 Cache compartida lista en {store.path}")
@@ -0,0 +1,90 @@
+"""Micro-benchmark de normalize_question sobre un corpus de preguntas reales.
+
+Compara el normalizador anterior (un str.replace por sinónimo) con el
+normalizador compilado de una sola pasada, a medida que la tabla de
+sinónimos crece.
+
+    python benchmarks/bench_normalizer.py [--number 200] [--repeat 5] [--show]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Modelo"))
+from Normalizer import SYNONYMS, QuestionNormalizer
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preguntas.txt")
+TABLE_SIZES = [len(SYNONYMS), 100, 300, 1000]
+
+
+def legacy_normalize_year(text):
+    """Implementación anterior de CyclingLLM.normalize_year"""
+    year_patterns = [r"\b'?(\d{2})\'?\b", r"\b(\d{4})\b"]
+    normalized_text = text
+    for pattern in year_patterns:
+        for match in re.findall(pattern, text):
+            if len(match) == 2:
+                year_num = int(match)
+                full_year = 2000 + year_num if year_num <= 30 else 1900 + year_num
+                for old_pattern in [f"'{match}'", f"'{match}", f"{match}'", f"{match}"]:
+                    if old_pattern in normalized_text:
+                        normalized_text = normalized_text.replace(old_pattern, str(full_year))
+                        break
+    return normalized_text
+
+
+def legacy_normalize(question, synonyms):
+    """Implementación anterior de CyclingLLM.normalize_question"""
+    question = legacy_normalize_year(question.lower())
+    for old, new in synonyms.items():
+        question = question.replace(old, new)
+    return question
+
+
+def synonym_table(size):
+    """Tabla real ampliada con sinónimos sintéticos hasta `size` entradas"""
+    table = dict(SYNONYMS)
+    i = 0
+    while len(table) < size:
+        table[f"sinonimo sintetico {i}"] = f"termino {i}"
+        i += 1
+    return table
+
+
+def bench(func, questions, number, repeat):
+    """Microsegundos por pregunta (mejor de `repeat`)"""
+    timer = timeit.Timer(lambda: [func(q) for q in questions])
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return 1e6 * best / (number * len(questions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200, help="pasadas por medición")
+    parser.add_argument("--repeat", type=int, default=5, help="mediciones (se toma la mejor)")
+    parser.add_argument("--show", action="store_true", help="mostrar la normalización de cada pregunta")
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    if args.show:
+        normalizer = QuestionNormalizer()
+        for question in questions:
+            print(f"{question}\n  antes:  {legacy_normalize(question, SYNONYMS)}\n  ahora:  {normalizer.normalize(question)}")
+        print()
+
+    print(f"📏 Corpus: {len(questions)} preguntas, {args.number}x{args.repeat} pasadas\n")
+    print(f"{'sinónimos':>10} {'anterior (µs)':>15} {'compilado (µs)':>15} {'mejora':>8}")
+    for size in TABLE_SIZES:
+        table = synonym_table(size)
+        normalizer = QuestionNormalizer(table)
+        legacy = bench(lambda q: legacy_normalize(q, table), questions, args.number, args.repeat)
+        compiled = bench(normalizer.normalize, questions, args.number, args.repeat)
+        print(f"{size:>10} {legacy:>15.2f} {compiled:>15.2f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Planes de consulta con y sin los índices de las migraciones.
+
+Ejecuta EXPLAIN (ANALYZE, BUFFERS) de las consultas de Estadisticas.py y
+de las plantillas SQL del router y del prompt sobre la base de datos de
+benchmarks (ver seed_db.py). La fase "sin índices" elimina los índices de
+Migrations.PLAN_INDEXES dentro de una transacción que luego se revierte,
+así la base de datos queda intacta.
+
+    python benchmarks/seed_db.py --riders 20000 --years 1900-2024
+    python benchmarks/bench_query_plans.py [--repeat 5] [--plans] [--save planes.json]
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "Modelo"))
+sys.path.append(ROOT)
+
+import psycopg2
+from DBPool import db_config_from_env
+from Estadisticas import CONSULTA_ANIO, CONSULTA_CARRERA, CONSULTA_CICLISTA
+from Migrations import LATEST_VERSION, PLAN_INDEXES, schema_version
+from Router import POSITIONS, RANKING_SQL, RESULTS_SQL
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "WebCyclingBench")
+
+
+def workload(cur):
+    """(nombre, SQL, parámetros) con valores tomados de la base de datos"""
+    cur.execute("""
+        SELECT ci.id, ci.nombre_ciclista
+        FROM resultados r JOIN ciclistas ci ON r.ciclista_id = ci.id
+        GROUP BY ci.id ORDER BY COUNT(*) DESC LIMIT 1;
+    """)
+    rider_id, rider_name = cur.fetchone()
+    surname = next(word for word in reversed(rider_name.split()) if not word.isdigit())
+    cur.execute("SELECT id, nombre_carrera, año FROM carreras ORDER BY año DESC, nombre_carrera LIMIT 1;")
+    race_id, race_name, year = cur.fetchone()
+
+    return [
+        ("Estadisticas: ciclista", CONSULTA_CICLISTA, (f"%{surname}%",) * 2),
+        ("Estadisticas: carrera", CONSULTA_CARRERA, (race_name,) * 2),
+        ("Estadisticas: año", CONSULTA_ANIO, (year, year)),
+        ("Router: podios nacional",
+         RANKING_SQL.format(alias="total_podios", where=f"{POSITIONS['<= 3']} AND ca.nombre_carrera ILIKE %s"),
+         ("%nacional%",)),
+        ("Router: ganador carrera/año",
+         RESULTS_SQL.format(where=f"{POSITIONS['= 1']} AND ca.nombre_carrera = %s AND ca.año = %s"),
+         (race_name, year)),
+        ("Router: palmarés ILIKE", RESULTS_SQL.format(where="ci.nombre_ciclista ILIKE %s"), (f"%{surname}%",)),
+        ("Entidades: palmarés por id", RESULTS_SQL.format(where="r.ciclista_id = %s"), (rider_id,)),
+        ("Entidades: podio por id", RESULTS_SQL.format(where=f"{POSITIONS['<= 3']} AND r.carrera_id = %s"), (race_id,)),
+    ]
+
+
+def scans(node, found=None):
+    """Nodos de acceso a tablas del plan, en orden ("Seq Scan resultados")"""
+    found = [] if found is None else found
+    target = node.get("Index Name") or node.get("Relation Name")
+    if target:
+        label = f"{node['Node Type']} {target}"
+        if label not in found:
+            found.append(label)
+    for child in node.get("Plans", ()):
+        scans(child, found)
+    return found
+
+
+def explain(cur, sql, params, repeat):
+    """Mejor tiempo de ejecución (ms), bloques leídos y accesos del plan"""
+    best = None
+    for _ in range(repeat):
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        result = cur.fetchone()[0][0]
+        if best is None or result["Execution Time"] < best["Execution Time"]:
+            best = result
+    plan = best["Plan"]
+    return {
+        "ms": round(best["Execution Time"], 3),
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "scans": scans(plan),
+    }
+
+
+def run(conn, queries, repeat):
+    cur = conn.cursor()
+    report = {}
+
+    # Sin índices: se eliminan dentro de la transacción y se revierte al final
+    for name in PLAN_INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name};")
+    for label, sql, params in queries:
+        report[label] = {"sin_indices": explain(cur, sql, params, repeat)}
+    conn.rollback()
+
+    for label, sql, params in queries:
+        report[label]["con_indices"] = explain(cur, sql, params, repeat)
+    conn.rollback()
+    cur.close()
+    return report
+
+
+def print_report(report, plans):
+    print(f"{'consulta':<30} {'sin índices ms':>15} {'con índices ms':>15} {'mejora':>8} {'bloques':>15}")
+    for label, phases in report.items():
+        before, after = phases["sin_indices"], phases["con_indices"]
+        speedup = before["ms"] / after["ms"] if after["ms"] else float("inf")
+        blocks = f"{before['buffers']} → {after['buffers']}"
+        print(f"{label:<30} {before['ms']:>15.2f} {after['ms']:>15.2f} {speedup:>7.1f}x {blocks:>15}")
+        if plans:
+            print(f"    antes:   {', '.join(before['scans'])}")
+            print(f"    después: {', '.join(after['scans'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="ejecuciones por consulta (se toma la mejor)")
+    parser.add_argument("--plans", action="store_true", help="mostrar los accesos de cada plan")
+    parser.add_argument("--save", help="guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**{**db_config_from_env(), "database": BENCH_DB_NAME})
+    try:
+        cur = conn.cursor()
+        version = schema_version(cur)
+        if version < LATEST_VERSION:
+            print(f"❌ {BENCH_DB_NAME} está en la versión {version} del esquema (última: {LATEST_VERSION}); "
+                  f"ejecuta benchmarks/seed_db.py")
+            sys.exit(1)
+        cur.execute("SELECT COUNT(*) FROM resultados;")
+        print(f"📏 {BENCH_DB_NAME}: esquema v{version}, {cur.fetchone()[0]} resultados, "
+              f"{args.repeat} ejecuciones por consulta\n")
+        queries = workload(cur)
+        conn.rollback()
+        cur.close()
+
+        report = run(conn, queries, args.repeat)
+    finally:
+        conn.close()
+
+    print_report(report, args.plans)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Prueba de carga de /ask con latencias por etapa.
+
+Envía preguntas del corpus con la concurrencia indicada y reporta p50, p95
+y p99 por etapa (los timings_ms que devuelve /ask) y solicitudes por
+segundo. Con --spawn levanta el stub de Azure OpenAI y el backend contra
+la base de datos de benchmarks (ver seed_db.py); si no, usa --url.
+
+    python benchmarks/load_test.py --spawn [--concurrency 16] [--requests 500]
+    python benchmarks/load_test.py --url http://localhost:8000 --save base.json
+    python benchmarks/load_test.py --spawn --baseline base.json --tolerance 0.2
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELO = os.path.join(HERE, "..", "Modelo")
+CORPUS = os.path.join(HERE, "preguntas.txt")
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def post_json(url, payload, timeout):
+    data = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def wait_for(url, timeout=60.0):
+    """Esperar a que el servicio responda"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.3)
+    return False
+
+
+def spawn(args):
+    """Levantar el stub y el backend; retorna (procesos, url del backend)"""
+    python = sys.executable
+    stub = subprocess.Popen([python, os.path.join(HERE, "stub_openai.py"), "--port", str(args.stub_port),
+                             "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms)])
+    env = {
+        **os.environ,
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{args.stub_port}",
+        "AZURE_OPENAI_API_KEY": "stub",
+        "AZURE_OPENAI_API_VERSION": "2024-02-01",
+        "AZURE_OPENAI_DEPLOYMENT": "stub",
+        "DB_NAME": os.getenv("BENCH_DB_NAME", "WebCyclingBench"),
+        "SQL_CACHE_PATH": "",
+    }
+    backend = subprocess.Popen([python, "-m", "uvicorn", "Backend:app", "--port", str(args.port),
+                                "--log-level", "warning"], cwd=MODELO, env=env)
+    url = f"http://127.0.0.1:{args.port}"
+    if not wait_for(f"{url}/ready"):
+        for process in (backend, stub):
+            process.terminate()
+        raise SystemExit("❌ El backend no respondió a tiempo")
+    return [backend, stub], url
+
+
+def run(url, questions, args):
+    """Lanzar las solicitudes y recolectar latencias (ms) por etapa"""
+    stages = {}
+    errors = []
+    rejected = []  # 429/503 del control de admisión (con su Retry-After)
+    lock = threading.Lock()
+
+    def one(i):
+        question = questions[i % len(questions)]
+        if args.cold:
+            # Pregunta distinta en cada solicitud: evita la cache de SQL
+            question = f"{question} (consulta {i})"
+        payload = {"question": question, "timings": True}
+        if args.phrasing is not None:
+            payload["phrasing"] = args.phrasing
+        start = time.perf_counter()
+        try:
+            result = post_json(f"{url}/ask", payload, args.timeout)
+        except urllib.error.HTTPError as e:
+            with lock:
+                if e.code in (429, 503):
+                    rejected.append(e.headers.get("Retry-After"))
+                    stages.setdefault("client_rejected", []).append(1000 * (time.perf_counter() - start))
+                else:
+                    errors.append(str(e))
+            return
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = 1000 * (time.perf_counter() - start)
+        with lock:
+            stages.setdefault("client_total", []).append(elapsed)
+            if not result.get("success"):
+                errors.append(result.get("error") or "sin éxito")
+                return
+            for stage, value in (result["data"].get("timings_ms") or {}).items():
+                stages.setdefault(stage, []).append(value)
+
+    # Calentamiento: esquema, caches y conexiones
+    for i in range(args.warmup):
+        one(i)
+    stages.clear()
+    errors.clear()
+    rejected.clear()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": len(errors),
+        "rejected": len(rejected),
+        "wall_s": round(wall, 3),
+        "rps": round(args.requests / wall, 2) if wall else 0.0,
+        "stages": {},
+    }
+    for stage, values in sorted(stages.items()):
+        values.sort()
+        report["stages"][stage] = {
+            "n": len(values),
+            "p50": round(percentile(values, 0.50), 2),
+            "p95": round(percentile(values, 0.95), 2),
+            "p99": round(percentile(values, 0.99), 2),
+            "rps": round(len(values) / wall, 2) if wall else 0.0,
+        }
+    if errors:
+        print(f"⚠️ Primer error: {errors[0]}")
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 {report['requests']} solicitudes, concurrencia {report['concurrency']}: "
+          f"{report['rps']} req/s, {report['errors']} errores, {report.get('rejected', 0)} rechazadas, "
+          f"{report['wall_s']} s\n")
+    print(f"{'etapa':<18} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'req/s':>8}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<18} {stats['n']:>6} {stats['p50']:>10.2f} {stats['p95']:>10.2f} "
+              f"{stats['p99']:>10.2f} {stats['rps']:>8.2f}")
+
+
+def compare(report, baseline, tolerance):
+    """Etapas cuyo p95 empeoró más que `tolerance` respecto a la línea base"""
+    regressions = []
+    for stage, stats in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and before["p95"] > 0 and stats["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {before['p95']:.2f} -> {stats['p95']:.2f} ms")
+    if baseline.get("rps") and report["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"req/s {baseline['rps']:.2f} -> {report['rps']:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="backend ya levantado")
+    parser.add_argument("--spawn", action="store_true", help="levantar stub y backend")
+    parser.add_argument("--port", type=int, default=8077, help="puerto del backend con --spawn")
+    parser.add_argument("--stub-port", type=int, default=8099)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--cold", action="store_true", help="preguntas únicas (sin cache de SQL)")
+    parser.add_argument("--phrasing", action="store_true", default=None, help="redactar con el LLM")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--save", help="guardar el reporte en JSON")
+    parser.add_argument("--baseline", help="reporte JSON con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="empeoramiento permitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    processes, url = spawn(args) if args.spawn else ([], args.url)
+    try:
+        report = run(url, questions, args)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Reporte guardado en {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regresiones:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Crear y poblar una base de datos PostgreSQL desechable para los benchmarks.
+
+Crea el esquema con las migraciones de Modelo/Migrations.py (tablas,
+triggers de generación e índices) y genera ciclistas, carreras, resultados y etapas sintéticos. La conexión
+sale de las variables DB_* (como el backend), pero la base de datos es
+BENCH_DB_NAME (por defecto WebCyclingBench) y se crea si no existe.
+
+    python benchmarks/seed_db.py [--riders 2000] [--years 1950-2024] [--reset]
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "Modelo"))
+
+import psycopg2
+import psycopg2.extras
+from DBPool import db_config_from_env
+from Migrations import migrate
+from Palmares import refresh_palmares
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "WebCyclingBench")
+
+# (nombre, tipo, puestos registrados por edición)
+RACES = [
+    ("Campeonato Nacional de Ruta", "Nacional", 10),
+    ("Campeonato Nacional de Contrarreloj", "Nacional", 10),
+    ("Vuelta Colombia", "Continental", 10),
+    ("Clásico RCN", "Continental", 10),
+    ("Vuelta al Tachira", "Continental", 5),
+    ("Tour de Francia", "GV", 10),
+    ("Giro de Italia", "GV", 10),
+    ("Vuelta a España", "GV", 10),
+    ("Mundial de Ruta", "Mundial", 10),
+    ("Mundial de Contrarreloj", "Mundial", 5),
+    ("París - Niza", "World Tour", 5),
+    ("Tour de Suiza", "World Tour", 5),
+    ("Tour de l'Avenir", "Sub-23", 5),
+]
+
+FIRST_NAMES = ["Luis", "Nairo", "Rigoberto", "Egan", "Fabio", "Martín", "Ramón", "Cochise", "Santiago",
+               "Oliverio", "Esteban", "Sergio", "Miguel Ángel", "Fernando", "Daniel", "Álvaro", "Víctor",
+               "Javier", "Hernán", "Alfonso", "Carlos", "Jairo", "Efraín", "Rafael", "Julio", "Iván"]
+LAST_NAMES = ["Herrera", "Quintana", "Urán", "Bernal", "Parra", "Ramírez", "Hoyos", "Rodríguez", "Botero",
+              "Rincón", "Chaves", "Henao", "López", "Gaviria", "Martínez", "Flórez", "Duque", "Sosa",
+              "Higuita", "Buitrago", "Pantano", "Betancur", "Atapuma", "Anacona", "Cárdenas", "Forero"]
+
+
+def rider_names(count, rng):
+    """Nombres únicos: nombre + dos apellidos (+ número si se agotan)"""
+    names = set()
+    while len(names) < count:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in names:
+            name = f"{name} {len(names)}"
+        names.add(name)
+    return sorted(names)
+
+
+def ensure_database(config):
+    """Crear la base de datos desechable si no existe"""
+    admin = psycopg2.connect(**{**config, "database": "postgres"})
+    admin.autocommit = True
+    cur = admin.cursor()
+    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (config["database"],))
+    if cur.fetchone() is None:
+        print(f"🆕 Creando base de datos {config['database']}...")
+        cur.execute(f'CREATE DATABASE "{config["database"]}"')
+    cur.close()
+    admin.close()
+
+
+def seed(conn, riders, first_year, last_year, seed_value, reset):
+    rng = random.Random(seed_value)
+    cur = conn.cursor()
+
+    if reset:
+        print("🧹 Eliminando tablas existentes...")
+        cur.execute("DROP TABLE IF EXISTS etapas, tours_continentales, resultados, carreras, ciclistas, "
+                    "palmares_ciclistas, palmares_tipos, cache_generaciones, schema_migraciones CASCADE;")
+    migrate(cur)
+
+    cur.execute("SELECT COUNT(*) FROM ciclistas;")
+    if cur.fetchone()[0]:
+        refresh_palmares(cur)
+        conn.commit()
+        print("ℹ️ La base de datos ya tiene datos; usa --reset para regenerarlos")
+        return
+
+    # Ciclistas
+    names = rider_names(riders, rng)
+    rider_ids = [row[0] for row in psycopg2.extras.execute_values(
+        cur, "INSERT INTO ciclistas (nombre_ciclista) VALUES %s RETURNING id",
+        [(name,) for name in names], page_size=1000, fetch=True)]
+
+    # Carreras: una edición por carrera y año
+    editions = [(name, tipo, year, places) for year in range(first_year, last_year + 1)
+                for name, tipo, places in RACES]
+    race_ids = [row[0] for row in psycopg2.extras.execute_values(
+        cur, "INSERT INTO carreras (nombre_carrera, tipo, año) VALUES %s RETURNING id",
+        [(name, tipo, year) for name, tipo, year, _ in editions], page_size=1000, fetch=True)]
+
+    # Resultados y etapas (algunos ciclistas dominan: distribución sesgada)
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(rider_ids))]
+    results, stages = [], []
+    for race_id, (_, _, _, places) in zip(race_ids, editions):
+        podium = set()
+        while len(podium) < places:
+            podium.add(rng.choices(rider_ids, weights)[0])
+        for position, rider_id in enumerate(rng.sample(sorted(podium), len(podium)), 1):
+            jersey = "General" if position == 1 and rng.random() < 0.5 else None
+            results.append((rider_id, race_id, position, jersey))
+            if rng.random() < 0.3:
+                stages.append((rider_id, race_id, rng.randint(1, 3)))
+
+    psycopg2.extras.execute_values(
+        cur, "INSERT INTO resultados (ciclista_id, carrera_id, posicion, camiseta_ganada) VALUES %s",
+        results, page_size=5000)
+    psycopg2.extras.execute_values(
+        cur, "INSERT INTO etapas (ciclista_id, carrera_id, cantidad_etapas) VALUES %s",
+        stages, page_size=5000)
+    refresh_palmares(cur)
+
+    conn.commit()
+    cur.execute("ANALYZE;")
+    conn.commit()
+    cur.close()
+    print(f"✅ {len(rider_ids)} ciclistas, {len(race_ids)} carreras, {len(results)} resultados, {len(stages)} etapas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=2000, help="ciclistas sintéticos")
+    parser.add_argument("--years", default="1950-2024", help="rango de años (inicio-fin)")
+    parser.add_argument("--seed", type=int, default=42, help="semilla para datos reproducibles")
+    parser.add_argument("--reset", action="store_true", help="eliminar las tablas antes de poblar")
+    args = parser.parse_args()
+
+    first_year, last_year = (int(part) for part in args.years.split("-"))
+    config = {**db_config_from_env(), "database": BENCH_DB_NAME}
+    ensure_database(config)
+
+    conn = psycopg2.connect(**config)
+    try:
+        seed(conn, args.riders, first_year, last_year, args.seed, args.reset)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Servidor local que imita la API de chat completions de Azure OpenAI.
+
+Responde con SQL enlatado a los prompts de generación de SQL y con una
+respuesta corta a los de redacción, con latencia configurable, para medir
+el pipeline sin credenciales reales.
+
+    python benchmarks/stub_openai.py [--port 8099] [--latency-ms 400] [--jitter-ms 100]
+
+Apuntar el backend al stub:
+
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099 AZURE_OPENAI_API_KEY=stub \\
+    AZURE_OPENAI_API_VERSION=2024-02-01 AZURE_OPENAI_DEPLOYMENT=stub
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# (patrón sobre la pregunta original, SQL) -- el primero que coincide gana
+CANNED_SQL = [
+    (r"etapa", """SELECT ci.nombre_ciclista, COUNT(*) AS total_etapas
+FROM etapas e
+JOIN ciclistas ci ON e.ciclista_id = ci.id
+GROUP BY ci.nombre_ciclista
+ORDER BY total_etapas DESC, ci.nombre_ciclista ASC;"""),
+    (r"podio|podium|primeros|top 3", """SELECT ci.nombre_ciclista, COUNT(*) AS total_podios
+FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+WHERE r.posicion <= 3
+GROUP BY ci.nombre_ciclista
+ORDER BY total_podios DESC, ci.nombre_ciclista ASC;"""),
+    (r"\b(19\d{2}|20\d{2})\b", """SELECT ci.nombre_ciclista, ca.nombre_carrera, ca.año, r.posicion
+FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE ca.año = {year} AND r.posicion <= 3
+ORDER BY ca.nombre_carrera ASC, r.posicion ASC;"""),
+    (r"", """SELECT ci.nombre_ciclista, ca.nombre_carrera, ca.año, r.posicion
+FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE r.posicion = 1
+ORDER BY ca.año DESC, ca.nombre_carrera ASC;"""),
+]
+
+ANSWER = "Según los datos, el ciclista más destacado es el primero de la lista, seguido de cerca por los demás."
+
+_QUESTION = re.compile(r"Pregunta original:\s*(.*)")
+
+
+def canned_sql(prompt):
+    """SQL enlatado según la pregunta que trae el prompt"""
+    match = _QUESTION.search(prompt)
+    question = match.group(1).lower() if match else ""
+    for pattern, sql in CANNED_SQL:
+        found = re.search(pattern, question)
+        if found:
+            return sql.format(year=found.group(1) if found.groups() else "")
+    return CANNED_SQL[-1][1]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        content = canned_sql(prompt) if prompt.rstrip().endswith("SQL:") else ANSWER
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        if body.get("stream"):
+            self._stream(content)
+        else:
+            self._json({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+    def _json(self, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content):
+        """Fragmentos SSE como los de la API real, con un pequeño retardo entre palabras"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                             "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        done = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": "stub", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def make_server(host="127.0.0.1", port=8099, latency_ms=400, jitter_ms=100, token_delay_ms=5):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.token_delay = token_delay_ms / 1000
+    server.lock = threading.Lock()
+    server.requests = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=400, help="latencia media por llamada")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="desviación estándar de la latencia")
+    parser.add_argument("--token-delay-ms", type=float, default=5, help="retardo entre fragmentos en streaming")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.token_delay_ms)
+    print(f"🤖 Stub de Azure OpenAI en http://{args.host}:{args.port} "
+          f"(latencia {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"🤖 Llamadas atendidas: {server.requests}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,42 @@ const CyclingLLMChat = () => {
     }
   };
 
+  // Actualizar el último mensaje (respuesta en curso)
+  const updateLastMessage = (changes) => {
+    setMessages(prev => {
+      const next = [...prev];
+      next[next.length - 1] = { ...next[next.length - 1], ...changes(next[next.length - 1]) };
+      return next;
+    });
+  };
+
+  // Leer Server-Sent Events de /ask/stream y entregar cada evento
+  const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let separator;
+      while ((separator = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, separator);
+        buffer = buffer.slice(separator + 2);
+
+        let event = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  };
+
   const sendMessage = async () => {
     if (!input.trim() || isLoading) return;
 
@@ -56,7 +92,7 @@ const CyclingLLMChat = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch(`${API_URL}/ask`, {
+      const response = await fetch(`${API_URL}/ask/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -64,19 +100,64 @@ const CyclingLLMChat = () => {
         body: JSON.stringify({ question: userMessage.content })
       });
 
-      const data = await response.json();
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
 
-      const assistantMessage = {
+      // Mensaje del asistente que se va completando con cada evento
+      setMessages(prev => [...prev, {
         type: 'assistant',
-        content: data.success ? data.data.answer : `Error: ${data.error}`,
+        content: '',
+        status: 'Generando consulta...',
         timestamp: new Date(),
-        metadata: data.success ? {
-          resultsCount: data.data.results_count,
-          sqlQuery: data.data.sql_query
-        } : null
-      };
+        metadata: null
+      }]);
+
+      await readEventStream(response, (event, data) => {
+        switch (event) {
+          case 'stage':
+            updateLastMessage(() => ({
+              status: 'Consultando la base de datos...',
+              metadata: { resultsCount: 0, sqlQuery: data.sql_query }
+            }));
+            break;
+          case 'results':
+            updateLastMessage(message => ({
+              status: 'Redactando respuesta...',
+              metadata: { ...message.metadata, resultsCount: data.results_count }
+            }));
+            break;
+          case 'token':
+            updateLastMessage(message => ({
+              status: null,
+              content: message.content + data.text
+            }));
+            break;
+          case 'done':
+            updateLastMessage(() => ({
+              status: null,
+              content: data.answer,
+              timestamp: new Date(),
+              metadata: {
+                resultsCount: data.results_count,
+                sqlQuery: data.sql_query
+              }
+            }));
+            break;
+          case 'error':
+            updateLastMessage(() => ({
+              status: null,
+              content: `Error: ${data.error}`,
+              metadata: null
+            }));
+            break;
+          default:
+            break;
+        }
+      });
 
-      setMessages(prev => [...prev, assistantMessage]);
+      // El stream terminó: quitar cualquier etapa pendiente
+      updateLastMessage(() => ({ status: null }));
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = {
@@ -85,7 +166,12 @@ const CyclingLLMChat = () => {
         timestamp: new Date(),
         isError: true
       };
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => {
+        // Reemplazar la respuesta en curso si quedó vacía
+        const last = prev[prev.length - 1];
+        const base = last.type === 'assistant' && !last.content ? prev.slice(0, -1) : prev;
+        return [...base, errorMessage];
+      });
     } finally {
       setIsLoading(false);
     }
@@ -171,6 +257,14 @@ const CyclingLLMChat = () => {
                 <div className="whitespace-pre-wrap leading-relaxed">
                   {message.content}
                 </div>
+
+                {/* Etapa actual mientras llega la respuesta */}
+                {message.status && (
+                  <div className="flex items-center gap-2 text-sm text-gray-400">
+                    <div className="w-2 h-2 bg-blue-500 rounded-full animate-pulse"></div>
+                    <span>{message.status}</span>
+                  </div>
+                )}
                 
                 {/* Metadata para respuestas del asistente */}
                 {message.metadata && (
@@ -192,8 +286,8 @@ const CyclingLLMChat = () => {
             </div>
           ))}
           
-          {/* Loading indicator */}
-          {isLoading && (
+          {/* Loading indicator (hasta que empieza a llegar la respuesta) */}
+          {isLoading && messages[messages.length - 1].type === 'user' && (
             <div className="flex justify-start">
               <div className="bg-gray-800/50 border border-gray-700/30 rounded-2xl px-4 py-3">
                 <div className="flex items-center gap-2 text-gray-400">
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del modelo se importan planos (como lo hace Backend.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Modelo"))
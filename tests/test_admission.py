@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from Admission import AdmissionController, Overloaded, TokenBucket
+
+
+def controller(**kwargs):
+    kwargs.setdefault("max_in_flight", 1)
+    kwargs.setdefault("queue_size", 0)
+    kwargs.setdefault("max_wait", 1)
+    kwargs.setdefault("rpm", 0)
+    kwargs.setdefault("tpm", 0)
+    return AdmissionController(**kwargs)
+
+
+def test_token_bucket_delay_and_reservation():
+    bucket = TokenBucket(rate=10, capacity=5)
+    assert bucket.delay(5) == 0
+    bucket.take(5)
+    assert bucket.delay(1) == pytest.approx(0.1, abs=0.01)
+    bucket.take(5)  # reserva futura: el saldo queda negativo
+    assert bucket.delay(1) == pytest.approx(0.6, abs=0.01)
+
+
+def test_token_bucket_caps_large_requests_at_capacity():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.delay(100) == 0
+
+
+def test_queue_full_rejects_with_503():
+    async def run():
+        admission = controller()
+        async with admission.admit(purpose="sql"):
+            with pytest.raises(Overloaded) as raised:
+                async with admission.admit(purpose="sql"):
+                    pass
+        return admission, raised.value
+    admission, error = asyncio.run(run())
+    assert error.reason == "queue_full"
+    assert error.status_code == 503
+    assert error.retry_after >= 1
+    assert admission.rejected["queue_full"] == 1
+    assert admission.in_flight == 0
+
+
+def test_rate_limit_rejects_with_429():
+    async def run():
+        admission = controller(max_in_flight=4, rpm=6, max_wait=0.5)
+        async with admission.admit(purpose="sql"):
+            pass
+        with pytest.raises(Overloaded) as raised:
+            async with admission.admit(purpose="sql"):
+                pass
+        return raised.value
+    error = asyncio.run(run())
+    assert error.reason == "rate_limited"
+    assert error.status_code == 429
+
+
+def test_queued_call_waits_for_slot():
+    async def run():
+        admission = controller(queue_size=1, max_wait=5)
+        order = []
+
+        async def call(name, start, hold):
+            await asyncio.sleep(start)
+            async with admission.admit(purpose="answer"):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(call("primera", 0, 0.05), call("segunda", 0.01, 0))
+        return admission, order
+    admission, order = asyncio.run(run())
+    assert order == ["primera", "segunda"]
+    assert admission.admitted == 2
+
+
+def test_try_acquire_never_waits():
+    async def run():
+        admission = controller()
+        assert await admission.try_acquire(purpose="sql")
+        taken = await admission.try_acquire(purpose="sql")
+        admission.release(0)
+        return taken, admission.in_flight
+    assert asyncio.run(run()) == (False, 0)
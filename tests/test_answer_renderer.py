@@ -0,0 +1,19 @@
+from AnswerRenderer import MAX_LISTED, render_answer, render_fallback
+
+
+def test_fallback_uses_template_when_known():
+    rows = [{"nombre_ciclista": "Nairo Quintana", "total_victorias": 5}]
+    assert render_fallback(rows) == render_answer(rows)
+
+
+def test_fallback_never_none_for_unknown_shape():
+    rows = [{"continente": f"Continente {i}"} for i in range(MAX_LISTED + 2)]
+    answer = render_fallback(rows)
+    assert answer is not None
+    assert f"({MAX_LISTED + 2})" in answer
+    assert "Continente 0" in answer and f"Continente {MAX_LISTED}" not in answer
+    assert "Hay 2 resultados más." in answer
+
+
+def test_fallback_without_results():
+    assert render_fallback([])
@@ -0,0 +1,85 @@
+import asyncio
+
+from Admission import AdmissionController
+from CallPolicy import CallPolicy
+
+
+def policy(**kwargs):
+    kwargs.setdefault("timeout", 1.0)
+    kwargs.setdefault("retries", 2)
+    kwargs.setdefault("backoff", 0.001)
+    kwargs.setdefault("hedge", False)
+    return CallPolicy("sql", **kwargs)
+
+
+class Calls:
+    """make_call de prueba: cada llamada tarda lo indicado en `delays` (la última se repite)"""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.count = 0
+
+    async def __call__(self):
+        delay = self.delays[min(self.count, len(self.delays) - 1)]
+        self.count += 1
+        number = self.count
+        await asyncio.sleep(delay)
+        return number
+
+
+def test_hung_attempt_is_retried_within_the_deadline():
+    calls = Calls(10, 0)
+    result = asyncio.run(policy(attempt_timeout=0.05).call(calls))
+    assert result == 2
+
+
+def test_default_attempt_timeout_splits_the_deadline():
+    assert policy(timeout=30, retries=2).attempt_timeout == 10
+
+
+def test_last_attempt_gets_remaining_deadline():
+    p = policy(timeout=1.0, retries=1, attempt_timeout=0.05)
+    assert p._attempt_budget(0, 0.8) == 0.05
+    assert p._attempt_budget(1, 0.8) == 0.8
+
+
+def test_timeout_propagates_after_retries():
+    calls = Calls(10)
+    try:
+        asyncio.run(policy(timeout=0.2, retries=1, attempt_timeout=0.05).call(calls))
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("se esperaba TimeoutError")
+    assert calls.count == 2
+
+
+def hedged(admission):
+    p = policy(hedge=True, admission=admission)
+    p.hedge_min_samples = 1
+    p.hedge_min_delay = 0.01
+    p._latencies.append(0.01)
+    return p
+
+
+def test_hedge_fires_with_free_slot_and_releases_it():
+    async def run():
+        admission = AdmissionController(max_in_flight=2, queue_size=4, max_wait=1, rpm=0, tpm=0)
+        calls = Calls(0.3, 0)
+        async with admission.admit(purpose="sql"):
+            result = await hedged(admission).call(calls)
+            await asyncio.sleep(0)
+            return result, admission.in_flight
+    result, in_flight = asyncio.run(run())
+    assert result == 2
+    assert in_flight == 1
+
+
+def test_hedge_skipped_without_free_slot():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, queue_size=4, max_wait=1, rpm=0, tpm=0)
+        calls = Calls(0.05, 0)
+        async with admission.admit(purpose="sql"):
+            result = await hedged(admission).call(calls)
+        return result, calls.count
+    assert asyncio.run(run()) == (1, 1)
@@ -0,0 +1,34 @@
+import asyncio
+
+from CyclingLLM import CyclingLLM
+from Normalizer import QuestionNormalizer
+from SingleFlight import SingleFlight
+
+
+def coalescing_instance():
+    llm = CyclingLLM.__new__(CyclingLLM)  # sin clientes del LLM ni conexiones
+    llm.normalizer = QuestionNormalizer()
+    llm.in_flight = SingleFlight()
+    llm.runs = 0
+
+    async def run(user_question, phrasing):
+        llm.runs += 1
+        await asyncio.sleep(0.05)
+        return {"success": True, "error": None, "data": {"question": user_question, "answer": "Fabio Parra"}}
+
+    llm._aask_question = run
+    return llm
+
+
+def test_coalesced_follower_keeps_its_own_question():
+    llm = coalescing_instance()
+
+    async def ask_both():
+        return await asyncio.gather(llm.aask_question("¿Campeón nacional 1986?"),
+                                    llm.aask_question("¿campeón nacional 1986?"))
+
+    leader, follower = asyncio.run(ask_both())
+    assert llm.runs == 1
+    assert leader["data"]["question"] == "¿Campeón nacional 1986?"
+    assert follower["data"]["question"] == "¿campeón nacional 1986?"
+    assert follower["data"]["coalesced"] and not leader["data"]["coalesced"]
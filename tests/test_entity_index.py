@@ -0,0 +1,111 @@
+from EntityIndex import CHANGES_QUERY, RACES_QUERY, RIDERS_QUERY, EntityIndex, render_mentions
+
+RIDERS = [
+    (1, "Luis Herrera"),
+    (2, "Nairo Quintana"),
+    (3, "Jose Alfonso Lopez"),
+    (4, "Miguel Angel Lopez"),
+    (5, "Rigoberto Urán"),
+]
+RACES = [
+    (10, "Tour de Francia", 1987),
+    (11, "Tour de Francia", 1990),
+    (12, "Vuelta a España", 1987),
+]
+
+
+class FakeCursor:
+    """Cursor de prueba: responde las consultas del índice desde listas"""
+
+    def __init__(self, riders, races, changes=0):
+        self.riders, self.races, self.changes = riders, races, changes
+        self.result = None
+
+    def execute(self, query, params=None):
+        if query == CHANGES_QUERY:
+            self.result = [(self.changes,)]
+        elif query == RIDERS_QUERY:
+            self.result = [row for row in self.riders if row[0] > params[0]]
+        elif query == RACES_QUERY:
+            self.result = [row for row in self.races if row[0] > params[0]]
+        else:
+            raise AssertionError(f"consulta inesperada: {query}")
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def build(riders=RIDERS, races=RACES):
+    index = EntityIndex(aliases_path="", max_candidates=8)
+    index.refresh(FakeCursor(list(riders), list(races)))
+    return index
+
+
+def test_full_name_and_race_with_year():
+    mentions = build().resolve("¿Cómo le fue a Nairo Quintana en el Tour de Francia 1990?")
+    assert [(m.kind, m.ids) for m in mentions] == [("ciclista", (2,)), ("carrera", (11,))]
+    assert mentions[1].year == 1990
+
+
+def test_race_alias_without_year_covers_all_editions():
+    (mention,) = build().resolve("ganadores del tour")
+    assert mention.names == ("Tour de Francia",)
+    assert mention.ids == (10, 11)
+    assert mention.year is None
+
+
+def test_nickname_resolves_first_name():
+    (mention,) = build().resolve("palmarés de lucho herrera")
+    assert mention.ids == (1,)
+    assert mention.text == "lucho herrera"
+
+
+def test_partial_name_keeps_ambiguous_candidates():
+    (mention,) = build().resolve("resultados de lopez")
+    assert mention.ids == (3, 4)
+    assert "ciclista_id IN (3, 4)" in render_mentions([mention])
+
+
+def test_partial_name_narrows_with_next_word():
+    (mention,) = build().resolve("resultados de miguel lopez")
+    assert mention.ids == (4,)
+
+
+def test_incremental_refresh_reads_only_new_rows():
+    index = build()
+    riders = RIDERS + [(6, "Egan Bernal")]
+    index.refresh(FakeCursor(riders, RACES))
+    assert index.rebuilds == 1
+    assert index.rider_id("Egan Bernal") == 6
+    assert index.resolve("egan bernal")[0].ids == (6,)
+
+
+def test_changes_trigger_rebuild():
+    index = build()
+    index.refresh(FakeCursor(RIDERS[:-1], RACES, changes=1))
+    assert index.rebuilds == 2
+    assert index.rider_id("Rigoberto Urán") is None
+
+
+def test_rebuild_keeps_serving_the_previous_index():
+    import threading
+
+    index = build()
+    results = []
+
+    class SlowCursor(FakeCursor):
+        def fetchall(self):
+            rows = super().fetchall()
+            # Consulta en curso: el índice sigue completo para resolve
+            results.append(index.resolve("nairo quintana")[0].ids)
+            return rows
+
+    thread = threading.Thread(target=index.refresh,
+                              args=(SlowCursor(RIDERS + [(6, "Egan Bernal")], RACES, changes=1),))
+    thread.start()
+    thread.join()
+    assert results == [(2,), (2,)]
+    assert index.resolve("egan bernal")[0].ids == (6,)
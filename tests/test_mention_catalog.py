@@ -0,0 +1,19 @@
+from CyclingLLM import CyclingLLM
+
+
+class FakeSchemaCache:
+    def __init__(self):
+        self.version = "esquema-1"
+        self.catalog_token = (1,)
+        self.ciclistas = ["Nairo Quintana"]
+
+
+def test_new_riders_enter_the_catalog_with_the_same_schema_version():
+    llm = CyclingLLM.__new__(CyclingLLM)  # sin clientes del LLM ni conexiones
+    llm.schema_cache = FakeSchemaCache()
+    llm._mentions, llm._mentions_token = [], None
+    assert [name for name, _ in llm.mention_catalog()] == ["Nairo Quintana"]
+
+    llm.schema_cache.ciclistas = ["Nairo Quintana", "Egan Bernal"]
+    llm.schema_cache.catalog_token = (2,)
+    assert sorted(name for name, _ in llm.mention_catalog()) == ["Egan Bernal", "Nairo Quintana"]
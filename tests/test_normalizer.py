@@ -0,0 +1,42 @@
+import re
+
+from Normalizer import QuestionNormalizer, trie_pattern
+
+normalizer = QuestionNormalizer()
+
+
+def full_match(phrases, text):
+    return re.fullmatch(trie_pattern(phrases), text) is not None
+
+
+def test_trie_pattern_matches_every_phrase():
+    phrases = ["podio", "podios", "podium", "top 3", "más podios", "mas podios"]
+    for phrase in phrases:
+        assert full_match(phrases, phrase)
+    assert not full_match(phrases, "podi")
+    assert not full_match(phrases, "top")
+
+
+def test_trie_pattern_escapes_and_prefers_longest():
+    phrases = ["a.b", "a.bc"]
+    assert full_match(phrases, "a.bc")
+    assert not full_match(phrases, "axb")
+    assert re.match(trie_pattern(phrases), "a.bcd").group() == "a.bc"
+
+
+def test_trie_pattern_without_phrases_never_matches():
+    assert re.search(trie_pattern([]), "cualquier texto") is None
+
+
+def test_normalize_longest_phrase_wins():
+    assert normalizer.normalize("¿Quién es el ciclista con más podios?") == "¿quién es el ciclista count podios?"
+
+
+def test_normalize_whole_words_only():
+    assert normalizer.normalize("campeonato nacional") == "nacional"
+    assert normalizer.normalize("campeonatos") == "campeonatos"
+
+
+def test_normalize_years():
+    assert normalizer.normalize("ganador del nacional '86") == "posicion = 1 del nacional 1986"
+    assert normalizer.normalize_year("en 05") == "en 2005"
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+from ResultCache import CACHED_TABLES, ResultCache, tables_read
+
+
+class FailingPool:
+    def __init__(self):
+        self.calls = 0
+
+    @contextmanager
+    def connection(self):
+        self.calls += 1
+        raise RuntimeError("sin conexión")
+        yield
+
+
+def test_tables_read_joins():
+    sql = "SELECT * FROM resultados r JOIN carreras ca ON r.carrera_id = ca.id"
+    assert tables_read(sql) == ("carreras", "resultados")
+
+
+def test_tables_read_comma_join():
+    sql = "SELECT * FROM resultados r, carreras c WHERE r.carrera_id = c.id"
+    assert tables_read(sql) == ("carreras", "resultados")
+
+
+def test_tables_read_subquery_and_comma_after_it():
+    sql = "SELECT * FROM (SELECT x FROM etapas e, ciclistas ci) s, tours_continentales t"
+    assert tables_read(sql) == ("ciclistas", "etapas", "tours_continentales")
+
+
+def test_tables_read_ignores_literals_and_falls_back():
+    assert tables_read("SELECT 'from ciclistas, etapas' FROM carreras") == ("carreras",)
+    assert tables_read("SELECT extract(year from now())") == CACHED_TABLES
+
+
+def test_generations_failure_waits_check_interval():
+    pool = FailingPool()
+    cache = ResultCache(pool, maxsize=10, ttl=60, check_interval=60)
+    assert cache.generations() is None
+    assert cache.generations() is None
+    assert pool.calls == 1
@@ -0,0 +1,10 @@
+from ResultPages import ResultPage, results_count
+
+
+def test_results_count_uses_total_when_truncated():
+    assert results_count(None) == 0
+    assert results_count(ResultPage([{"a": 1}] * 3)) == 3
+    page = ResultPage([{"a": 1}] * 3, has_more=True)
+    assert page.total is None and results_count(page) == 3
+    page.total = 1200
+    assert results_count(page) == 1200
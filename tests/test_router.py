@@ -0,0 +1,87 @@
+from Normalizer import QuestionNormalizer
+from Router import IntentRouter
+
+normalizer = QuestionNormalizer()
+router = IntentRouter()
+
+
+def route(question, carreras=("Tour de Francia",), **kwargs):
+    return router.route(normalizer.normalize(question), carreras, **kwargs)
+
+
+def test_palmares_full_name():
+    routed = route("¿Cuál es el palmarés de Nairo Quintana?")
+    assert routed.intent == "palmares"
+    assert routed.params == ("%nairo quintana%",)
+
+
+def test_palmares_keeps_de_del_inside_names():
+    assert route("resultados de Isaac del Toro").params == ("%isaac del toro%",)
+
+
+def test_palmares_with_qualifier_goes_to_llm():
+    assert route("palmarés de Nairo Quintana en el tour") is None
+    assert route("logros de Rigoberto Urán con Movistar") is None
+    assert route("historial de Lucho Herrera, en el giro") is None
+
+
+def test_palmares_with_resolved_race_goes_to_llm():
+    assert route("resultados de Nairo Quintana del tour", mentions_race=True) is None
+
+
+def test_palmares_by_rider_id():
+    routed = route("palmarés de Nairo Quintana", rider_ids=(7,))
+    assert routed.params == (7,)
+    assert "r.ciclista_id = %s" in routed.sql
+
+
+def test_race_found_by_entity_index_but_not_in_catalog_goes_to_llm():
+    assert route("¿Quién tiene más victorias en el Tour?", aggregates=True, mentions_race=True) is None
+    assert route("¿Quién tiene más podios?", aggregates=True, mentions_race=True) is None
+
+
+def test_year_ranges_go_to_llm():
+    assert route("¿Quién tiene más victorias desde 1990?") is None
+    assert route("¿Quién tiene más podios hasta 1990?") is None
+    assert route("¿Quién tiene más victorias antes de 1990?") is None
+    assert route("¿Quién tiene más podios después de 1990?") is None
+
+
+def test_several_years_go_to_llm():
+    assert route("¿Quién tiene más victorias entre 1980 y 1990?") is None
+    assert route("¿Quién tiene más victorias en 1980 y 1990?") is None
+
+
+def test_stage_questions_go_to_llm():
+    assert route("¿Quién tiene más victorias de etapa?", aggregates=True) is None
+    assert route("¿Quién tiene más victorias de etapas en el Tour de Francia 1990?") is None
+
+
+def test_most_podiums_reads_palmares_table_without_filters():
+    routed = route("¿Quién tiene más podios?", aggregates=True)
+    assert routed.intent == "most_podiums"
+    assert "FROM palmares_ciclistas" in routed.sql
+    assert routed.params == ()
+
+
+def test_most_wins_with_race_and_year_groups_results():
+    routed = route("¿Quién tiene más victorias en el Tour de Francia 1990?", aggregates=True)
+    assert routed.intent == "most_wins"
+    assert "r.posicion = 1" in routed.sql
+    assert routed.params == ("Tour de Francia", 1990)
+
+
+def test_nacional_pattern_race_slot():
+    routed = route("¿Quién tiene más podios en los nacionales?")
+    assert routed.params == ("%nacional%",)
+
+
+def test_race_winner_and_podium():
+    assert route("¿Quién ganó el Tour de Francia en 1990?").intent == "race_winner"
+    podium = route("podio del Tour de Francia 1990")
+    assert podium.intent == "race_podium"
+    assert podium.params == ("Tour de Francia", 1990)
+
+
+def test_unknown_question_goes_to_llm():
+    assert route("¿Cuántas etapas ganó Lucho Herrera en la Vuelta?") is None
@@ -0,0 +1,113 @@
+from Normalizer import QuestionNormalizer
+from SqlCanon import (cache_key, canonicalize, fill_template, mention_catalog, question_constants,
+                      question_shape, render, sql_template)
+
+normalizer = QuestionNormalizer()
+
+PODIOS_SQL = """SELECT ci.nombre_ciclista FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE r.posicion <= 3 AND ca.nombre_carrera ILIKE '%nacional%'
+GROUP BY ci.nombre_ciclista HAVING COUNT(*) = 3"""
+
+GANADOR_SQL = """SELECT ci.nombre_ciclista FROM resultados r
+JOIN ciclistas ci ON r.ciclista_id = ci.id
+JOIN carreras ca ON r.carrera_id = ca.id
+WHERE r.posicion = 1 AND ca.año = 1986 AND ca.nombre_carrera ILIKE '%nacional%'"""
+
+
+def template_for(sql, question, catalog=(), ids=()):
+    normalized = normalizer.normalize(question)
+    _, numbers, names = question_shape(normalized, catalog)
+    return sql_template(sql, numbers, names, ids, question_constants(normalized))
+
+
+def test_canonicalize_extracts_literals():
+    canonical = canonicalize("SELECT * FROM carreras WHERE año = 1986 AND nombre_carrera = 'Giro'")
+    assert canonical.values == (1986, "Giro")
+    assert "$1" in canonical.shape and "$2" in canonical.shape
+
+
+def test_canonicalize_same_shape_for_spacing_and_values():
+    a = canonicalize("SELECT * FROM carreras WHERE año=1986")
+    b = canonicalize("select *  from carreras where año = 2001;")
+    assert a.key == b.key
+
+
+def test_canonicalize_keeps_order_by_positions():
+    canonical = canonicalize("SELECT a, b FROM t ORDER BY 2 DESC LIMIT 5")
+    assert canonical.values == (5,)
+
+
+def test_render_round_trip():
+    canonical = canonicalize("SELECT * FROM t WHERE x = 'O''Brien' AND y = 3")
+    assert canonicalize(render(canonical.shape, canonical.values)) == canonical
+
+
+def test_cache_key_differs_by_value():
+    assert cache_key("SELECT * FROM t WHERE y = 3") != cache_key("SELECT * FROM t WHERE y = 4")
+    assert cache_key("SELECT * FROM t WHERE y = %s", (3,)) == cache_key("SELECT * FROM t WHERE y = 3")
+
+
+def test_question_shape_keeps_normalizer_cutoffs():
+    normalized = normalizer.normalize("¿Quién tiene 3 podios en el nacional?")
+    shape, numbers, _ = question_shape(normalized)
+    assert numbers == [3]
+    assert "posicion <= 3" in shape
+    assert question_constants(normalized) == [3]
+
+
+def test_template_year_is_reused():
+    template = template_for(GANADOR_SQL, "campeón nacional 1986")
+    sql = fill_template(template, [1990])
+    assert canonicalize(sql).values == (1, 1990, "%nacional%")
+
+
+def test_template_refused_when_number_matches_cutoff():
+    # El 3 del usuario y el corte del podio son el mismo literal
+    assert template_for(PODIOS_SQL, "¿Quién tiene 3 podios en el nacional?") is None
+
+
+def test_template_refused_when_number_matches_several_literals():
+    sql = "SELECT * FROM resultados r JOIN carreras ca ON r.carrera_id = ca.id WHERE ca.año = 1990 OR r.posicion = 1990"
+    assert template_for(sql, "resultados de 1990") is None
+
+
+def test_template_refused_when_question_repeats_number():
+    sql = "SELECT * FROM carreras ca WHERE ca.año BETWEEN 1990 AND 1990"
+    assert template_for(sql, "carreras entre 1990 y 1990") is None
+
+
+def test_template_refused_for_limit_literal():
+    sql = "SELECT * FROM palmares_ciclistas ORDER BY victorias DESC LIMIT 10"
+    assert template_for(sql, "los 10 ciclistas con mas victorias") is None
+
+
+def test_template_refused_when_number_missing_from_sql():
+    sql = "SELECT * FROM carreras ca WHERE ca.año = 1990"
+    assert template_for(sql, "carreras de 1990 y 1991") is None
+
+
+def test_template_rider_name_slot():
+    catalog = mention_catalog(["Nairo Quintana", "Rigoberto Urán"])
+    sql = "SELECT * FROM resultados r JOIN ciclistas ci ON r.ciclista_id = ci.id WHERE ci.nombre_ciclista ILIKE '%Nairo Quintana%'"
+    template = template_for(sql, "palmarés de Nairo Quintana", catalog)
+    assert template["slots"] == [["name", 0, "%", "%"]]
+    filled = fill_template(template, [], ["Rigoberto Urán"])
+    assert canonicalize(filled).values == ("%Rigoberto Urán%",)
+
+
+def test_template_rider_id_slot():
+    catalog = mention_catalog(["Nairo Quintana", "Rigoberto Urán"])
+    sql = "SELECT * FROM resultados r WHERE r.ciclista_id = 42 AND r.posicion = 1"
+    template = template_for(sql, "victorias de Nairo Quintana", catalog, ids=[42])
+    assert template["slots"] == [["id", 0], None]
+    assert canonicalize(fill_template(template, [], ["Rigoberto Urán"], [7])).values == (7, 1)
+    # Sin id conocido para el otro ciclista no se rellena
+    assert fill_template(template, [], ["Rigoberto Urán"], [None]) is None
+
+
+def test_template_refused_when_id_equals_question_number():
+    catalog = mention_catalog(["Nairo Quintana"])
+    sql = "SELECT * FROM resultados r JOIN carreras ca ON r.carrera_id = ca.id WHERE r.ciclista_id = 2013 AND ca.año = 2013"
+    assert template_for(sql, "Nairo Quintana en 2013", catalog, ids=[2013]) is None
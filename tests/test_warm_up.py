@@ -0,0 +1,35 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from CyclingLLM import CyclingLLM
+
+
+class FakePool:
+    def fill(self):
+        pass
+
+
+class FakeSchemaCache:
+    def __init__(self, schema):
+        self.schema = schema
+
+    def get(self):
+        return self.schema
+
+
+def warm_instance(schema):
+    # Sin __init__: no abre clientes del LLM ni conexiones
+    llm = CyclingLLM.__new__(CyclingLLM)
+    llm.pool = FakePool()
+    llm.schema_cache = FakeSchemaCache(schema)
+    llm.executor = ThreadPoolExecutor(max_workers=1)
+    return llm
+
+
+def test_warm_up_fails_without_schema():
+    llm = warm_instance(None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(llm.awarm_up())
+    llm.executor.shutdown()